@@ -0,0 +1,110 @@
+"""candle table indexes
+
+Revision ID: b7d3e91f0a2c
+Revises: e188d1e41b2a
+Create Date: 2026-10-18 09:30:00.000000
+
+Ensures a unique start_timestamp index on every "{pair}_{timeframe}" candle table.
+The candle tables live in the historical database (DATABASE_HISTORICAL), not the
+one Alembic migrates, so this revision connects to it with the same HOST, USR and
+PASSWD settings as the app. Tables are discovered at run time; without candle
+tables this is a no-op. A table with duplicate start_timestamp rows is left as is
+and logged: dedupe it with python -m app.utils.candleIndexes --dedupe. In offline
+(--sql) mode nothing is emitted: run python -m app.utils.candleIndexes instead.
+
+The DDL is inlined rather than imported from app.utils.candleIndexes so that this
+revision keeps doing the same thing whatever that module becomes.
+"""
+import os
+import hashlib
+import logging
+from typing import Sequence, Union
+
+from alembic import context
+import sqlalchemy as sa
+from sqlalchemy.pool import NullPool
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d3e91f0a2c'
+down_revision: Union[str, None] = 'e188d1e41b2a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+logger = logging.getLogger(f"alembic.runtime.migration.{revision}")
+
+CANDLE_TABLES_SQL = """
+SELECT table_name FROM information_schema.columns
+WHERE table_schema = 'public' AND column_name = 'start_timestamp'
+ORDER BY table_name
+"""
+
+# Valid unique B-tree indexes on start_timestamp alone, or invalid leftovers of a failed build
+START_TIMESTAMP_INDEXES_SQL = """
+SELECT i.relname, x.indisvalid
+FROM pg_index x
+JOIN pg_class i ON i.oid = x.indexrelid
+JOIN pg_am am ON am.oid = i.relam
+JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = x.indkey[0]
+WHERE x.indrelid = to_regclass(:qualified) AND a.attname = 'start_timestamp'
+  AND am.amname = 'btree' AND x.indisunique AND x.indnkeyatts = 1 AND x.indpred IS NULL
+"""
+
+
+def _quote(table):
+    return 'public."' + table.replace('"', '""') + '"'
+
+
+def _index_name(table):
+    name = f"{table}_start_timestamp_key"
+    if len(name) > 63:  # Postgres identifier limit
+        name = f"{table[:40]}_{hashlib.sha1(table.encode()).hexdigest()[:8]}_start_timestamp_key"
+    return name
+
+
+def _historical_url():
+    user, password, host = os.getenv("USR"), os.getenv("PASSWD"), os.getenv("HOST")
+    return f"postgresql://{user}:{password}@{host}:5432/{os.getenv('DATABASE_HISTORICAL')}"
+
+
+def _index_table(conn, table):
+    """Create the unique start_timestamp index of `table` if missing. Returns (action, index name)."""
+    qualified, index = _quote(table), _index_name(table)
+    indexes = conn.execute(sa.text(START_TIMESTAMP_INDEXES_SQL), {"qualified": qualified}).all()
+    valid = [name for name, is_valid in indexes if is_valid]
+    if valid:
+        return "exists", valid[0]
+    duplicates = conn.execute(sa.text(
+        f"SELECT count(*) - count(DISTINCT start_timestamp) FROM {qualified} WHERE start_timestamp IS NOT NULL"
+    )).scalar()
+    if duplicates:
+        raise ValueError(f"{duplicates} duplicate start_timestamp rows")
+    if any(name == index for name, _ in indexes):
+        conn.execute(sa.text(f'DROP INDEX CONCURRENTLY IF EXISTS public."{index}"'))
+    conn.execute(sa.text(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "{index}" ON {qualified} USING btree (start_timestamp)'))
+    conn.execute(sa.text(f'ALTER TABLE {qualified} ADD CONSTRAINT "{index}" UNIQUE USING INDEX "{index}"'))
+    conn.execute(sa.text(f"ANALYZE {qualified}"))
+    return "created", index
+
+
+def upgrade() -> None:
+    if context.is_offline_mode():
+        logger.warning("Skipping candle table indexes in offline mode: run python -m app.utils.candleIndexes on the historical database")
+        return
+    engine = sa.create_engine(_historical_url(), poolclass=NullPool)
+    try:
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in conn.execute(sa.text(CANDLE_TABLES_SQL)).scalars().all():
+                try:
+                    action, index = _index_table(conn, table)
+                    logger.info(f"{table}: {action} {index}")
+                except (sa.exc.SQLAlchemyError, ValueError) as e:
+                    logger.error(f"{table}: failed {_index_name(table)} - {str(e).splitlines()[0]}")
+    finally:
+        engine.dispose()
+
+
+def downgrade() -> None:
+    # Indexes on candle tables are kept: dropping them would only slow down reads
+    pass
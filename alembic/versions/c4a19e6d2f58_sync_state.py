@@ -0,0 +1,32 @@
+"""sync state
+
+Revision ID: c4a19e6d2f58
+Revises: b7d3e91f0a2c
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a19e6d2f58'
+down_revision: Union[str, None] = 'b7d3e91f0a2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('t_sync_state',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('watermark', sa.Date(), nullable=True),
+    sa.Column('last_run', sa.DateTime(), nullable=True),
+    sa.Column('last_status', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('t_sync_state')
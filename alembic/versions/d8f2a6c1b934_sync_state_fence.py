@@ -0,0 +1,26 @@
+"""sync state fence
+
+Revision ID: d8f2a6c1b934
+Revises: c4a19e6d2f58
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f2a6c1b934'
+down_revision: Union[str, None] = 'c4a19e6d2f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('t_sync_state', sa.Column('fence', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('t_sync_state', 'fence')
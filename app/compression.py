@@ -0,0 +1,235 @@
+import os
+import zlib
+from dotenv import load_dotenv
+
+# brotli and zstandard are in requirements.txt; without them only gzip is offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes; smaller bodies are sent as is
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Server preference when the client accepts several encodings with the same q-value
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+
+# Media types that are already compressed
+INCOMPRESSIBLE_PREFIXES = ("image/", "video/", "audio/", "application/zip", "application/gzip", "application/zstd")
+
+
+class _GzipEncoder:
+    def __init__(self):
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliEncoder:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdEncoder:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+ENCODERS = {"gzip": _GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = _BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = _ZstdEncoder
+
+
+def negotiate_encoding(accept_encoding: str):
+    """Pick the available encoding with the highest q-value, ties broken by COMPRESSION_ENCODINGS."""
+    weights = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for name in COMPRESSION_ENCODINGS:
+        if name not in ENCODERS:
+            continue
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def with_vary(headers):
+    """Response headers with Accept-Encoding added to Vary, merged into an existing Vary header."""
+    vary = [v for k, v in headers if k.lower() == b"vary"]
+    if any(b"accept-encoding" in v.lower() or v.strip() == b"*" for v in vary):
+        return list(headers)
+    headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+    headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    return headers
+
+
+class CompressionStats:
+    def __init__(self):
+        self.responses = {}
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "encodings": sorted(ENCODERS),
+            "min_size": COMPRESSION_MIN_SIZE,
+            "responses": dict(self.responses),
+            "skipped": self.skipped,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None,
+        }
+
+
+# Shared counters, exposed at /status/compression
+compression_stats = CompressionStats()
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses with gzip, brotli or zstd, as negotiated
+    through Accept-Encoding. Bodies under `min_size` are sent unchanged. Streaming
+    responses are compressed chunk by chunk and flushed, so clients still receive
+    each chunk as soon as it is produced. Every response carries Vary: Accept-Encoding,
+    compressed or not, so shared caches never serve one variant for the other.
+    """
+
+    def __init__(self, app, min_size=COMPRESSION_MIN_SIZE, stats=compression_stats):
+        self.app = app
+        self.min_size = min_size
+        self.stats = stats
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict((k.lower(), v) for k, v in scope.get("headers", []))
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            async def send_with_vary(message):
+                if message["type"] == "http.response.start":
+                    message = {**message, "headers": with_vary(message.get("headers", []))}
+                await send(message)
+            await self.app(scope, receive, send_with_vary)
+            return
+        await _CompressedResponse(self, encoding, send).run(scope, receive)
+
+
+class _CompressedResponse:
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.stats = middleware.stats
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.on_send)
+
+    def _eligible(self, message) -> bool:
+        if message["status"] < 200 or message["status"] in (204, 304):
+            return False
+        headers = dict((k.lower(), v) for k, v in message.get("headers", []))
+        if b"content-encoding" in headers:
+            return False
+        content_type = headers.get(b"content-type", b"").decode("latin-1").lower()
+        return not content_type.startswith(INCOMPRESSIBLE_PREFIXES)
+
+    def _compressed_headers(self):
+        headers = []
+        for key, value in self.start.get("headers", []):
+            name = key.lower()
+            if name == b"content-length":
+                continue
+            if name == b"etag" and not value.startswith(b"W/"):
+                value = b"W/" + value  # the compressed bytes differ from the strong validator
+            headers.append((key, value))
+        headers = with_vary(headers)
+        headers.append((b"content-encoding", self.encoding.encode()))
+        return headers
+
+    def _passthrough_start(self):
+        return {**self.start, "headers": with_vary(self.start.get("headers", []))}
+
+    async def on_send(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            self.passthrough = not self._eligible(message)
+            if self.passthrough:
+                self.stats.skipped += 1
+                await self.send(self._passthrough_start())
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.min_size:
+                # Small complete body: not worth the encoding overhead
+                self.passthrough = True
+                self.stats.skipped += 1
+                await self.send(self._passthrough_start())
+                await self.send(message)
+                return
+            self.encoder = ENCODERS[self.encoding]()
+            self.stats.responses[self.encoding] = self.stats.responses.get(self.encoding, 0) + 1
+            await self.send({**self.start, "headers": self._compressed_headers()})
+
+        data = self.encoder.compress(body)
+        data += self.encoder.flush() if more_body else self.encoder.finish()
+        self.stats.bytes_in += len(body)
+        self.stats.bytes_out += len(data)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -1,41 +1,503 @@
-from fastapi import APIRouter, HTTPException
-from typing import Any
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import Any, Dict, List, Optional
+from functools import reduce
+import hashlib
+import json
+import asyncio
+import numpy as np
+import pandas as pd
+from itertools import chain
 from pydantic import BaseModel
-from app.utils.getHistorical import get_historical_data
+from pydantic_core import to_jsonable_python
+from app.utils.getHistorical import (
+    HISTORICAL_BACKEND,
+    HISTORICAL_BACKENDS,
+    HISTORICAL_BATCH_CONCURRENCY,
+    HISTORICAL_BATCH_MAX_QUERIES,
+    HISTORICAL_IMMUTABLE_GRACE,
+    HISTORICAL_IMMUTABLE_MAX_AGE,
+    HISTORICAL_OPEN_MAX_AGE,
+    get_historical_data_async,
+    get_historical_data_local,
+    iter_historical_data,
+)
+from app.utils.historicalCatalog import UnknownTableError, historical_catalog
+from app.utils.historicalFormats import (
+    HISTORICAL_COLUMNS,
+    STREAM_FORMATS,
+    COLUMNAR_FORMATS,
+    negotiate_format,
+    frame_to_arrays,
+    arrays_to_lists,
+    iter_ndjson,
+    iter_json_array,
+    to_columnar_json,
+    to_packed_float64,
+    to_arrow_ipc,
+    utc_timestamps,
+)
+from app.utils.indicators import add_indicators, normalize_spec
+from app.utils.candleCache import naive_utc, utc_now
+from app.utils.resample import DOWNSAMPLE_METHODS, downsample, resample_ohlcv, timeframe_to_timedelta
 
 router = APIRouter()
 
+class IndicatorRequest(BaseModel):
+    name: str  # "sma", "ema", "rsi", "atr", "vwap" or "bollinger"
+    params: Dict[str, float] = {}  # e.g. {"period": 14}; defaults are used for missing ones
+
+
 class HistoricalDataRequest(BaseModel):
     pair: str  # Trading pair, e.g., "BTCUSDT"
     timeframe: str  # Time interval, e.g., "1h"
-    values: str  # Date range, e.g., "start_date|end_date"    
+    values: str  # Date range, e.g., "start_date|end_date"
+    format: str = "records"  # "records", "ndjson", "json-stream", "columnar", "arrow" or "float64"
+    max_points: Optional[int] = None  # Cap on returned candles, e.g. the chart width in pixels
+    target_timeframe: Optional[str] = None  # Resample to a coarser timeframe, e.g. "1h"
+    downsample: str = "ohlcv"  # "ohlcv" merges candles, "lttb" keeps the most significant ones
+    backend: str = HISTORICAL_BACKEND  # "postgres" or "local" (memory-mapped store, see candleStore)
+    indicators: List[IndicatorRequest] = []  # Added as columns named e.g. "rsi_14" or "bollinger_20_2_upper"
 
 
-@router.post("/query-historical-data")
-async def query_historical_data(historical_data_request: HistoricalDataRequest) -> Any:
+class HistoricalQuerySpec(BaseModel):
+    pair: str
+    timeframe: str
+    values: str  # "start_date|end_date"
+
+
+class HistoricalBatchRequest(BaseModel):
+    queries: List[HistoricalQuerySpec]
+    format: str = "records"  # "records" or "columnar"
+    align: Optional[str] = None  # "outer" (union of timestamps) or "inner" (timestamps in every series)
+    max_points: Optional[int] = None
+    target_timeframe: Optional[str] = None
+    downsample: str = "ohlcv"
+    backend: str = HISTORICAL_BACKEND
+    indicators: List[IndicatorRequest] = []
+
+
+async def clip_to_catalog(historical_data_request: HistoricalDataRequest) -> bool:
     """
-    Query historical data from the database for a trading pair.
+    Check the table exists and narrow `values` to the span it covers, before any SQL runs.
+    Bounds with an offset (e.g. "Z" or "+02:00") are converted to naive UTC first, like
+    every catalog and cached timestamp. Returns False when the range cannot contain rows.
+    """
+    try:
+        start_date, end_date = historical_data_request.values.split('|')
+        start_time, end_time = naive_utc(start_date), naive_utc(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="values must be \"start_date|end_date\"")
+    pair, timeframe = historical_data_request.pair, historical_data_request.timeframe
+    try:
+        try:
+            clipped = historical_catalog.resolve(pair, timeframe, start_time, end_time)
+        except UnknownTableError as e:
+            # The table may have been created since the last catalog refresh
+            if await historical_catalog.refresh_table(f"{pair}_{timeframe}") is None:
+                raise HTTPException(status_code=404, detail=str(e))
+            clipped = historical_catalog.resolve(pair, timeframe, start_time, end_time)
+    except TypeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date range: {str(e)}")
+    if clipped is None:
+        return False
+    historical_data_request.values = f"{clipped[0].isoformat()}|{clipped[1].isoformat()}"
+    return True
 
-    Parameters:
-        - request: HistoricalDataRequest object containing query parameters.
 
-    Returns:
-        - A JSON object with the historical data or a message if no data is found.
+def validate_historical_options(historical_data_request: HistoricalDataRequest):
+    """Reject unsupported downsampling options and backends with a 400."""
+    if historical_data_request.downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unsupported downsample method: {historical_data_request.downsample}")
+    if historical_data_request.max_points is not None and historical_data_request.max_points < 3:
+        raise HTTPException(status_code=400, detail="max_points must be at least 3")
+    if historical_data_request.backend not in HISTORICAL_BACKENDS:
+        raise HTTPException(status_code=400, detail=f"Unsupported backend: {historical_data_request.backend}")
+    if historical_data_request.target_timeframe:
+        try:
+            timeframe_to_timedelta(historical_data_request.target_timeframe)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    for indicator in historical_data_request.indicators:
+        try:
+            normalize_spec(indicator.name, indicator.params)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+
+def apply_indicators(result: pd.DataFrame, historical_data_request: HistoricalDataRequest) -> pd.DataFrame:
+    """
+    Add the requested indicator columns. With a target timeframe the candles are
+    resampled first, so indicators are computed on the candles that are returned.
     """
+    specs = [normalize_spec(indicator.name, indicator.params) for indicator in historical_data_request.indicators]
+    table = f"{historical_data_request.pair}_{historical_data_request.timeframe}"
+    start_date, end_date = historical_data_request.values.split('|')
+    if not historical_data_request.target_timeframe:
+        return add_indicators(result, table, historical_data_request.timeframe, pd.Timestamp(start_date), specs)
+
+    # A resampled candle is final once its bucket has ended, both in time and within the range
     try:
-        # Call the function to fetch data
-        result = get_historical_data(
+        base_length = timeframe_to_timedelta(historical_data_request.timeframe)
+    except ValueError:
+        base_length = pd.Timedelta(0)
+    covered_until = min(utc_now(), pd.Timestamp(end_date) + base_length)
+    closed_until = covered_until - timeframe_to_timedelta(historical_data_request.target_timeframe)
+    return add_indicators(
+        resample_ohlcv(result, historical_data_request.target_timeframe),
+        f"{table}>{historical_data_request.target_timeframe}",
+        historical_data_request.target_timeframe,
+        pd.Timestamp(start_date),
+        specs,
+        closed_until=closed_until,
+    )
+
+
+def to_records(result: pd.DataFrame) -> list:
+    """
+    Rows as dictionaries with start_timestamp in UTC (serialized as "...Z", like the
+    streaming formats); NaN (missing values, indicator warm-up) becomes null.
+    """
+    if "start_timestamp" in result.columns:
+        result = result.assign(start_timestamp=utc_timestamps(result["start_timestamp"]))
+    if result.isna().values.any():
+        result = result.astype(object).where(result.notna(), None)
+    return result.to_dict(orient="records")
+
+
+async def load_historical_frame(historical_data_request: HistoricalDataRequest) -> pd.DataFrame:
+    """Clip the range to the catalog, fetch it from the selected backend and downsample it."""
+    if not await clip_to_catalog(historical_data_request):
+        # Outside the span the catalog knows for this table: answer without a query
+        result = pd.DataFrame(columns=HISTORICAL_COLUMNS)
+    else:
+        # Call the function to fetch data (asyncpg or the local store, neither blocks the event loop)
+        fetch = get_historical_data_local if historical_data_request.backend == "local" else get_historical_data_async
+        result = await fetch(
             pair=historical_data_request.pair,
             timeframe=historical_data_request.timeframe,
             values=historical_data_request.values,
         )
+    target_timeframe = historical_data_request.target_timeframe
+    if historical_data_request.indicators and result is not None:
+        result = apply_indicators(result, historical_data_request)
+        target_timeframe = None  # already resampled
+    if (historical_data_request.max_points or target_timeframe) and result is not None:
+        # Size the response to what the client can display
+        result = downsample(
+            result,
+            max_points=historical_data_request.max_points,
+            target_timeframe=target_timeframe,
+            method=historical_data_request.downsample,
+        )
+    return result
+
+
+async def stream_historical_data(historical_data_request: HistoricalDataRequest) -> StreamingResponse:
+    """
+    Stream the range from a server-side cursor. The first batch is fetched before
+    the response starts so query errors still surface as a 500.
+    """
+    batches = iter_historical_data(
+        pair=historical_data_request.pair,
+        timeframe=historical_data_request.timeframe,
+        values=historical_data_request.values,
+    )
+    first = await run_in_threadpool(next, batches, [])
+    batches = chain([first], batches)
+
+    encode = iter_ndjson if historical_data_request.format == "ndjson" else iter_json_array
+    return StreamingResponse(encode(batches), media_type=STREAM_FORMATS[historical_data_request.format])
+
+
+def encode_columnar(result, format: str) -> Response:
+    """Encode a DataFrame as parallel per-column arrays (JSON, Arrow IPC or packed float64)."""
+    if format == "arrow":
+        try:
+            return Response(content=to_arrow_ipc(result), media_type=COLUMNAR_FORMATS[format])
+        except ImportError:
+            raise HTTPException(status_code=406, detail="Arrow format requires pyarrow on the server")
+    if format == "float64":
+        body, headers = to_packed_float64(result)
+        return Response(content=body, media_type=COLUMNAR_FORMATS[format], headers=headers)
+    return Response(content=to_columnar_json(result), media_type=COLUMNAR_FORMATS[format])
+
+
+def prepare_historical_request(historical_data_request: HistoricalDataRequest, format=None, accept=None):
+    """Negotiate the response format and reject invalid option combinations with a 400."""
+    historical_data_request.format = negotiate_format(format or historical_data_request.format, accept)
+    if historical_data_request.format not in ("records", *STREAM_FORMATS, *COLUMNAR_FORMATS):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {historical_data_request.format}")
+    wants_downsampling = historical_data_request.max_points or historical_data_request.target_timeframe
+    if wants_downsampling and historical_data_request.format in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="Downsampling is not available for streaming formats")
+    if historical_data_request.indicators and historical_data_request.format in STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="Indicators are not available for streaming formats")
+    validate_historical_options(historical_data_request)
+
+
+async def respond_historical(historical_data_request: HistoricalDataRequest) -> Any:
+    """Run a prepared request and encode the result in its format."""
+    try:
+        if historical_data_request.format in STREAM_FORMATS:
+            if not await clip_to_catalog(historical_data_request):
+                encode = iter_ndjson if historical_data_request.format == "ndjson" else iter_json_array
+                return StreamingResponse(encode([]), media_type=STREAM_FORMATS[historical_data_request.format])
+            return await stream_historical_data(historical_data_request)
+
+        result = await load_historical_frame(historical_data_request)
+        if historical_data_request.format in COLUMNAR_FORMATS:
+            return encode_columnar(result, historical_data_request.format)
+
         # If data exists, return it as JSON
         if result is not None and not result.empty:
-            return result.to_dict(orient="records")  # Convert DataFrame to a list of dictionaries
+            return to_records(result)  # Convert DataFrame to a list of dictionaries
 
         # If no data is found
         return {"message": "No data found for the given query."}
 
+    except HTTPException:
+        raise
     except Exception as e:
         # Handle exceptions and return an HTTP 500 response
-        raise HTTPException(status_code=500, detail=f"Error querying data: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error querying data: {str(e)}")
+
+
+@router.post("/query-historical-data")
+async def query_historical_data(
+    historical_data_request: HistoricalDataRequest,
+    format: Optional[str] = Query(None),
+    accept: Optional[str] = Header(None),
+) -> Any:
+    """
+    Query historical data from the database for a trading pair.
+
+    Parameters:
+        - request: HistoricalDataRequest object containing query parameters.
+
+    Returns:
+        - A JSON object with the historical data or a message if no data is found.
+        - With format "ndjson" or "json-stream", a streamed response whose memory use
+          does not grow with the size of the range.
+        - With format "columnar", "arrow" or "float64", parallel arrays per column with
+          timestamps as epoch milliseconds. The format can also be chosen with the
+          `format` query parameter or the Accept header.
+        - `target_timeframe` and `max_points` resample or downsample the range on the
+          server before it is encoded.
+        - Unknown pair/timeframe tables return 404. The range is clipped to the span in
+          the historical catalog, and ranges outside it are answered without a query.
+        - `indicators` adds one column per indicator output (SMA, EMA, RSI, ATR,
+          VWAP, Bollinger), computed before `max_points` downsampling and after
+          `target_timeframe` resampling. Results for closed candles are memoized.
+        - `backend` "local" reads from the memory-mapped candle store instead of
+          Postgres. Streaming formats always read from Postgres.
+    """
+    prepare_historical_request(historical_data_request, format, accept)
+    return await respond_historical(historical_data_request)
+
+
+def historical_etag(historical_data_request: HistoricalDataRequest, table_info: dict) -> str:
+    """
+    Strong validator for a clipped range, the options that shape its representation
+    and the table's catalog state, so rows ingested or corrected later change the tag.
+    """
+    key = [
+        table_info["rows"],
+        table_info["max_timestamp"].isoformat(),
+        historical_data_request.pair,
+        historical_data_request.timeframe,
+        historical_data_request.values,
+        historical_data_request.format,
+        historical_data_request.max_points,
+        historical_data_request.target_timeframe,
+        historical_data_request.downsample,
+    ]
+    return '"' + hashlib.sha256(json.dumps(key).encode()).hexdigest()[:32] + '"'
+
+
+def is_immutable_range(historical_data_request: HistoricalDataRequest, table_info: Optional[dict]) -> bool:
+    """
+    True when every candle the clipped range can contain closed over the grace period
+    ago and has been ingested: the range must end at or before the table's last row,
+    or a range cached while ingestion lags behind would stay truncated forever.
+    """
+    if table_info is None or table_info["max_timestamp"] is None:
+        return False
+    try:
+        candle_length = timeframe_to_timedelta(historical_data_request.timeframe)
+    except ValueError:
+        return False
+    end_time = pd.Timestamp(historical_data_request.values.split('|')[1])
+    if end_time > table_info["max_timestamp"]:
+        return False
+    return end_time + candle_length <= utc_now() - pd.Timedelta(seconds=HISTORICAL_IMMUTABLE_GRACE)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Weak comparison (RFC 9110): compressed responses carry the same tag as W/"..."
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+@router.get("/historical-data/{pair}/{timeframe}")
+async def get_historical_range(
+    pair: str,
+    timeframe: str,
+    start: str,
+    end: str,
+    format: Optional[str] = Query(None),
+    max_points: Optional[int] = None,
+    target_timeframe: Optional[str] = None,
+    downsample: str = "ohlcv",
+    backend: str = HISTORICAL_BACKEND,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+) -> Any:
+    """
+    Cacheable GET variant of /query-historical-data for the range [start, end].
+
+    Ranges entirely in the past get a strong ETag and an immutable Cache-Control,
+    and a matching If-None-Match is answered with 304 before any query runs.
+    Ranges that include the open candle get a short max-age.
+    """
+    historical_data_request = HistoricalDataRequest(
+        pair=pair,
+        timeframe=timeframe,
+        values=f"{start}|{end}",
+        max_points=max_points,
+        target_timeframe=target_timeframe,
+        downsample=downsample,
+        backend=backend,
+    )
+    prepare_historical_request(historical_data_request, format, accept)
+    has_rows = await clip_to_catalog(historical_data_request)
+
+    headers = {"Vary": "Accept"}
+    table_info = historical_catalog.table(pair, timeframe)
+    if has_rows and is_immutable_range(historical_data_request, table_info):
+        etag = historical_etag(historical_data_request, table_info)
+        headers["ETag"] = etag
+        headers["Cache-Control"] = f"public, max-age={HISTORICAL_IMMUTABLE_MAX_AGE}, immutable"
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+    else:
+        headers["Cache-Control"] = f"public, max-age={HISTORICAL_OPEN_MAX_AGE}"
+
+    result = await respond_historical(historical_data_request)
+    if isinstance(result, Response):
+        result.headers.update(headers)
+        return result
+    # Encoded like the POST response (pydantic), so both give identical timestamps
+    return JSONResponse(content=to_jsonable_python(result), headers=headers)
+
+
+def align_series(frames: dict, how: str) -> dict:
+    """
+    Put every series on one start_timestamp index (epoch ms): the union of their
+    timestamps for "outer", the timestamps they all share for "inner".
+    Missing candles are null.
+    """
+    arrays = {key: frame_to_arrays(df) for key, df in frames.items()}
+    combine = np.union1d if how == "outer" else np.intersect1d
+    timestamps = [a["start_timestamp"] for a in arrays.values()]
+    index = reduce(combine, timestamps) if timestamps else np.empty(0, dtype=np.int64)
+
+    series = {}
+    for key, columns in arrays.items():
+        ts = columns["start_timestamp"]
+        positions = np.minimum(np.searchsorted(ts, index), max(len(ts) - 1, 0))
+        present = ts[positions] == index if len(ts) else np.zeros(len(index), dtype=bool)
+        aligned = {}
+        for column in columns:
+            if column == "start_timestamp":
+                continue
+            values = np.full(len(index), np.nan)
+            values[present] = columns[column][positions[present]]
+            aligned[column] = values
+        series[key] = arrays_to_lists(aligned)
+    return {"start_timestamp": index.tolist(), "series": series}
+
+
+@router.post("/query-historical-data/batch")
+async def query_historical_data_batch(batch_request: HistoricalBatchRequest) -> Any:
+    """
+    Run several (pair, timeframe, range) queries concurrently, at most
+    HISTORICAL_BATCH_CONCURRENCY at a time, and return them in one response.
+
+    Returns:
+        - {"results": [...]} in request order, each with the rows in the requested
+          format or the error for that query.
+        - With `align`, {"start_timestamp": [...], "series": {"PAIR_TF": {column: [...]}},
+          "errors": [...]}: columnar arrays on a common timestamp index.
+    """
+    if not batch_request.queries:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(batch_request.queries) > HISTORICAL_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {HISTORICAL_BATCH_MAX_QUERIES} queries")
+    if batch_request.format not in ("records", "columnar"):
+        raise HTTPException(status_code=400, detail=f"Unsupported batch format: {batch_request.format}")
+    if batch_request.align not in (None, "outer", "inner"):
+        raise HTTPException(status_code=400, detail=f"Unsupported alignment: {batch_request.align}")
+    keys = [f"{spec.pair}_{spec.timeframe}" for spec in batch_request.queries]
+    if batch_request.align and len(set(keys)) != len(keys):
+        raise HTTPException(status_code=400, detail="Aligned batches cannot repeat a pair and timeframe")
+
+    requests = [
+        HistoricalDataRequest(
+            pair=spec.pair,
+            timeframe=spec.timeframe,
+            values=spec.values,
+            max_points=batch_request.max_points,
+            target_timeframe=batch_request.target_timeframe,
+            downsample=batch_request.downsample,
+            backend=batch_request.backend,
+            indicators=batch_request.indicators,
+        )
+        for spec in batch_request.queries
+    ]
+    validate_historical_options(requests[0])
+
+    slots = asyncio.Semaphore(HISTORICAL_BATCH_CONCURRENCY)
+
+    async def run(historical_data_request):
+        async with slots:
+            try:
+                return await load_historical_frame(historical_data_request), None
+            except HTTPException as e:
+                return None, {"status_code": e.status_code, "detail": e.detail}
+            except Exception as e:
+                return None, {"status_code": 500, "detail": f"Error querying data: {str(e)}"}
+
+    outcomes = await asyncio.gather(*(run(request) for request in requests))
+
+    errors = [
+        {"pair": spec.pair, "timeframe": spec.timeframe, **error}
+        for spec, (_, error) in zip(batch_request.queries, outcomes)
+        if error is not None
+    ]
+    if batch_request.align:
+        frames = {key: df for key, (df, error) in zip(keys, outcomes) if error is None}
+        return {**align_series(frames, batch_request.align), "errors": errors}
+
+    results = []
+    for spec, (df, error) in zip(batch_request.queries, outcomes):
+        item = {"pair": spec.pair, "timeframe": spec.timeframe, "values": spec.values}
+        if error is not None:
+            item["error"] = error
+        elif batch_request.format == "columnar":
+            item["rows"] = len(df)
+            item["data"] = arrays_to_lists(frame_to_arrays(df))
+        else:
+            item["rows"] = len(df)
+            item["data"] = to_records(df)
+        results.append(item)
+    return {"results": results}
+
+
+@router.get("/historical/catalog")
+async def get_historical_catalog() -> Any:
+    """Row counts and start_timestamp span of every historical candle table."""
+    return historical_catalog.snapshot()
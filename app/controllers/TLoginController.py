@@ -7,7 +7,7 @@ from app.schemas.TLoginSchema import TLogin as TLoginSchema, TLoginCreate
 from app.database import get_db
 from sqlalchemy.exc import SQLAlchemyError
 import os
-from redis import asyncio as aioredis
+from app.redis_client import get_redis
 import hmac
 import hashlib
 import os
@@ -20,25 +20,12 @@ from fastapi import FastAPI
 creation_date=datetime.now(timezone.utc)
 
 app = FastAPI()
-redis_client = None
 
 SECRET_KEY = os.getenv("JWT_SECRET")
 JWT_EXPIRATION = 3 * 24 * 60 * 60  # 3 days
 JWT_SECRET = os.getenv("JWT_SECRET")
 JWT_ALGORITHM = "HS256"
 
-async def startup_event():
-    global redis_client
-    try:
-        redis_client = aioredis.from_url(os.getenv("REDIS_URL"))
-        await redis_client.ping()
-    except Exception as e:
-        print(f"Redis connection error: {e}")
-        redis_client = None
-
-async def get_redis():
-    return redis_client
-
 router = APIRouter()
 
 async def verify_telegram_hash(data: dict, bot_token: str) -> bool:
@@ -149,7 +136,7 @@ async def read_login_by_wallet(wallet_address: str, db: AsyncSession = Depends(g
         cached_login = await redis_client.get(f"user_data_wallet:{wallet_address}")
         if cached_login:
             try:
-                user = TLogin.model_validate_json(cached_login)
+                user = TLoginSchema.model_validate_json(cached_login)
             except Exception:
                 user = None
             else:
@@ -163,7 +150,11 @@ async def read_login_by_wallet(wallet_address: str, db: AsyncSession = Depends(g
 
     # Cache in Redis
     if redis_client:
-        await redis_client.set(f"user_data_wallet:{wallet_address}", user.json(), ex=JWT_EXPIRATION)
+        await redis_client.set(
+            f"user_data_wallet:{wallet_address}",
+            TLoginSchema.model_validate(user).model_dump_json(),
+            ex=JWT_EXPIRATION,
+        )
 
     return await build_login_response(user)
 
@@ -205,7 +196,11 @@ async def read_login(token: str, db: AsyncSession = Depends(get_db)):
 
     # Step 4 – Cache the result
     if redis_client:
-        await redis_client.set(f"user_data:{token}", login.json(), ex=60 * 60 * 3)  # 3 hours
+        await redis_client.set(
+            f"user_data:{token}",
+            TLoginSchema.model_validate(login).model_dump_json(),
+            ex=60 * 60 * 3,  # 3 hours
+        )
 
     return login
 
@@ -26,12 +26,28 @@ ssl_context = ssl.create_default_context()
 ssl_context.check_hostname = False
 ssl_context.verify_mode = ssl.CERT_NONE
 
+# Connection pool settings shared by every engine (async and psycopg2)
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),  # connections kept open
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),  # extra connections under load
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),  # seconds to wait for a checkout
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # seconds before a connection is replaced
+    "pool_pre_ping": True,
+}
+
 # Async SQLAlchemy engine with SSL
 engine = create_async_engine(
     DATABASE_URL,
     echo=True,
-    connect_args={"ssl": ssl_context}
+    connect_args={"ssl": ssl_context},
+    **POOL_OPTIONS
+)
+
+# Async engine for the historical candles database (same credentials as operations.py)
+HISTORICAL_DATABASE_URL = os.getenv("HISTORICAL_DATABASE_URL") or (
+    f"postgresql+asyncpg://{os.getenv('USR')}:{os.getenv('PASSWD')}@{os.getenv('HOST')}:5432/{os.getenv('DATABASE_HISTORICAL')}"
 )
+historical_engine = create_async_engine(HISTORICAL_DATABASE_URL, **POOL_OPTIONS)
 
 # Async session local
 AsyncSessionLocal = sessionmaker(
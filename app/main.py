@@ -1,19 +1,39 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 import asyncio
+import os
 
 from app.routes import (
     status_router,
     tlogin_router,
     orderly_router,
+    signal_router,
 )
 from app.utils.dailyVolume import run_periodically
+from app.redis_client import init_redis, close_redis
+from app.compression import CompressionMiddleware
+from app.utils.historicalCatalog import historical_catalog
+from app.utils.orderlyClient import close_orderly_client
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+# Scheduled jobs run on Celery beat (app/tasks); set to true to run them in the API process instead
+BACKGROUND_JOBS_IN_PROCESS = os.getenv("BACKGROUND_JOBS_IN_PROCESS", "false").lower() in ("1", "true", "yes")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    asyncio.create_task(run_periodically(interval_hours=1))
+    await init_redis()  # Shared async Redis pool for every cache
+    if BACKGROUND_JOBS_IN_PROCESS:
+        asyncio.create_task(run_periodically(interval_hours=1))
+    # Table spans used to validate historical queries; if the historical DB is down the
+    # API still starts, passes requests through unvalidated and retries on the next refresh
+    await historical_catalog.refresh(full=True)
+    asyncio.create_task(historical_catalog.run_periodically())
     yield  # After startup
-    # Optional cleanup
+    await close_orderly_client()  # Keep-alive connections to the Orderly API
+    await close_redis()
 
 app = FastAPI(
     title="Crypto Trading API",
@@ -22,10 +42,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# gzip / brotli / zstd responses, negotiated per request through Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+
 # Routers
 app.include_router(status_router, prefix="/api/v1/central", tags=["Status"])
 app.include_router(tlogin_router, prefix="/api/v1/central", tags=["TLogin"])
 app.include_router(orderly_router, prefix="/api/v1/central", tags=["Orderly"])
+app.include_router(signal_router, prefix="/api/v1/central", tags=["Signals"])
 
 # run update of tables
 # alembic init alembic solo la primera vez
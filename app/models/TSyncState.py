@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, Date, DateTime, BigInteger
+from app.database import Base
+
+class TSyncState(Base):
+    __tablename__ = 't_sync_state'
+
+    name = Column(String(64), primary_key=True)  # e.g. "orderly_broker_daily_volume"
+    watermark = Column(Date, nullable=True)  # last date whose data is final and stored
+    last_run = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)
+    fence = Column(BigInteger, nullable=True)  # highest leader fencing token that wrote this sync
+
+    def __repr__(self):
+        return f'<TSyncState {self.name} {self.watermark}>'
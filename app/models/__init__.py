@@ -1,3 +1,4 @@
 from .TBotStatus import TBotStatus
 from .TLogin import TLogin
-from .TVolumeRecord import TVolumeRecord
\ No newline at end of file
+from .TVolumeRecord import TVolumeRecord
+from .TSyncState import TSyncState
\ No newline at end of file
@@ -0,0 +1,63 @@
+import os
+import logging
+from typing import Optional
+from redis import asyncio as aioredis
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+REDIS_URL = os.getenv("REDIS_URL")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+
+logger = logging.getLogger(__name__)
+
+# Shared async connection pool, created in the FastAPI lifespan
+redis_pool: Optional[aioredis.ConnectionPool] = None
+redis_client: Optional[aioredis.Redis] = None
+
+
+async def init_redis() -> Optional[aioredis.Redis]:
+    """Create the shared Redis pool. Leaves the client as None if Redis is unreachable."""
+    global redis_pool, redis_client
+    if redis_client is not None:
+        return redis_client
+    if not REDIS_URL:
+        logger.warning("REDIS_URL is not set, Redis caching disabled")
+        return None
+
+    pool = aioredis.ConnectionPool.from_url(
+        REDIS_URL,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    )
+    client = aioredis.Redis(connection_pool=pool)
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.error(f"Redis connection error: {e}")
+        await client.aclose()
+        await pool.disconnect()
+        return None
+
+    redis_pool, redis_client = pool, client
+    return redis_client
+
+
+async def close_redis() -> None:
+    """Close the shared client and release every pooled connection."""
+    global redis_pool, redis_client
+    if redis_client is not None:
+        await redis_client.aclose()
+    if redis_pool is not None:
+        await redis_pool.disconnect()
+    redis_pool, redis_client = None, None
+
+
+async def get_redis() -> Optional[aioredis.Redis]:
+    """Dependency returning the shared Redis client, or None when Redis is unavailable."""
+    return redis_client
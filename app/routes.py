@@ -1,16 +1,33 @@
-from multiprocessing.pool import AsyncResult
 from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlalchemy.ext.asyncio import AsyncSession
 from celery.result import AsyncResult
-from typing import Union
+from typing import List, Union
 from app.controllers.TLoginController import create_tlogin, read_login_by_wallet, read_login
-from app.database import get_db
+from app.controllers.OrderlyController import router as orderly_controller_router
+from app.database import get_db, AsyncSessionLocal
+from app.utils.authCache import token_cache
+from app.utils.operations import get_pool_stats
+from app.utils.candleCache import candle_cache
+from app.utils.indicators import indicator_cache
+from app.compression import compression_stats
+from app.utils import asyncOperations
+from app.tasks.celery_app import celery_app
+from app.tasks.jobs import signal_batch
 
 # Define the router
 status_router = APIRouter()
 tlogin_router = APIRouter()
 orderly_router = APIRouter()
+signal_router = APIRouter()
+
+# Historical data endpoints live in OrderlyController
+orderly_router.include_router(orderly_controller_router)
+
+# Upper bound on the number of rows accepted by a single batch request
+SIGNAL_BATCH_MAX_ROWS = 10000
 
 
 class TLoginCreateRequest(BaseModel):
@@ -53,15 +70,171 @@ async def read_login_by_wallet_route(wallet_address: str, db: AsyncSession = Dep
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
     
 @tlogin_router.get("/tlogin/validate/{token}", include_in_schema=False)
-async def validate_token_route(token: str, db: AsyncSession = Depends(get_db)):
+async def validate_token_route(token: str):
     """
     Fast lightweight endpoint to validate JWT token for NGINX auth_request.
     It reuses the full logic from `read_login()` but returns only 200/403/404.
+    Recently validated tokens are answered from an in-process cache without
+    touching Redis or the database.
     """
+    if token_cache.is_valid(token):
+        return Response(status_code=200)  # ✅ Cached valid token
+
     try:
-        await read_login(token, db=db)  # ← reuse your JWT logic
+        # Only open a session on a cache miss; `async with` closes it on HTTPException too
+        async with AsyncSessionLocal() as db:
+            await read_login(token, db=db)  # ← reuse your JWT logic
+        token_cache.add(token)
         return Response(status_code=200)  # ✅ Valid token
     except HTTPException as e:
         if e.status_code in (403, 404):
             raise e  # ❌ Invalid token or not found
-        raise HTTPException(status_code=500, detail="Internal validation error")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal validation error")
+
+
+@status_router.get("/status/db-pools")
+async def db_pool_stats_route():
+    """
+    Endpoint to inspect the database connection pools (size, checked out, overflow).
+    """
+    return get_pool_stats()
+
+
+@status_router.get("/status/candle-cache")
+async def candle_cache_stats_route():
+    """
+    Endpoint to inspect the historical candle chunk cache (size, hits, evictions).
+    """
+    return candle_cache.stats()
+
+
+@status_router.get("/status/indicator-cache")
+async def indicator_cache_stats_route():
+    """
+    Endpoint to inspect the memoized indicator results (size, hits, rows computed).
+    """
+    return indicator_cache.stats()
+
+
+@status_router.get("/status/compression")
+async def compression_stats_route():
+    """
+    Endpoint to inspect response compression (encodings offered, bytes in and out).
+    """
+    return compression_stats.as_dict()
+
+
+@status_router.get("/tasks/{task_id}")
+async def task_status_route(task_id: str):
+    """
+    Endpoint to poll a background task: state (PENDING, STARTED, SUCCESS, FAILURE, ...)
+    and its result or error once finished. Unknown ids stay PENDING.
+    """
+    def read():
+        result = AsyncResult(task_id, app=celery_app)
+        response = {"task_id": task_id, "status": result.state, "name": result.name}
+        if result.successful():
+            response["result"] = result.result
+        elif result.failed():
+            response["error"] = repr(result.result)
+        return response
+
+    try:
+        return await run_in_threadpool(read)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Task backend unavailable: {str(e)}")
+
+
+class SignalKey(BaseModel):
+    token: int
+    pair: str
+    timeframe: str
+
+
+class SignalStateItem(SignalKey):
+    signal: int
+
+
+class SignalThresholdItem(SignalKey):
+    gain_threshold: float
+    stop_loss_threshold: float
+
+
+class SignalCreateItem(SignalThresholdItem):
+    signal: int
+
+
+def _check_batch_size(items: list):
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > SIGNAL_BATCH_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {SIGNAL_BATCH_MAX_ROWS} rows")
+
+
+def _keys(items: list) -> list:
+    return [(item.token, item.pair, item.timeframe) for item in items]
+
+
+async def _enqueue_signal_batch(operation: str, items: list):
+    """Hand a batch to the Celery worker; poll /tasks/{task_id} for the outcomes."""
+    try:
+        # Publishing talks to the broker synchronously: keep it off the event loop
+        task = await run_in_threadpool(signal_batch.delay, operation, [item.model_dump() for item in items])
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Task queue unavailable: {str(e)}")
+    return JSONResponse(status_code=202, content={"task_id": task.id, "status_url": f"/api/v1/central/tasks/{task.id}"})
+
+
+@signal_router.post("/signals/batch/state")
+async def start_stop_signals_batch_route(items: List[SignalStateItem], background: bool = False):
+    """
+    Endpoint to start/stop many bots at once with a single UPDATE.
+    Returns one outcome per item: updated, not_found, duplicate or error.
+    With ?background=true the batch runs on the Celery worker and a task id is returned.
+    """
+    _check_batch_size(items)
+    if background:
+        return await _enqueue_signal_batch("state", items)
+    return await asyncOperations.startStopBotOpBatch(_keys(items), [item.signal for item in items])
+
+
+@signal_router.post("/signals/batch/thresholds")
+async def update_thresholds_batch_route(items: List[SignalThresholdItem], background: bool = False):
+    """
+    Endpoint to update gain/stop-loss thresholds of many signals with a single UPDATE.
+    """
+    _check_batch_size(items)
+    if background:
+        return await _enqueue_signal_batch("thresholds", items)
+    return await asyncOperations.updateThresholdBatch(
+        _keys(items),
+        [item.gain_threshold for item in items],
+        [item.stop_loss_threshold for item in items],
+    )
+
+
+@signal_router.post("/signals/batch")
+async def add_signals_batch_route(items: List[SignalCreateItem], background: bool = False):
+    """
+    Endpoint to create many signals with a single INSERT.
+    """
+    _check_batch_size(items)
+    if background:
+        return await _enqueue_signal_batch("create", items)
+    return await asyncOperations.addTsignalBatch(
+        _keys(items),
+        [item.signal for item in items],
+        [item.gain_threshold for item in items],
+        [item.stop_loss_threshold for item in items],
+    )
+
+
+@signal_router.post("/signals/batch/reset")
+async def reset_signals_batch_route(items: List[SignalKey], background: bool = False):
+    """
+    Endpoint to delete many signals with a single DELETE.
+    """
+    _check_batch_size(items)
+    if background:
+        return await _enqueue_signal_batch("reset", items)
+    return await asyncOperations.resetTokenSignalBatch(_keys(items))
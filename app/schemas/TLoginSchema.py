@@ -13,6 +13,7 @@ class TLoginCreate(TLoginBase):
 
 class TLogin(TLoginBase):
     id: int
+    creation_date: Optional[datetime] = None
 
     class Config:
         from_attributes = True  # ✅ Pydantic v2 replacement for orm_mode
@@ -0,0 +1,53 @@
+# Celery app for background work, kept off the API event loop.
+#
+#   celery -A app.tasks.celery_app.celery_app worker --loglevel=warning --concurrency=2 --queues=central
+#   celery -A app.tasks.celery_app.celery_app beat --loglevel=info
+#
+# Beat replaces the in-process loops started by the FastAPI lifespan; set
+# BACKGROUND_JOBS_IN_PROCESS=true to keep running them inside the API instead.
+import os
+from celery import Celery
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL") or os.getenv("REDIS_URL") or "redis://localhost:6379/0"
+CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND") or CELERY_BROKER_URL
+CELERY_QUEUE = os.getenv("CELERY_QUEUE", "central")
+CELERY_RESULT_EXPIRES = int(os.getenv("CELERY_RESULT_EXPIRES", "86400"))  # seconds task results are kept
+VOLUME_SYNC_INTERVAL_SECONDS = float(os.getenv("VOLUME_SYNC_INTERVAL_SECONDS", "3600"))
+CANDLE_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("CANDLE_MAINTENANCE_INTERVAL_SECONDS", "86400"))
+FEE_DISTRIBUTION_INTERVAL_SECONDS = float(os.getenv("FEE_DISTRIBUTION_INTERVAL_SECONDS", "3600"))
+
+celery_app = Celery("central", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND, include=["app.tasks.jobs"])
+
+celery_app.conf.update(
+    task_default_queue=CELERY_QUEUE,
+    task_serializer="json",
+    result_serializer="json",
+    accept_content=["json"],
+    result_expires=CELERY_RESULT_EXPIRES,
+    result_extended=True,  # keep the task name and arguments with the result
+    task_track_started=True,
+    task_acks_late=True,  # a task lost with its worker is redelivered
+    worker_prefetch_multiplier=1,  # long jobs: do not reserve tasks another worker could run
+    timezone="UTC",
+    beat_schedule={
+        "orderly-volume-sync": {
+            "task": "app.tasks.jobs.sync_orderly_volume",
+            "schedule": VOLUME_SYNC_INTERVAL_SECONDS,
+            "options": {"expires": VOLUME_SYNC_INTERVAL_SECONDS},
+        },
+        "candle-null-timestamp-cleanup": {
+            "task": "app.tasks.jobs.clean_candle_tables",
+            "schedule": CANDLE_MAINTENANCE_INTERVAL_SECONDS,
+            "options": {"expires": CANDLE_MAINTENANCE_INTERVAL_SECONDS},
+        },
+        "broker-fee-distribution": {
+            "task": "app.tasks.jobs.distribute_broker_fees",
+            "schedule": FEE_DISTRIBUTION_INTERVAL_SECONDS,
+            "options": {"expires": FEE_DISTRIBUTION_INTERVAL_SECONDS},
+        },
+    },
+)
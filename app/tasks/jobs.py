@@ -0,0 +1,94 @@
+# Celery tasks. Each task runs its async job in a fresh event loop with
+# asyncio.run; pooled connections are bound to that loop, so the engines, Redis
+# pool and Orderly client are closed before it ends.
+import asyncio
+import datetime
+import logging
+from app.tasks.celery_app import celery_app
+from app.database import engine, historical_engine
+from app.redis_client import init_redis, close_redis
+from app.utils import asyncOperations
+from app.utils.leaderLock import run_once_as_leader
+from app.utils.orderlyClient import orderly_client
+from app.utils.candleMaintenance import MAINTENANCE_NAME, clean_null_timestamps
+from app.utils.dailyVolume import SYNC_NAME, run_volume_sync, backfill_broker_daily_volume
+from app.utils.feeDistribution import FEE_DISTRIBUTION_NAME, distribute_fees
+
+# Logger
+logger = logging.getLogger(__name__)
+
+
+def run_async(job):
+    """Run `job()` (an async callable) to completion in a new event loop."""
+    async def runner():
+        await init_redis()
+        try:
+            return await job()
+        finally:
+            await orderly_client.close()
+            await close_redis()
+            await engine.dispose()
+            await historical_engine.dispose()
+
+    return asyncio.run(runner())
+
+
+def _guarded(name, job):
+    # Beat may fire again while a long run is still going: skip instead of overlapping.
+    # `job` is called with the lease's fencing token (see leaderLock)
+    ran, result = run_async(lambda: run_once_as_leader(name, job))
+    return result if ran else {"skipped": f"{name} is already running"}
+
+
+@celery_app.task
+def sync_orderly_volume():
+    result = _guarded(SYNC_NAME, run_volume_sync)
+    if result is None:
+        raise RuntimeError("Orderly volume sync failed, see the worker log")
+    return result
+
+
+@celery_app.task
+def backfill_orderly_volume(start: str, end: str):
+    """Re-sync [start, end] (YYYY-MM-DD) without moving the watermark, never alongside the sync."""
+    start, end = datetime.date.fromisoformat(start), datetime.date.fromisoformat(end)
+    result = _guarded(SYNC_NAME, lambda token: backfill_broker_daily_volume(start, end, token))
+    if result is None:
+        raise RuntimeError(f"Orderly volume backfill {start} to {end} failed, see the worker log")
+    return result
+
+
+@celery_app.task
+def clean_candle_tables(tables=None, vacuum=False):
+    """Delete NULL-timestamp rows from the candle tables (see candleMaintenance)."""
+    return _guarded(MAINTENANCE_NAME, lambda token: clean_null_timestamps(tables, vacuum=vacuum, token=token))
+
+
+@celery_app.task
+def distribute_broker_fees(until: str = None):
+    """Distribute the broker fee share of finalized days, up to `until` (YYYY-MM-DD) or the volume watermark."""
+    until = datetime.date.fromisoformat(until) if until else None
+    report = _guarded(FEE_DISTRIBUTION_NAME, lambda token: distribute_fees(until, token=token))
+    if report is None:
+        raise RuntimeError("Fee distribution lost its leader lease and was cancelled, see the worker log")
+    if report.get("error"):
+        raise RuntimeError(f"Fee distribution failed: {report['error']}")
+    return report
+
+
+# operation -> (batch function, item fields passed after the keys)
+SIGNAL_BATCH_OPERATIONS = {
+    "state": (asyncOperations.startStopBotOpBatch, ("signal",)),
+    "thresholds": (asyncOperations.updateThresholdBatch, ("gain_threshold", "stop_loss_threshold")),
+    "create": (asyncOperations.addTsignalBatch, ("signal", "gain_threshold", "stop_loss_threshold")),
+    "reset": (asyncOperations.resetTokenSignalBatch, ()),
+}
+
+
+@celery_app.task
+def signal_batch(operation: str, items: list):
+    """Run one of the /signals/batch operations for `items` (dicts with token, pair, timeframe, ...)."""
+    function, fields = SIGNAL_BATCH_OPERATIONS[operation]
+    keys = [(item["token"], item["pair"], item["timeframe"]) for item in items]
+    values = [[item[field] for item in items] for field in fields]
+    return run_async(lambda: function(keys, *values))
@@ -0,0 +1,433 @@
+# Native asyncio counterparts of the helpers in operations.py.
+# Functions keep their synchronous names, so callers can switch with
+# `from app.utils import asyncOperations as operations`.
+# Statements are parameterized and run on the pooled asyncpg engine from app.database.
+import logging
+import pandas as pd
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import engine
+
+# Logger
+logger = logging.getLogger(__name__)
+
+
+def quote_table(table_name: str) -> str:
+    """Quote a table name as a Postgres identifier in the public schema."""
+    return 'public."{}"'.format(table_name.replace('"', '""'))
+
+
+async def _execute(sql: str, params: dict = None) -> int:
+    """Run one write statement in its own transaction and return the affected row count."""
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(text(sql), params or {})
+            return result.rowcount
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return 0
+
+
+async def _fetchone(sql: str, params: dict = None):
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(sql), params or {})
+            return result.fetchone()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return None
+
+
+async def _fetchall(sql: str, params: dict = None):
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(sql), params or {})
+            return result.fetchall()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return None
+
+
+# Users
+async def getUser(token: int):
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT * FROM t_login WHERE token = :token"), {"token": token})
+            rows = result.fetchall()
+            if not rows:
+                return None
+            return pd.DataFrame(rows, columns=list(result.keys()))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return None
+
+
+async def validatOwner(token: int):
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT * FROM t_login WHERE token = :token AND is_owner = True"),
+                {"token": token},
+            )
+            rows = result.fetchall()
+            if not rows:
+                return None
+            return pd.DataFrame(rows, columns=list(result.keys()))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return None
+
+
+async def store_user(token, api_key, api_secret, name, last_name, is_owner=False) -> int:
+    return await _execute(
+        """
+        INSERT INTO t_login(token, api_key, api_secret, name, last_name, is_owner)
+        VALUES (:token, :api_key, :api_secret, :name, :last_name, :is_owner)
+        ON CONFLICT (token) DO UPDATE
+        SET api_key = EXCLUDED.api_key,
+            api_secret = EXCLUDED.api_secret,
+            name = EXCLUDED.name,
+            last_name = EXCLUDED.last_name
+        """,
+        {
+            "token": token,
+            "api_key": api_key,
+            "api_secret": api_secret,
+            "name": name,
+            "last_name": last_name,
+            "is_owner": is_owner,
+        },
+    )
+
+
+async def startStopSignalOp(data) -> int:
+    want_signal, token = data
+    return await _execute(
+        "UPDATE t_login SET want_signal = :want_signal WHERE token = :token",
+        {"want_signal": want_signal, "token": token},
+    )
+
+
+async def del_user(token: int) -> int:
+    """Delete every trading row of a (non-owner) user in a single transaction."""
+    sql_statements = [
+        "DELETE FROM t_signal WHERE token = :token",
+        "DELETE FROM capital WHERE token = :token",
+        "DELETE FROM capital_trader_gainers WHERE token = :token",
+        "DELETE FROM t_bot_status WHERE token = :token",
+        "DELETE FROM trader_gainers WHERE token = :token",
+        "DELETE FROM t_login WHERE token = :token AND is_owner = False",
+    ]
+    try:
+        async with engine.begin() as conn:
+            gcount = 0
+            for sql in sql_statements:
+                result = await conn.execute(text(sql), {"token": token})
+                gcount += result.rowcount
+            return gcount
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        return 0
+
+
+# Signals
+async def getSignal(token: int, pair: str, timeframe: str):
+    return await _fetchone(
+        "SELECT * FROM t_signal WHERE token = :token AND pair = :pair AND timeframe = :timeframe",
+        {"token": token, "pair": pair, "timeframe": timeframe},
+    )
+
+
+async def addTsignal(data) -> int:
+    signal, token, pair, timeframe, gain_threshold, stop_loss_threshold = data
+    return await _execute(
+        """
+        INSERT INTO t_signal (signal, token, pair, timeframe, gain_threshold, stop_loss_threshold)
+        VALUES (:signal, :token, :pair, :timeframe, :gain_threshold, :stop_loss_threshold)
+        """,
+        {
+            "signal": signal,
+            "token": token,
+            "pair": pair,
+            "timeframe": timeframe,
+            "gain_threshold": gain_threshold,
+            "stop_loss_threshold": stop_loss_threshold,
+        },
+    )
+
+
+async def resetTokenSignal(data) -> int:
+    token, pair, timeframe = data
+    return await _execute(
+        "DELETE FROM t_signal WHERE token = :token AND pair = :pair AND timeframe = :timeframe",
+        {"token": token, "pair": pair, "timeframe": timeframe},
+    )
+
+
+async def startStopBotOp(data) -> int:
+    signal, token, pair, timeframe = data
+    return await _execute(
+        "UPDATE t_signal SET signal = :signal WHERE token = :token AND pair = :pair AND timeframe = :timeframe",
+        {"signal": signal, "token": token, "pair": pair, "timeframe": timeframe},
+    )
+
+
+async def updateThreshold(data) -> int:
+    gain_threshold, stop_loss_threshold, token, pair, timeframe = data
+    return await _execute(
+        """
+        UPDATE t_signal SET gain_threshold = :gain_threshold, stop_loss_threshold = :stop_loss_threshold
+        WHERE token = :token AND pair = :pair AND timeframe = :timeframe
+        """,
+        {
+            "gain_threshold": gain_threshold,
+            "stop_loss_threshold": stop_loss_threshold,
+            "token": token,
+            "pair": pair,
+            "timeframe": timeframe,
+        },
+    )
+
+
+# Capital
+async def resetToken(data) -> int:
+    token, pair, timeframe = data
+    return await _execute(
+        "DELETE FROM capital WHERE token = :token AND pair = :pair AND timeframe = :timeframe",
+        {"token": token, "pair": pair, "timeframe": timeframe},
+    )
+
+
+async def get_capital_info(token: int):
+    results = await _fetchall(
+        "SELECT pair, timeframe, capital, crypto_amount FROM public.capital WHERE token = :token",
+        {"token": token},
+    )
+    if not results:
+        return None  # No matching token found
+    # Format the crypto_amount to 4 decimal places for each row
+    return [
+        (pair, timeframe, capital, round(float(crypto_amount), 4))
+        for pair, timeframe, capital, crypto_amount in results
+    ]
+
+
+async def startStopBotAutoGainers(data) -> int:
+    signal, token = data
+    return await _execute(
+        "UPDATE capital_trader_gainers SET signal = :signal WHERE token = :token",
+        {"signal": signal, "token": token},
+    )
+
+
+async def getCapitalGainers(token: int):
+    result = await _fetchone(
+        "SELECT capital FROM capital_trader_gainers WHERE token = :token",
+        {"token": token},
+    )
+    if result is None:
+        return None
+    return result[0]
+
+
+async def store_capital_gainer(token: int, capital) -> int:
+    return await _execute(
+        """
+        INSERT INTO capital_trader_gainers(token, capital)
+        VALUES (:token, :capital)
+        ON CONFLICT (token) DO UPDATE
+        SET capital = EXCLUDED.capital
+        """,
+        {"token": token, "capital": capital},
+    )
+
+
+# Scalper
+async def add_scalper(data) -> int:
+    columns = [
+        "token", "pair", "timeframe", "capital", "crypto_amount", "crypto_remaining", "timestamp",
+        "rowcount", "position", "last_partial_exit_price", "partial_exit_done", "signal", "first_trade",
+        "entry_price", "stop_loss_percentage", "profit_target_from", "profit_target_to",
+        "partial_exit_threshold_from", "partial_exit_threshold_to", "exit_remaining_percentage_from",
+        "exit_remaining_percentage_to", "partial_exit_amount",
+    ]
+    sql = "INSERT INTO scalper ({}) VALUES ({})".format(
+        ", ".join(columns), ", ".join(f":{c}" for c in columns)
+    )
+    return await _execute(sql, dict(zip(columns, data)))
+
+
+# Training
+async def addTraining(pair_timeframe: str) -> int:
+    return await _execute(
+        "INSERT INTO training_in_progress (pair_timeframe) VALUES (:pair_timeframe)",
+        {"pair_timeframe": pair_timeframe},
+    )
+
+
+async def deleteTraining(pair_timeframe: str) -> int:
+    return await _execute(
+        "DELETE FROM training_in_progress WHERE pair_timeframe = :pair_timeframe",
+        {"pair_timeframe": pair_timeframe},
+    )
+
+
+async def getTraining(pair_timeframe: str):
+    return await _fetchone(
+        "SELECT * FROM training_in_progress WHERE pair_timeframe = :pair_timeframe",
+        {"pair_timeframe": pair_timeframe},
+    )
+
+
+# Maintenance
+async def remove_null_timestamps(table_name: str) -> int:
+    return await _execute(f'DELETE FROM {quote_table(table_name)} WHERE "timestamp" IS NULL')
+
+
+async def remove_null_from_sql_table(table_name: str) -> int:
+    return await remove_null_timestamps(table_name)
+
+
+# Batched signal control: one set-based statement per call, in one transaction
+def _broadcast(values, size):
+    """Accept either one value for every key or one value per key."""
+    if isinstance(values, (list, tuple)):
+        if len(values) != size:
+            raise ValueError(f"Expected {size} values, got {len(values)}")
+        return list(values)
+    return [values] * size
+
+
+def _dedupe_keys(keys):
+    """
+    Split (token, pair, timeframe) keys into the first occurrence of each key and
+    an outcome list in request order; repeated keys are reported as duplicates.
+    """
+    outcomes = []
+    positions = []
+    seen = set()
+    for i, (token, pair, timeframe) in enumerate(keys):
+        key = (int(token), pair, timeframe)
+        outcomes.append({"token": key[0], "pair": pair, "timeframe": timeframe, "status": None})
+        if key in seen:
+            outcomes[i]["status"] = "duplicate"
+            continue
+        seen.add(key)
+        positions.append(i)
+    return outcomes, positions
+
+
+async def _run_batch(sql: str, params: dict, outcomes, positions, hit: str, miss: str, returns_rows: bool = True):
+    """
+    Execute a batch statement in one transaction. When `returns_rows` is set the
+    statement must return the 1-based ordinality of every matched input row.
+    """
+    if not positions:
+        return outcomes
+    try:
+        async with engine.begin() as conn:
+            result = await conn.execute(text(sql), params)
+            if returns_rows:
+                matched = {row[0] for row in result.fetchall()}
+            else:
+                matched = set(range(1, len(positions) + 1))
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        for i in positions:
+            outcomes[i]["status"] = "error"
+        return outcomes
+
+    for ordinality, i in enumerate(positions, start=1):
+        outcomes[i]["status"] = hit if ordinality in matched else miss
+    return outcomes
+
+
+def _key_params(keys, positions):
+    return {
+        "tokens": [int(keys[i][0]) for i in positions],
+        "pairs": [keys[i][1] for i in positions],
+        "timeframes": [keys[i][2] for i in positions],
+    }
+
+
+async def startStopBotOpBatch(keys, signals):
+    """
+    Set `signal` for many (token, pair, timeframe) keys in a single UPDATE.
+    `signals` is one value for every key or a list aligned with `keys`.
+    """
+    keys = list(keys)
+    signals = _broadcast(signals, len(keys))
+    outcomes, positions = _dedupe_keys(keys)
+    params = _key_params(keys, positions)
+    params["signals"] = [int(signals[i]) for i in positions]
+    sql = """
+        UPDATE t_signal AS s SET signal = v.signal
+        FROM unnest(
+            CAST(:tokens AS bigint[]), CAST(:pairs AS text[]),
+            CAST(:timeframes AS text[]), CAST(:signals AS integer[])
+        ) WITH ORDINALITY AS v(token, pair, timeframe, signal, idx)
+        WHERE s.token = v.token AND s.pair = v.pair AND s.timeframe = v.timeframe
+        RETURNING v.idx
+    """
+    return await _run_batch(sql, params, outcomes, positions, "updated", "not_found")
+
+
+async def updateThresholdBatch(keys, gain_thresholds, stop_loss_thresholds):
+    """Set gain/stop-loss thresholds for many keys in a single UPDATE."""
+    keys = list(keys)
+    gain_thresholds = _broadcast(gain_thresholds, len(keys))
+    stop_loss_thresholds = _broadcast(stop_loss_thresholds, len(keys))
+    outcomes, positions = _dedupe_keys(keys)
+    params = _key_params(keys, positions)
+    params["gains"] = [float(gain_thresholds[i]) for i in positions]
+    params["stops"] = [float(stop_loss_thresholds[i]) for i in positions]
+    sql = """
+        UPDATE t_signal AS s
+        SET gain_threshold = v.gain_threshold, stop_loss_threshold = v.stop_loss_threshold
+        FROM unnest(
+            CAST(:tokens AS bigint[]), CAST(:pairs AS text[]), CAST(:timeframes AS text[]),
+            CAST(:gains AS double precision[]), CAST(:stops AS double precision[])
+        ) WITH ORDINALITY AS v(token, pair, timeframe, gain_threshold, stop_loss_threshold, idx)
+        WHERE s.token = v.token AND s.pair = v.pair AND s.timeframe = v.timeframe
+        RETURNING v.idx
+    """
+    return await _run_batch(sql, params, outcomes, positions, "updated", "not_found")
+
+
+async def resetTokenSignalBatch(keys):
+    """Delete the t_signal rows of many keys in a single DELETE."""
+    keys = list(keys)
+    outcomes, positions = _dedupe_keys(keys)
+    params = _key_params(keys, positions)
+    sql = """
+        DELETE FROM t_signal AS s
+        USING unnest(
+            CAST(:tokens AS bigint[]), CAST(:pairs AS text[]), CAST(:timeframes AS text[])
+        ) WITH ORDINALITY AS v(token, pair, timeframe, idx)
+        WHERE s.token = v.token AND s.pair = v.pair AND s.timeframe = v.timeframe
+        RETURNING v.idx
+    """
+    return await _run_batch(sql, params, outcomes, positions, "deleted", "not_found")
+
+
+async def addTsignalBatch(keys, signals, gain_thresholds, stop_loss_thresholds):
+    """Insert t_signal rows for many keys in a single INSERT ... SELECT."""
+    keys = list(keys)
+    signals = _broadcast(signals, len(keys))
+    gain_thresholds = _broadcast(gain_thresholds, len(keys))
+    stop_loss_thresholds = _broadcast(stop_loss_thresholds, len(keys))
+    outcomes, positions = _dedupe_keys(keys)
+    params = _key_params(keys, positions)
+    params["signals"] = [int(signals[i]) for i in positions]
+    params["gains"] = [float(gain_thresholds[i]) for i in positions]
+    params["stops"] = [float(stop_loss_thresholds[i]) for i in positions]
+    sql = """
+        INSERT INTO t_signal (signal, token, pair, timeframe, gain_threshold, stop_loss_threshold)
+        SELECT * FROM unnest(
+            CAST(:signals AS integer[]), CAST(:tokens AS bigint[]), CAST(:pairs AS text[]),
+            CAST(:timeframes AS text[]), CAST(:gains AS double precision[]),
+            CAST(:stops AS double precision[])
+        )
+    """
+    # A single INSERT either stores every row or none of them
+    return await _run_batch(sql, params, outcomes, positions, "inserted", "error", returns_rows=False)
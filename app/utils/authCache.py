@@ -0,0 +1,101 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import jwt
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+
+
+class TokenValidationCache:
+    """
+    Bounded in-process LRU of tokens that already passed `read_login`.
+
+    Entries are keyed by the SHA-256 of the token (raw JWTs are never kept in
+    memory) and expire at the earlier of the token's `exp` claim and `ttl`.
+    """
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl: int = AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def is_valid(self, token: str) -> bool:
+        """Return True if the token was validated recently and has not expired."""
+        key = self._key(token)
+        now = time.time()
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                self.misses += 1
+                return False
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return False
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def add(self, token: str, exp: Optional[float] = None) -> None:
+        """
+        Remember a token that was just validated.
+
+        If `exp` is not given it is read from the token without verifying the
+        signature again; callers must only pass tokens that were already verified.
+        """
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        if exp is None:
+            try:
+                exp = jwt.decode(token, options={"verify_signature": False}).get("exp")
+            except jwt.PyJWTError:
+                return
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= time.time():
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str) -> None:
+        with self._lock:
+            self._entries.pop(self._key(token), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+# Shared instance used by the NGINX auth_request endpoint
+token_cache = TokenValidationCache()
@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+CANDLE_CACHE_ENABLED = os.getenv("CANDLE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+CANDLE_CACHE_MAX_BYTES = int(os.getenv("CANDLE_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+CANDLE_CACHE_OPEN_TTL = float(os.getenv("CANDLE_CACHE_OPEN_TTL", "30"))  # seconds
+CANDLE_CACHE_CLOSE_GRACE = float(os.getenv("CANDLE_CACHE_CLOSE_GRACE", "600"))  # seconds after a day ends
+
+# Ranges are split into chunks aligned on this boundary
+CHUNK_SIZE = pd.Timedelta(days=1)
+
+
+def utc_now() -> pd.Timestamp:
+    return pd.Timestamp.now(tz="UTC").tz_localize(None)
+
+
+def naive_utc(value) -> pd.Timestamp:
+    """A timestamp as naive UTC, the convention of every cached frame and catalog bound."""
+    value = pd.Timestamp(value)
+    return value.tz_convert("UTC").tz_localize(None) if value.tzinfo is not None else value
+
+
+def naive_timestamps(series) -> pd.Series:
+    """start_timestamp values as naive UTC datetimes, whatever the column type."""
+    ts = pd.to_datetime(series)
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_convert(None)
+    return ts
+
+
+class CandleRangeCache:
+    """
+    In-process cache of OHLCV rows split into day-aligned chunks per table.
+
+    A day is kept until evicted once it is closed and the table is known to hold
+    rows past its end (`written_through`, from the historical catalog); any other
+    day, including one whose candles may still be landing, gets a short TTL.
+    Memory is bounded by `max_bytes` with LRU eviction.
+    """
+
+    def __init__(self, max_bytes=CANDLE_CACHE_MAX_BYTES, open_ttl=CANDLE_CACHE_OPEN_TTL, close_grace=CANDLE_CACHE_CLOSE_GRACE):
+        self.max_bytes = max_bytes
+        self.open_ttl = open_ttl
+        self.close_grace = pd.Timedelta(seconds=close_grace)
+        # (table, day) -> (frame, nbytes, expires_at or None)
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def chunk_days(start: pd.Timestamp, end: pd.Timestamp):
+        """Day chunks covering the inclusive range [start, end]."""
+        return list(pd.date_range(start.floor(CHUNK_SIZE), end.floor(CHUNK_SIZE), freq=CHUNK_SIZE))
+
+    def plan(self, table: str, start: pd.Timestamp, end: pd.Timestamp):
+        """
+        Return the cached chunks for the range and the runs of consecutive missing
+        days as half-open (run_start, run_end) intervals.
+        """
+        cached = {}
+        missing_runs = []
+        now = time.time()
+        with self._lock:
+            for day in self.chunk_days(start, end):
+                entry = self._chunks.get((table, day))
+                if entry is not None and (entry[2] is None or entry[2] > now):
+                    self._chunks.move_to_end((table, day))
+                    cached[day] = entry[0]
+                    self.hits += 1
+                    continue
+                if entry is not None:
+                    self._drop((table, day))
+                self.misses += 1
+                if missing_runs and missing_runs[-1][1] == day:
+                    missing_runs[-1] = (missing_runs[-1][0], day + CHUNK_SIZE)
+                else:
+                    missing_runs.append((day, day + CHUNK_SIZE))
+        return cached, missing_runs
+
+    def store(self, table: str, df: pd.DataFrame, run_start: pd.Timestamp, run_end: pd.Timestamp, written_through=None):
+        """
+        Split rows fetched for [run_start, run_end) into day chunks and cache them.
+        `written_through` is the newest start_timestamp known to be in the table.
+        start_timestamp is stored as naive UTC datetime64[ns] whichever loader produced
+        it (psycopg2 returns tz-aware values, the asyncpg decoder naive ones), so chunks
+        from both concatenate without falling back to object dtype.
+        """
+        days = list(pd.date_range(run_start, run_end - CHUNK_SIZE, freq=CHUNK_SIZE))
+        df = df.assign(start_timestamp=naive_timestamps(df["start_timestamp"]).astype("datetime64[ns]"))
+        timestamps = df["start_timestamp"].to_numpy()
+        bounds = np.searchsorted(timestamps, np.array([d.to_datetime64() for d in days] + [run_end.to_datetime64()], dtype="datetime64[ns]"))
+        # Days ending before this are closed and followed by rows already in the table
+        final_before = None
+        if written_through is not None:
+            final_before = min(utc_now() - self.close_grace, naive_utc(written_through))
+        chunks = {}
+        for i, day in enumerate(days):
+            chunk = df.iloc[bounds[i]:bounds[i + 1]].reset_index(drop=True)
+            chunks[day] = chunk
+            final = final_before is not None and day + CHUNK_SIZE <= final_before
+            expires_at = None if final else time.time() + self.open_ttl
+            self._put((table, day), chunk, expires_at)
+        return chunks
+
+    def _put(self, key, chunk: pd.DataFrame, expires_at):
+        nbytes = int(chunk.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._chunks:
+                self._drop(key)
+            self._chunks[key] = (chunk, nbytes, expires_at)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and self._chunks:
+                self._drop(next(iter(self._chunks)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, nbytes, _ = self._chunks.pop(key)
+        self.bytes -= nbytes
+
+    @staticmethod
+    def assemble(chunks: dict, start: pd.Timestamp, end: pd.Timestamp, columns) -> pd.DataFrame:
+        """Concatenate day chunks in order and trim to the inclusive range [start, end]."""
+        frames = [chunks[day] for day in sorted(chunks) if not chunks[day].empty]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        ts = naive_timestamps(df["start_timestamp"])
+        return df[(ts >= start) & (ts <= end)].reset_index(drop=True)
+
+    def get_range(self, table: str, start: pd.Timestamp, end: pd.Timestamp, loader, columns, written_through=None) -> pd.DataFrame:
+        """
+        Serve [start, end] from cached chunks, calling `loader(run_start, run_end)`
+        once per run of missing days.
+        """
+        cached, missing_runs = self.plan(table, start, end)
+        for run_start, run_end in missing_runs:
+            cached.update(self.store(table, loader(run_start, run_end), run_start, run_end, written_through))
+        return self.assemble(cached, start, end, columns)
+
+    async def get_range_async(self, table: str, start: pd.Timestamp, end: pd.Timestamp, loader, columns, written_through=None) -> pd.DataFrame:
+        """Same as get_range with an awaitable `loader(run_start, run_end)`."""
+        cached, missing_runs = self.plan(table, start, end)
+        for run_start, run_end in missing_runs:
+            cached.update(self.store(table, await loader(run_start, run_end), run_start, run_end, written_through))
+        return self.assemble(cached, start, end, columns)
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "chunks": len(self._chunks),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Shared instance used by get_historical_data
+candle_cache = CandleRangeCache()
@@ -0,0 +1,188 @@
+# Index management for the "{pair}_{timeframe}" candle tables.
+# Every table gets an index on start_timestamp (range filters and ORDER BY), by
+# default a unique B-tree also used as the dedupe constraint. Indexes are built
+# with CREATE INDEX CONCURRENTLY, so the connection must be in autocommit mode.
+#
+#   python -m app.utils.candleIndexes [TABLE ...] [--method brin --no-unique] [--dedupe] [--check-only]
+#
+# The Alembic revision alembic/versions/*_candle_table_indexes.py creates the same
+# default (unique B-tree) indexes with its own inlined copy of this DDL.
+import sys
+import json
+import hashlib
+import argparse
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.utils import operations
+from app.utils.asyncOperations import quote_table
+
+INDEX_METHODS = ("btree", "brin")
+
+
+def discover_candle_tables(conn):
+    """Tables in the public schema with a start_timestamp column."""
+    result = conn.execute(text("""
+    SELECT table_name FROM information_schema.columns
+    WHERE table_schema = 'public' AND column_name = 'start_timestamp'
+    ORDER BY table_name
+    """))
+    return [row[0] for row in result]
+
+
+def index_name(table, method="btree", unique=True):
+    suffix = "start_timestamp_key" if unique else f"start_timestamp_{method}"
+    name = f"{table}_{suffix}"
+    if len(name) > 63:  # Postgres identifier limit
+        name = f"{table[:40]}_{hashlib.sha1(table.encode()).hexdigest()[:8]}_{suffix}"
+    return name
+
+
+def existing_indexes(conn, table):
+    """
+    Indexes whose first key column is start_timestamp (indkey is 0-based), with method,
+    uniqueness, validity, number of key columns and whether they are partial.
+    """
+    result = conn.execute(text("""
+    SELECT i.relname, am.amname, x.indisunique, x.indisvalid, c.conname IS NOT NULL,
+           x.indnkeyatts, x.indpred IS NOT NULL
+    FROM pg_index x
+    JOIN pg_class i ON i.oid = x.indexrelid
+    JOIN pg_am am ON am.oid = i.relam
+    JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = x.indkey[0]
+    LEFT JOIN pg_constraint c ON c.conindid = x.indexrelid AND c.contype = 'u'
+    WHERE x.indrelid = to_regclass(:qualified) AND a.attname = 'start_timestamp'
+    """), {"qualified": quote_table(table)})
+    return [
+        {"name": name, "method": method, "unique": unique, "valid": valid, "constraint": constraint,
+         "key_columns": key_columns, "partial": partial}
+        for name, method, unique, valid, constraint, key_columns, partial in result
+    ]
+
+
+def covers_range_queries(ix, method="btree", unique=True):
+    """
+    Whether an existing index is the one ensure_index would build: valid, of `method`,
+    not partial, and when `unique`, unique on start_timestamp alone (a unique index
+    on (start_timestamp, x) does not prevent duplicate timestamps).
+    """
+    if not ix["valid"] or ix["partial"] or ix["method"] != method:
+        return False
+    return not unique or (ix["unique"] and ix["key_columns"] == 1)
+
+
+def count_duplicates(conn, table):
+    result = conn.execute(text(f"""
+    SELECT count(*) - count(DISTINCT start_timestamp) FROM {quote_table(table)} WHERE start_timestamp IS NOT NULL
+    """))
+    return result.scalar()
+
+
+def delete_duplicates(conn, table):
+    """Keep one row per start_timestamp (the first physical one) and delete the rest."""
+    result = conn.execute(text(f"""
+    DELETE FROM {quote_table(table)} t
+    USING {quote_table(table)} d
+    WHERE t.start_timestamp = d.start_timestamp AND t.ctid > d.ctid
+    """))
+    return result.rowcount
+
+
+def uses_seq_scan(conn, table):
+    """
+    EXPLAIN a one-day range query at the end of the table and return whether the
+    planner reads the table sequentially. Tiny tables may legitimately do so.
+    """
+    bounds = conn.execute(text(f"SELECT max(start_timestamp) FROM {quote_table(table)}")).scalar()
+    if bounds is None:
+        return None
+    result = conn.execute(text(f"""
+    EXPLAIN (FORMAT JSON)
+    SELECT start_timestamp, low, high, volume, open, close FROM {quote_table(table)}
+    WHERE start_timestamp >= CAST(:end_time AS timestamp) - interval '1 day' AND start_timestamp <= :end_time
+    ORDER BY 1
+    """), {"end_time": bounds})
+    plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    return "Seq Scan" in json.dumps(plan)
+
+
+def ensure_index(conn, table, method="btree", unique=True, dedupe=False, check_only=False):
+    """
+    Make sure `table` has a valid index on start_timestamp of the requested kind.
+    Returns a report dict; errors are reported rather than raised.
+    """
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unsupported index method: {method}")
+    if unique and method != "btree":
+        raise ValueError("Only B-tree indexes can be unique")
+
+    report = {"table": table, "index": index_name(table, method, unique), "method": method, "unique": unique}
+    try:
+        indexes = existing_indexes(conn, table)
+        matching = [ix for ix in indexes if covers_range_queries(ix, method, unique)]
+        if matching:
+            report.update(action="exists", index=matching[0]["name"])
+        elif check_only:
+            report["action"] = "missing"
+        else:
+            if unique:
+                duplicates = count_duplicates(conn, table)
+                if duplicates and not dedupe:
+                    report.update(action="failed", error=f"{duplicates} duplicate start_timestamp rows (run with --dedupe)")
+                    report["seq_scan"] = uses_seq_scan(conn, table)
+                    return report
+                if duplicates:
+                    report["deleted_duplicates"] = delete_duplicates(conn, table)
+
+            # A failed concurrent build leaves an invalid index behind: drop it first
+            invalid = [ix for ix in indexes if ix["name"] == report["index"] and not ix["valid"]]
+            if invalid:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS public."{report["index"]}"'))
+            conn.execute(text(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX CONCURRENTLY IF NOT EXISTS "{report["index"]}" '
+                f'ON {quote_table(table)} USING {method} (start_timestamp)'
+            ))
+            if unique:
+                conn.execute(text(
+                    f'ALTER TABLE {quote_table(table)} ADD CONSTRAINT "{report["index"]}" UNIQUE USING INDEX "{report["index"]}"'
+                ))
+            conn.execute(text(f"ANALYZE {quote_table(table)}"))
+            report["action"] = "rebuilt" if invalid else "created"
+        report["seq_scan"] = uses_seq_scan(conn, table)
+    except SQLAlchemyError as e:
+        report.update(action="failed", error=str(e).splitlines()[0])
+    return report
+
+
+def ensure_candle_indexes(conn, tables=None, method="btree", unique=True, dedupe=False, check_only=False):
+    """Run ensure_index over the given tables, or every candle table on the connection."""
+    return [
+        ensure_index(conn, table, method=method, unique=unique, dedupe=dedupe, check_only=check_only)
+        for table in (tables or discover_candle_tables(conn))
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ensure start_timestamp indexes on the historical candle tables")
+    parser.add_argument("tables", nargs="*", help="tables to index, e.g. BTC_1h (default: every candle table)")
+    parser.add_argument("--method", choices=INDEX_METHODS, default="btree")
+    parser.add_argument("--no-unique", dest="unique", action="store_false", help="plain index, no dedupe constraint")
+    parser.add_argument("--dedupe", action="store_true", help="delete duplicate start_timestamp rows before building a unique index")
+    parser.add_argument("--check-only", action="store_true", help="only report missing indexes and sequential scans")
+    args = parser.parse_args()
+    if args.method == "brin" and args.unique:
+        parser.error("BRIN indexes cannot be unique, add --no-unique")
+
+    with operations.db_con_historical.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        reports = ensure_candle_indexes(conn, args.tables, args.method, args.unique, args.dedupe, args.check_only)
+
+    for report in reports:
+        line = f"{report['table']}: {report['action']} {report['index']}"
+        if report.get("deleted_duplicates"):
+            line += f" ({report['deleted_duplicates']} duplicates deleted)"
+        if report.get("error"):
+            line += f" - {report['error']}"
+        if report.get("seq_scan"):
+            line += " - range queries use a sequential scan"
+        print(line)
+    sys.exit(1 if any(report["action"] in ("failed", "missing") for report in reports) else 0)
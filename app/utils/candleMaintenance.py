@@ -0,0 +1,201 @@
+# Maintenance job removing rows with a NULL timestamp from the candle tables.
+# Unlike remove_null_from_sql_table (one unbounded DELETE per table), each table is
+# walked in physical page ranges (ctid), one short transaction per range. The range
+# size adapts to a per-batch time budget, and tables are processed a few at a time.
+# A batch that hits lock_timeout (e.g. behind a long ingest) is retried with backoff.
+# The column defaults to "timestamp", like the legacy helpers; tables without it are skipped.
+# Under a leader lease the fencing token is checked in the central database before
+# every batch, so a superseded leader stops at its next batch (see leaderLock).
+#
+#   python -m app.utils.candleMaintenance [TABLE ...] [--vacuum] [--concurrency 2]
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError, DBAPIError
+from app.database import historical_engine
+from app.utils.asyncOperations import quote_table
+from app.utils.leaderLock import check_fence, StaleLeaderError
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+MAINTENANCE_CONCURRENCY = int(os.getenv("MAINTENANCE_CONCURRENCY", "2"))  # tables cleaned at once
+MAINTENANCE_BATCH_SECONDS = float(os.getenv("MAINTENANCE_BATCH_SECONDS", "0.5"))  # target time per batch
+MAINTENANCE_BATCH_PAGES = int(os.getenv("MAINTENANCE_BATCH_PAGES", "1000"))  # initial pages per batch
+MAINTENANCE_MAX_BATCH_PAGES = int(os.getenv("MAINTENANCE_MAX_BATCH_PAGES", "100000"))
+MAINTENANCE_PAUSE_SECONDS = float(os.getenv("MAINTENANCE_PAUSE_SECONDS", "0.05"))  # between batches
+MAINTENANCE_TABLE_BUDGET = float(os.getenv("MAINTENANCE_TABLE_BUDGET", "300"))  # seconds per table per run
+MAINTENANCE_LOCK_TIMEOUT = os.getenv("MAINTENANCE_LOCK_TIMEOUT", "2s")
+MAINTENANCE_LOCK_RETRIES = int(os.getenv("MAINTENANCE_LOCK_RETRIES", "5"))  # retries of a batch that hit lock_timeout
+MAINTENANCE_LOCK_BACKOFF = float(os.getenv("MAINTENANCE_LOCK_BACKOFF", "1"))  # seconds before the first retry, doubled each time
+MAINTENANCE_NULL_COLUMN = os.getenv("MAINTENANCE_NULL_COLUMN", "timestamp")  # column checked for NULL
+LOCK_NOT_AVAILABLE = "55P03"  # SQLSTATE raised when lock_timeout expires
+MAINTENANCE_NAME = "candle_maintenance"  # leader lease and t_sync_state fence
+
+# Logger
+logger = logging.getLogger(__name__)
+
+
+async def list_candle_tables():
+    async with historical_engine.connect() as conn:
+        result = await conn.execute(text("""
+        SELECT table_name FROM information_schema.columns
+        WHERE table_schema = 'public' AND column_name = 'start_timestamp'
+        ORDER BY table_name
+        """))
+        return [row[0] for row in result]
+
+
+async def _table_pages(table):
+    async with historical_engine.connect() as conn:
+        result = await conn.execute(text(
+            "SELECT pg_relation_size(to_regclass(:qualified)) / current_setting('block_size')::bigint"
+        ), {"qualified": quote_table(table)})
+        pages = result.scalar()
+        return None if pages is None else int(pages)
+
+
+async def _has_column(table, column):
+    async with historical_engine.connect() as conn:
+        result = await conn.execute(text("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = :table AND column_name = :column
+        """), {"table": table, "column": column})
+        return result.scalar() is not None
+
+
+def is_lock_timeout(error):
+    return isinstance(error, DBAPIError) and getattr(error.orig, "sqlstate", None) == LOCK_NOT_AVAILABLE
+
+
+def lock_backoff(retry):
+    """Seconds to wait before retry `retry` (0-based) of a batch: exponential with jitter."""
+    return MAINTENANCE_LOCK_BACKOFF * 2 ** retry * random.uniform(0.5, 1.0)
+
+
+async def _delete_batch(table, column, first_page, last_page):
+    """Delete NULL rows stored in pages [first_page, last_page) in one short transaction."""
+    async with historical_engine.begin() as conn:
+        await conn.execute(text(f"SET LOCAL lock_timeout = '{MAINTENANCE_LOCK_TIMEOUT}'"))
+        result = await conn.execute(text(f"""
+        DELETE FROM {quote_table(table)}
+        WHERE ctid >= ('(' || CAST(:first_page AS bigint) || ',0)')::tid
+          AND ctid < ('(' || CAST(:last_page AS bigint) || ',0)')::tid
+          AND "{column.replace('"', '""')}" IS NULL
+        """), {"first_page": first_page, "last_page": last_page})
+        return result.rowcount
+
+
+async def _delete_batch_retrying(table, column, first_page, last_page, report):
+    """_delete_batch, retried with backoff while it fails on lock_timeout."""
+    retry = 0
+    while True:
+        try:
+            return await _delete_batch(table, column, first_page, last_page)
+        except DBAPIError as e:
+            if not is_lock_timeout(e) or retry >= MAINTENANCE_LOCK_RETRIES:
+                raise
+            delay = lock_backoff(retry)
+            retry += 1
+            report["lock_retries"] += 1
+            logger.warning(f"{table}: lock timeout on pages {first_page}-{last_page}, retry {retry} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+async def vacuum_table(table):
+    # VACUUM cannot run inside a transaction block
+    async with historical_engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text(f"VACUUM (ANALYZE) {quote_table(table)}"))
+
+
+async def clean_table(table, column=MAINTENANCE_NULL_COLUMN, vacuum=False, budget=MAINTENANCE_TABLE_BUDGET, token=None):
+    """
+    Delete rows where `column` is NULL from one table, page range by page range.
+    Returns a report; when the time budget runs out or the leader `token` turns
+    stale the table is left incomplete.
+    """
+    started = time.perf_counter()
+    report = {"table": table, "column": column, "rows_deleted": 0, "batches": 0, "pages_scanned": 0, "lock_retries": 0}
+    try:
+        total_pages = await _table_pages(table)
+        if total_pages is None:
+            report.update(complete=False, error="table not found", seconds=0.0)
+            return report
+        if not await _has_column(table, column):
+            logger.warning(f"{table}: no {column} column, skipped")
+            report.update(complete=True, skipped=f"no {column} column", seconds=0.0)
+            return report
+        report["pages_total"] = total_pages
+        page, batch_pages = 0, MAINTENANCE_BATCH_PAGES
+        while page < total_pages:
+            if time.perf_counter() - started > budget:
+                break
+            batch_started = time.perf_counter()
+            last_page = min(page + batch_pages, total_pages)
+            await check_fence(token, MAINTENANCE_NAME)
+            report["rows_deleted"] += await _delete_batch_retrying(table, column, page, last_page, report)
+            report["batches"] += 1
+            report["pages_scanned"] += last_page - page
+            page = last_page
+
+            # Keep each batch close to the time budget
+            elapsed = time.perf_counter() - batch_started
+            if elapsed < MAINTENANCE_BATCH_SECONDS / 2:
+                batch_pages = min(batch_pages * 2, MAINTENANCE_MAX_BATCH_PAGES)
+            elif elapsed > MAINTENANCE_BATCH_SECONDS:
+                batch_pages = max(batch_pages // 2, 1)
+            await asyncio.sleep(MAINTENANCE_PAUSE_SECONDS)
+
+        report["complete"] = page >= total_pages
+        if vacuum and report["complete"] and report["rows_deleted"]:
+            await vacuum_table(table)
+            report["vacuumed"] = True
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        report.update(complete=False, error=str(e).splitlines()[0])
+    except StaleLeaderError as e:
+        logger.error(f"{table}: {str(e)}")
+        report.update(complete=False, error=str(e))
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+async def clean_null_timestamps(tables=None, column=MAINTENANCE_NULL_COLUMN, vacuum=False, concurrency=MAINTENANCE_CONCURRENCY, token=None):
+    """Run clean_table over the given tables (default: every candle table), `concurrency` at a time."""
+    tables = tables or await list_candle_tables()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(table):
+        async with slots:
+            report = await clean_table(table, column, vacuum, token=token)
+            logger.info(f"{table}: {report['rows_deleted']} rows deleted in {report['seconds']}s")
+            return report
+
+    return await asyncio.gather(*(run(table) for table in tables))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete rows with a NULL timestamp from the historical candle tables")
+    parser.add_argument("tables", nargs="*", help="tables to clean, e.g. BTC_1h (default: every candle table)")
+    parser.add_argument("--column", default=MAINTENANCE_NULL_COLUMN, help="column checked for NULL (default: %(default)s)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM (ANALYZE) tables that had rows deleted")
+    parser.add_argument("--concurrency", type=int, default=MAINTENANCE_CONCURRENCY)
+    args = parser.parse_args()
+
+    reports = asyncio.run(clean_null_timestamps(args.tables, args.column, args.vacuum, args.concurrency))
+    for report in reports:
+        status = "done" if report.get("complete") else "incomplete"
+        line = f"{report['table']}: {report['rows_deleted']} rows deleted, {report['batches']} batches, {report['seconds']}s ({status})"
+        if report.get("lock_retries"):
+            line += f", {report['lock_retries']} lock retries"
+        if report.get("error") or report.get("skipped"):
+            line += f" - {report.get('error') or report['skipped']}"
+        print(line)
+    sys.exit(0 if all(report.get("complete") for report in reports) else 1)
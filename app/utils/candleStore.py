@@ -0,0 +1,213 @@
+import os
+import sys
+import fcntl
+import argparse
+from itertools import chain
+import threading
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+from app.utils import operations
+from app.utils.candleCache import utc_now
+from app.utils.historicalFormats import HISTORICAL_COLUMNS
+from app.utils.resample import timeframe_to_timedelta
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+CANDLE_STORE_DIR = os.getenv("CANDLE_STORE_DIR", "data/candles")
+CANDLE_STORE_SYNC_BATCH_SIZE = int(os.getenv("CANDLE_STORE_SYNC_BATCH_SIZE", "50000"))
+
+# One file per column: timestamps as int64 epoch milliseconds, values as float64
+COLUMN_DTYPES = {column: np.float64 for column in HISTORICAL_COLUMNS}
+COLUMN_DTYPES["start_timestamp"] = np.int64
+
+
+def _column_file(column):
+    return f"{column}.{np.dtype(COLUMN_DTYPES[column]).str[1:]}"  # e.g. "low.f8"
+
+
+class CandleStore:
+    """
+    Append-only columnar mirror of the "{pair}_{timeframe}" tables.
+
+    Each table is a directory holding one little-endian file per column, sorted by
+    start_timestamp. The timestamp file is always written last, so its length is
+    the committed row count; reads memory-map the files and slice them in place.
+    Only closed candles are stored, so rows never change once written.
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        # table -> (row count, {column: memmap})
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _path(self, table, name=""):
+        return os.path.join(self.root, table, name)
+
+    def row_count(self, table) -> int:
+        try:
+            return os.path.getsize(self._path(table, _column_file("start_timestamp"))) // 8
+        except FileNotFoundError:
+            return 0
+
+    def has_table(self, table) -> bool:
+        return self.row_count(table) > 0
+
+    def tables(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if self.has_table(name))
+
+    def _columns(self, table):
+        """Memory maps covering the committed rows, reopened only when the table grew."""
+        rows = self.row_count(table)
+        with self._lock:
+            cached = self._maps.get(table)
+            if cached is not None and cached[0] == rows:
+                return rows, cached[1]
+            maps = {}
+            if rows:
+                for column, dtype in COLUMN_DTYPES.items():
+                    maps[column] = np.memmap(self._path(table, _column_file(column)), dtype=np.dtype(dtype).newbyteorder("<"), mode="r", shape=(rows,))
+            self._maps[table] = (rows, maps)
+            return rows, maps
+
+    def last_timestamp(self, table):
+        """Newest stored start_timestamp, or None for an empty table."""
+        rows, maps = self._columns(table)
+        if not rows:
+            return None
+        return pd.Timestamp(int(maps["start_timestamp"][-1]), unit="ms")
+
+    def read_arrays(self, table, start: pd.Timestamp, end: pd.Timestamp, end_inclusive=True) -> dict:
+        """
+        Zero-copy views of every column for start <= start_timestamp <= end,
+        located by binary search on the timestamp file.
+        """
+        rows, maps = self._columns(table)
+        if not rows:
+            return {column: np.empty(0, dtype=dtype) for column, dtype in COLUMN_DTYPES.items()}
+        timestamps = maps["start_timestamp"]
+        lo = int(np.searchsorted(timestamps, start.value // 1_000_000, side="left"))
+        hi = int(np.searchsorted(timestamps, end.value // 1_000_000, side="right" if end_inclusive else "left"))
+        return {column: values[lo:hi] for column, values in maps.items()}
+
+    def read_range(self, table, start: pd.Timestamp, end: pd.Timestamp, end_inclusive=True) -> pd.DataFrame:
+        """The same rows as get_historical_data, as a DataFrame."""
+        arrays = self.read_arrays(table, start, end, end_inclusive)
+        df = pd.DataFrame({column: arrays[column] for column in HISTORICAL_COLUMNS[1:]}, copy=False)
+        df.insert(0, "start_timestamp", arrays["start_timestamp"].astype("datetime64[ms]").astype("datetime64[ns]"))
+        return df
+
+    def _repair(self, table, rows):
+        # Drop values appended after the last committed timestamp (interrupted sync)
+        for column, dtype in COLUMN_DTYPES.items():
+            path = self._path(table, _column_file(column))
+            if os.path.exists(path) and os.path.getsize(path) != rows * np.dtype(dtype).itemsize:
+                os.truncate(path, rows * np.dtype(dtype).itemsize)
+
+    def append(self, table, block: np.ndarray):
+        """
+        Append rows given as an (n, 6) float64 block in HISTORICAL_COLUMNS order,
+        timestamps in epoch milliseconds. Rows not newer than the last one are skipped,
+        and of rows sharing a timestamp (tables without a unique key) only the first is kept.
+        """
+        if not len(block):
+            return 0
+        last = self.last_timestamp(table)
+        timestamps = np.rint(block[:, 0]).astype(np.int64)
+        if last is not None:
+            keep = timestamps > last.value // 1_000_000
+            block, timestamps = block[keep], timestamps[keep]
+        if not len(block):
+            return 0
+        steps = np.diff(timestamps)
+        if np.any(steps < 0):
+            raise ValueError(f"Rows for {table} are not sorted by start_timestamp")
+        if np.any(steps == 0):
+            keep = np.concatenate(([True], steps > 0))
+            block, timestamps = block[keep], timestamps[keep]
+
+        for i, column in enumerate(HISTORICAL_COLUMNS[1:], start=1):
+            with open(self._path(table, _column_file(column)), "ab") as f:
+                f.write(np.ascontiguousarray(block[:, i], dtype="<f8").tobytes())
+        with open(self._path(table, _column_file("start_timestamp")), "ab") as f:
+            f.write(timestamps.astype("<i8").tobytes())
+        return len(block)
+
+    def sync(self, table, batch_size=CANDLE_STORE_SYNC_BATCH_SIZE) -> int:
+        """
+        Append closed candles newer than the stored ones from the historical database.
+        Returns the number of rows added.
+        """
+        os.makedirs(self._path(table), exist_ok=True)
+        with open(self._path(table, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._repair(table, self.row_count(table))
+
+            try:
+                candle_length = timeframe_to_timedelta(table.rsplit("_", 1)[-1])
+            except ValueError:
+                candle_length = pd.Timedelta(0)
+            last = self.last_timestamp(table)
+            start = last if last is not None else pd.Timestamp(0)
+            closed_before = utc_now() - candle_length
+
+            quoted = table.replace('"', '""')
+            query = text(f"""
+            SELECT (EXTRACT(EPOCH FROM start_timestamp) * 1000)::float8,
+                   COALESCE(low::float8, 'NaN'), COALESCE(high::float8, 'NaN'), COALESCE(volume::float8, 'NaN'),
+                   COALESCE(open::float8, 'NaN'), COALESCE(close::float8, 'NaN')
+            FROM public."{quoted}"
+            WHERE start_timestamp > :start_time AND start_timestamp <= :closed_before
+            ORDER BY start_timestamp
+            """)
+            added = 0
+            with operations.db_con_historical.connect() as conn:
+                result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                    query, {"start_time": start.to_pydatetime(), "closed_before": closed_before.to_pydatetime()}
+                )
+                width = len(HISTORICAL_COLUMNS)
+                for rows in result.partitions(batch_size):
+                    block = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width)
+                    added += self.append(table, block.reshape(len(rows), width))
+            return added
+
+    def stats(self) -> dict:
+        tables = {}
+        for table in self.tables():
+            last = self.last_timestamp(table)
+            tables[table] = {"rows": self.row_count(table), "last_timestamp": last.isoformat() if last is not None else None}
+        return {"root": os.path.abspath(self.root), "tables": tables}
+
+
+# Shared instance used by the "local" historical backend
+candle_store = CandleStore()
+
+
+if __name__ == "__main__":
+    # python -m app.utils.candleStore sync [TABLE ...]
+    parser = argparse.ArgumentParser(description="Mirror historical candle tables into the local columnar store")
+    parser.add_argument("command", choices=["sync", "stats"])
+    parser.add_argument("tables", nargs="*", help="tables to sync, e.g. BTC_1h (default: every candle table)")
+    parser.add_argument("--dir", default=CANDLE_STORE_DIR)
+    args = parser.parse_args()
+
+    store = CandleStore(args.dir)
+    if args.command == "stats":
+        for name, info in store.stats()["tables"].items():
+            print(f"{name}: {info['rows']} rows, last {info['last_timestamp']}")
+        sys.exit(0)
+
+    failed = False
+    for name in args.tables or operations.list_historical_tables():
+        try:
+            print(f"{name}: {store.sync(name)} rows added")
+        except (*operations.DB_ERRORS, OSError, ValueError) as e:
+            # Report the table and carry on with the others
+            failed = True
+            print(f"{name}: Error: {e}")
+    sys.exit(1 if failed else 0)
@@ -1,19 +1,19 @@
 import asyncio
-import time
-import urllib.parse
-import requests
-from base64 import urlsafe_b64encode
-from base58 import b58decode
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 import logging
 import sys
 import os
 from dotenv import load_dotenv
 import datetime
+import argparse
+from decimal import Decimal
 from collections import defaultdict
+from sqlalchemy import select, case
 from sqlalchemy.dialects.postgresql import insert
-from app.database import get_db
+from app.database import get_db, engine
 from app.models.TVolumeRecord import TVolumeRecord
+from app.models.TSyncState import TSyncState
+from app.utils.orderlyClient import orderly_client, OrderlyRequestError
+from app.utils.leaderLock import run_as_leader, claim_fence, StaleLeaderError
 
 # Add project root to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
@@ -22,146 +22,343 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.
 load_dotenv(dotenv_path=".env.micro.central")
 
 ORDERLY_ACCOUNT_ID = os.getenv("ORDERLY_ACCOUNT_ID")
-ORDERLY_SECRET = os.getenv("ORDERLY_SECRET", "").replace("ed25519:", "")
-ORDERLY_PUBLIC_KEY = os.getenv("ORDERLY_PUBLIC_KEY")
-BASE_URL = os.getenv("ORDERLY_BASE_URL")
+VOLUME_SETTLE_DAYS = int(os.getenv("VOLUME_SETTLE_DAYS", "2"))  # recent days Orderly may still revise
+VOLUME_INITIAL_DAYS = int(os.getenv("VOLUME_INITIAL_DAYS", "10"))  # window of the first sync, without a watermark
+VOLUME_WINDOW_DAYS = int(os.getenv("VOLUME_WINDOW_DAYS", "30"))  # days requested per date window
+VOLUME_PAGE_SIZE = int(os.getenv("VOLUME_PAGE_SIZE", "500"))  # Orderly rows per page
+VOLUME_UPSERT_CHUNK = int(os.getenv("VOLUME_UPSERT_CHUNK", "500"))  # records per upsert transaction
 
-# Decode Base58 secret key
-private_key = Ed25519PrivateKey.from_private_bytes(b58decode(ORDERLY_SECRET))
+# Incremental sync: t_sync_state keeps the last date whose volume is final and
+# stored. Each run fetches from the day after it to today, so the settle window is
+# re-read until it ages out, and only rows that differ from t_volume_records are written.
+# Ranges are walked in date windows, page by page, and written in chunks of one
+# transaction each, so memory stays bounded by one window however long the range.
+# Runs under the leader lease pass its fencing token: every write transaction first
+# claims t_sync_state.fence, and fails once a newer leader has claimed it.
+SYNC_NAME = "orderly_broker_daily_volume"
+VOLUME_FIELDS = ("perp_volume", "perp_taker_volume", "perp_maker_volume", "total_fee", "broker_fee", "realized_pnl")
+TEXT_FIELDS = ("address", "broker_id")
 
 # Logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 
-async def fetch_broker_daily_volume_orderly():
-    timestamp = str(int(time.time() * 1000))
-    today = datetime.date.today()
-    days_ago = today - datetime.timedelta(days=10)
-    params = {
-        "start_date": days_ago.strftime("%Y-%m-%d"),
-        "end_date": today.strftime("%Y-%m-%d")
-    }
-    # params = {
-    #     "start_date": "2025-07-01",
-    #     "end_date": "2025-07-30"
-    # }
-
-    path = "/v1/volume/broker/daily"
-    query = f"?{urllib.parse.urlencode(params)}"
-    message = f"{timestamp}GET{path}{query}"
-    signature = urlsafe_b64encode(private_key.sign(message.encode())).decode()
-
-    headers = {
-        "orderly-timestamp": timestamp,
-        "orderly-account-id": ORDERLY_ACCOUNT_ID,
-        "orderly-key": ORDERLY_PUBLIC_KEY,
-        "orderly-signature": signature
-    }
-
-    url = f"{BASE_URL}{path}{query}"
+def new_volume_groups():
+    return defaultdict(lambda: {
+        "perp_volume": 0,
+        "perp_taker_volume": 0,
+        "perp_maker_volume": 0,
+        "total_fee": 0,
+        "broker_fee": 0,
+        "realized_pnl": 0,
+        "address": "",
+        "broker_id": ""
+    })
 
-    try:
-        response = requests.get(url, headers=headers, timeout=10)
-
-        if response.status_code != 200:
-            logger.error(f"Orderly API error: {response.text}")
-            return None
-
-        rows = response.json().get("data", {}).get("rows", [])
-        if not rows:
-            logger.warning("No data rows in response")
-            return None
-
-        # Step 1: Group by (date, account_id) and aggregate
-        grouped = defaultdict(lambda: {
-            "perp_volume": 0,
-            "perp_taker_volume": 0,
-            "perp_maker_volume": 0,
-            "total_fee": 0,
-            "broker_fee": 0,
-            "realized_pnl": 0,
-            "address": "",
-            "broker_id": ""
+
+def add_volume_rows(grouped, rows):
+    """Aggregate one page of Orderly rows into `grouped`, keyed by (date, account_id)."""
+    for row in rows:
+        record_date = datetime.datetime.strptime(row["date"], "%Y-%m-%d").date()
+        key = (record_date, ORDERLY_ACCOUNT_ID)
+        for field in VOLUME_FIELDS:
+            grouped[key][field] += row.get(field, 0) or 0
+        grouped[key]["address"] = row.get("address")
+        grouped[key]["broker_id"] = row.get("broker_id")
+    return grouped
+
+
+def volume_records(grouped):
+    """TVolumeRecord values for the aggregated groups, in date order."""
+    records = []
+    for (record_date, account_id), values in sorted(grouped.items()):
+        records.append({
+            "date": record_date,
+            "account_id": account_id,
+            **{field: _to_numeric(values[field]) for field in VOLUME_FIELDS},
+            "address": values["address"],
+            "broker_id": values["broker_id"],
+            "distributed": False,
+            "distributed_fees_half": 0
         })
-        print(f"Processing {len(rows)} rows from Orderly API")
-        for row in rows:
-            record_date = datetime.datetime.strptime(row["date"], "%Y-%m-%d").date()
-            key = (record_date, ORDERLY_ACCOUNT_ID)
-            grouped[key]["perp_volume"] += row.get("perp_volume", 0) or 0
-            grouped[key]["perp_taker_volume"] += row.get("perp_taker_volume", 0) or 0
-            grouped[key]["perp_maker_volume"] += row.get("perp_maker_volume", 0) or 0
-            grouped[key]["total_fee"] += row.get("total_fee", 0) or 0
-            grouped[key]["broker_fee"] += row.get("broker_fee", 0) or 0
-            grouped[key]["realized_pnl"] += row.get("realized_pnl", 0) or 0
-            grouped[key]["address"] = row.get("address")
-            grouped[key]["broker_id"] = row.get("broker_id")
-
-        records = []
-        for (record_date, account_id), values in grouped.items():
-            records.append({
-                "date": record_date,
-                "account_id": account_id,
-                "perp_volume": values["perp_volume"],
-                "perp_taker_volume": values["perp_taker_volume"],
-                "perp_maker_volume": values["perp_maker_volume"],
-                "total_fee": values["total_fee"],
-                "broker_fee": values["broker_fee"],
-                "address": values["address"],
-                "broker_id": values["broker_id"],
-                "realized_pnl": values["realized_pnl"],
-                "distributed": False,
-                "distributed_fees_half": 0
-            })
-
-        # Step 2: Async upsert
+    return records
+
+
+def group_volume_rows(rows):
+    return volume_records(add_volume_rows(new_volume_groups(), rows))
+
+
+def _to_numeric(value):
+    # Same precision as the Numeric(20, 8) columns, so stored and fetched values compare equal
+    return Decimal(repr(float(value))).quantize(Decimal("0.00000001"))
+
+
+def _changed(record, stored):
+    if stored is None:
+        return True
+    return any(record[field] != getattr(stored, field) for field in VOLUME_FIELDS + TEXT_FIELDS)
+
+
+def _redistributed(record, stored):
+    """Whether the upsert will send an already distributed row back to fee distribution."""
+    return stored is not None and bool(stored.distributed) and record["broker_fee"] != stored.broker_fee
+
+
+async def changed_records(db, records):
+    """Records that are missing from t_volume_records or differ from the stored row."""
+    if not records:
+        return []
+    dates = [record["date"] for record in records]
+    result = await db.execute(select(TVolumeRecord).where(
+        TVolumeRecord.date.between(min(dates), max(dates)),
+        TVolumeRecord.account_id.in_({record["account_id"] for record in records}),
+    ))
+    stored = {(row.date, row.account_id): row for row in result.scalars()}
+    changed = []
+    for record in records:
+        row = stored.get((record["date"], record["account_id"]))
+        if not _changed(record, row):
+            continue
+        if _redistributed(record, row):
+            logger.warning(f"broker_fee of distributed {record['date']} {record['account_id']} changed from "
+                           f"{row.broker_fee} to {record['broker_fee']} (paid {row.distributed_fees_half}): "
+                           f"queued for redistribution")
+        changed.append(record)
+    return changed
+
+
+async def upsert_volume_records(db, records):
+    # distributed_fees_half is only set on insert and by feeDistribution. A changed
+    # broker_fee clears `distributed`, so the next distribution recomputes the share
+    # instead of keeping a payout computed from the old fee.
+    stmt = insert(TVolumeRecord).values(records)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["date", "account_id"],
+        set_={
+            "perp_volume": stmt.excluded.perp_volume,
+            "perp_taker_volume": stmt.excluded.perp_taker_volume,
+            "perp_maker_volume": stmt.excluded.perp_maker_volume,
+            "total_fee": stmt.excluded.total_fee,
+            "broker_fee": stmt.excluded.broker_fee,
+            "address": stmt.excluded.address,
+            "broker_id": stmt.excluded.broker_id,
+            "realized_pnl": stmt.excluded.realized_pnl,
+            "distributed": case(
+                (TVolumeRecord.broker_fee.is_distinct_from(stmt.excluded.broker_fee), False),
+                else_=TVolumeRecord.distributed,
+            ),
+        }
+    )
+    await db.execute(stmt)
+
+
+async def get_watermark(db, name=SYNC_NAME):
+    result = await db.execute(select(TSyncState.watermark).where(TSyncState.name == name))
+    return result.scalar()
+
+
+async def set_watermark(db, watermark, status, name=SYNC_NAME):
+    stmt = insert(TSyncState).values(name=name, watermark=watermark, last_run=datetime.datetime.utcnow(), last_status=status)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"watermark": stmt.excluded.watermark, "last_run": stmt.excluded.last_run, "last_status": stmt.excluded.last_status}
+    )
+    await db.execute(stmt)
+
+
+def sync_window(watermark, today=None, settle_days=VOLUME_SETTLE_DAYS):
+    """(start, end, new watermark) for an incremental run."""
+    today = today or datetime.date.today()
+    start = watermark + datetime.timedelta(days=1) if watermark else today - datetime.timedelta(days=VOLUME_INITIAL_DAYS)
+    finalized = today - datetime.timedelta(days=settle_days)
+    return start, today, max(watermark, finalized) if watermark else finalized
+
+
+def synced_through(window_start, window_end, records, fetched, total):
+    """
+    Last date of a window known to be complete. Days up to the last one that returned
+    rows are; later days only when meta.total confirms every row was received, since
+    missing rows may also mean Orderly has not published them yet.
+    """
+    if total is not None and fetched >= total:
+        return window_end
+    if records:
+        return max(record["date"] for record in records)
+    return window_start - datetime.timedelta(days=1)
+
+
+def date_windows(start, end, days=VOLUME_WINDOW_DAYS):
+    """Consecutive (first, last) date pairs of at most `days` days covering [start, end]."""
+    while start <= end:
+        last = min(end, start + datetime.timedelta(days=days - 1))
+        yield start, last
+        start = last + datetime.timedelta(days=1)
+
+
+async def iter_volume_pages(start, end, page_size=VOLUME_PAGE_SIZE):
+    """Yield (rows, meta.total) for [start, end] one Orderly page at a time; total is None if not reported."""
+    page = 1
+    while True:
+        params = {
+            "start_date": start.strftime("%Y-%m-%d"),
+            "end_date": end.strftime("%Y-%m-%d"),
+            "page": page,
+            "size": page_size
+        }
+        response, attempts = await orderly_client.get("/v1/volume/broker/daily", params)
+        if len(attempts) > 1:
+            logger.warning(f"Orderly volume fetch needed {len(attempts)} attempts: {attempts}")
+        data = response.json().get("data") or {}
+        rows = data.get("rows") or []
+        total = (data.get("meta") or {}).get("total")
+        yield rows, total
+        if len(rows) < page_size or (total is not None and page * page_size >= total):
+            return
+        page += 1
+
+
+async def write_volume_chunk(records, token=None):
+    """Diff and upsert one chunk in its own transaction; returns the number of records written."""
+    async for db in get_db():
+        try:
+            await claim_fence(db, token, SYNC_NAME)
+            changed = await changed_records(db, records)
+            if changed:
+                await upsert_volume_records(db, changed)
+            await db.commit()
+            return len(changed)
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def store_watermark(watermark, status, token=None):
+    async for db in get_db():
+        try:
+            await claim_fence(db, token, SYNC_NAME)
+            await set_watermark(db, watermark, status)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+
+async def sync_volume_range(start, end, watermark=None, token=None):
+    """
+    Fetch [start, end] from Orderly window by window and write the rows that changed.
+    When `watermark` is given it advances after each window is written, through the
+    days known to be complete (see synced_through) and never past `watermark`, so a
+    failed run resumes from the last complete window. It stops advancing at the first
+    gap. Writes are fenced with the leader `token` when given.
+    """
+    result = {"start": start, "end": end, "fetched": 0, "pages": 0, "written": 0, "unchanged": 0, "watermark": None}
+    contiguous = True
+    for window_start, window_end in date_windows(start, end):
+        grouped = new_volume_groups()
+        fetched, total = 0, None
+        async for rows, total in iter_volume_pages(window_start, window_end):
+            fetched += len(rows)
+            result["pages"] += 1
+            add_volume_rows(grouped, rows)
+        result["fetched"] += fetched
+        records = volume_records(grouped)
+        del grouped
+
+        written = 0
+        for i in range(0, len(records), VOLUME_UPSERT_CHUNK):
+            written += await write_volume_chunk(records[i:i + VOLUME_UPSERT_CHUNK], token)
+        result["written"] += written
+        result["unchanged"] += len(records) - written
+        logger.info(f"Processed {window_start} to {window_end}: {written} of {len(records)} records written")
+
+        if watermark is not None and contiguous:
+            through = synced_through(window_start, window_end, records, fetched, total)
+            contiguous = through == window_end
+            if through >= window_start:
+                result["watermark"] = min(through, watermark)
+                await store_watermark(result["watermark"], f"ok: {result['written']} records written up to {through}", token)
+            if not contiguous:
+                logger.warning(f"No confirmed volume after {through}: the watermark stays there until Orderly returns it")
+
+    logger.info(f"✅ Upserted {result['written']} changed records, {result['unchanged']} unchanged "
+                f"({result['fetched']} rows in {result['pages']} pages)")
+    return result
+
+
+async def fetch_broker_daily_volume_orderly(token=None):
+    """Incremental sync from the stored watermark; the watermark advances once the rows are written."""
+    try:
         async for db in get_db():
-            try:
-                stmt = insert(TVolumeRecord).values(records)
-                stmt = stmt.on_conflict_do_update(
-                    index_elements=["date", "account_id"],
-                    set_={
-                        "perp_volume": stmt.excluded.perp_volume,
-                        "perp_taker_volume": stmt.excluded.perp_taker_volume,
-                        "perp_maker_volume": stmt.excluded.perp_maker_volume,
-                        "total_fee": stmt.excluded.total_fee,
-                        "broker_fee": stmt.excluded.broker_fee,
-                        "address": stmt.excluded.address,
-                        "broker_id": stmt.excluded.broker_id,
-                        "realized_pnl": stmt.excluded.realized_pnl,
-                    }
-                )
-                await db.execute(stmt)
-                await db.commit()
-
-                logger.info(f"✅ Upserted {len(records)} grouped records")
-                return {"rows": records}
-
-            except Exception as e:
-                await db.rollback()
-                logger.error(f"Database error: {str(e)}")
-                return None
-
-    except requests.RequestException as e:
+            watermark = await get_watermark(db)
+        start, end, new_watermark = sync_window(watermark)
+        if start > end:
+            logger.info(f"Volume already synced up to {watermark}")
+            return {"start": start, "end": end, "fetched": 0, "pages": 0, "written": 0, "unchanged": 0, "watermark": watermark}
+        return await sync_volume_range(start, end, new_watermark, token)
+
+    except OrderlyRequestError as e:
+        logger.error(f"HTTP error fetching data: {str(e)}")
+        return None
+    except StaleLeaderError as e:
+        logger.error(f"Stopped volume sync: {str(e)}")
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error: {str(e)}")
+        return None
+
+
+async def backfill_broker_daily_volume(start, end, token=None):
+    """Re-sync an arbitrary date range, e.g. after an Orderly correction. The watermark is not moved."""
+    try:
+        return await sync_volume_range(start, end, token=token)
+    except OrderlyRequestError as e:
         logger.error(f"HTTP error fetching data: {str(e)}")
         return None
+    except StaleLeaderError as e:
+        logger.error(f"Stopped volume backfill: {str(e)}")
+        return None
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         return None
 
 
+async def run_volume_sync(token=None):
+    logger.info(f"Starting fetch at {datetime.datetime.now()}")
+    result = await fetch_broker_daily_volume_orderly(token)
+    if result:
+        logger.info(f"✅ Successfully processed {result['written']} records")
+    else:
+        logger.warning("⚠️ No data received from API")
+    return result
+
+
 async def run_periodically(interval_hours=1):
-    """Run the fetch function periodically every interval_hours."""
-    while True:
-        try:
-            logger.info(f"Starting fetch at {datetime.datetime.now()}")
-            result = await fetch_broker_daily_volume_orderly()
-            if result:
-                logger.info(f"✅ Successfully processed {len(result.get('rows', []))} records")
-            else:
-                logger.warning("⚠️ No data received from API")
-        except Exception as e:
-            logger.error(f"❌ Error in periodic fetch: {str(e)}")
-
-        logger.info(f"⏳ Waiting {interval_hours} hour(s) until next run...")
-        await asyncio.sleep(interval_hours * 3600)
+    """Run the sync every interval_hours, in one instance at a time (see leaderLock)."""
+    await run_as_leader(SYNC_NAME, run_volume_sync, interval_hours * 3600)
+
+
+async def _run_once(args):
+    try:
+        if args.command == "backfill":
+            return await backfill_broker_daily_volume(args.start, args.end)
+        return await fetch_broker_daily_volume_orderly()
+    finally:
+        await orderly_client.close()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync Orderly broker daily volume into t_volume_records")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("sync", help="incremental sync from the stored watermark")
+    backfill = subparsers.add_parser("backfill", help="re-sync a date range without moving the watermark")
+    backfill.add_argument("start", type=datetime.date.fromisoformat, help="first date, e.g. 2025-07-01")
+    backfill.add_argument("end", type=datetime.date.fromisoformat, help="last date, e.g. 2025-07-30")
+    args = parser.parse_args()
+
+    result = asyncio.run(_run_once(args))
+    if result is None:
+        sys.exit(1)
+    print(f"{result['start']} to {result['end']}: {result['written']} records written, {result['unchanged']} unchanged"
+          + (f", watermark {result['watermark']}" if result.get("watermark") else ""))
@@ -0,0 +1,141 @@
+# Broker fee distribution over t_volume_records.
+# Every finalized day (on or before the volume sync watermark, see dailyVolume)
+# that is not yet distributed gets distributed_fees_half = broker_fee * share and
+# distributed = true. Rows are claimed in batches by one UPDATE ... FROM (SELECT
+# ... FOR UPDATE SKIP LOCKED) per transaction: a run can stop at any point and the
+# next one picks up the remaining rows, and concurrent runs never process a row twice.
+# Under a leader lease each batch also claims the lease's fencing token, so a
+# superseded leader stops at its next batch (see leaderLock).
+#
+#   python -m app.utils.feeDistribution [--until 2025-07-30] [--share 0.5] [--batch-size 5000] [--dry-run]
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import engine
+from app.models.TSyncState import TSyncState
+from app.utils.dailyVolume import SYNC_NAME
+from app.utils.leaderLock import claim_fence, StaleLeaderError
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+FEE_DISTRIBUTION_SHARE = float(os.getenv("FEE_DISTRIBUTION_SHARE", "0.5"))  # share of broker_fee distributed
+FEE_DISTRIBUTION_BATCH_SIZE = int(os.getenv("FEE_DISTRIBUTION_BATCH_SIZE", "5000"))  # rows per transaction
+FEE_DISTRIBUTION_NAME = "fee_distribution"  # leader lease and t_sync_state fence
+
+# Logger
+logger = logging.getLogger(__name__)
+
+PENDING = "COALESCE(distributed, false) = false AND date <= :until"
+
+DISTRIBUTE_BATCH_SQL = f"""
+WITH claimed AS (
+    SELECT date, account_id FROM t_volume_records
+    WHERE {PENDING}
+    ORDER BY date, account_id
+    LIMIT :batch_size
+    FOR UPDATE SKIP LOCKED
+), updated AS (
+    UPDATE t_volume_records t
+    SET distributed_fees_half = ROUND(COALESCE(t.broker_fee, 0) * CAST(:share AS numeric), 8),
+        distributed = true
+    FROM claimed
+    WHERE t.date = claimed.date AND t.account_id = claimed.account_id
+    RETURNING t.date, t.distributed_fees_half
+)
+SELECT count(*), COALESCE(sum(distributed_fees_half), 0), min(date), max(date) FROM updated
+"""
+
+PREVIEW_SQL = f"""
+SELECT count(*), COALESCE(sum(ROUND(COALESCE(broker_fee, 0) * CAST(:share AS numeric), 8)), 0), min(date), max(date)
+FROM t_volume_records WHERE {PENDING}
+"""
+
+
+async def finalized_until():
+    """Last date whose volume is final: the volume sync watermark, or None before the first sync."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(TSyncState.watermark).where(TSyncState.name == SYNC_NAME))
+        return result.scalar()
+
+
+def _report(row):
+    rows, fees, first, last = row
+    return {"rows": rows, "fees_distributed": fees, "first_date": first, "last_date": last}
+
+
+async def preview_distribution(until, share=FEE_DISTRIBUTION_SHARE):
+    """What a distribution up to `until` would do, without writing anything."""
+    async with engine.connect() as conn:
+        result = await conn.execute(text(PREVIEW_SQL), {"until": until, "share": share})
+        return _report(result.one())
+
+
+async def distribute_fees(until=None, share=FEE_DISTRIBUTION_SHARE, batch_size=FEE_DISTRIBUTION_BATCH_SIZE, token=None):
+    """
+    Distribute every pending day up to `until` (default: the volume sync watermark),
+    one committed batch at a time, fenced by the leader `token` if given. Returns a
+    report; on a database error or a stale token the batches already committed stay distributed.
+    """
+    started = time.perf_counter()
+    report = {"until": until, "share": share, "rows": 0, "batches": 0, "fees_distributed": 0, "first_date": None, "last_date": None}
+    try:
+        until = until or await finalized_until()
+        report["until"] = until
+        if until is None:
+            report["skipped"] = "volume has not been synced yet"
+            return report
+        while True:
+            async with engine.begin() as conn:
+                await claim_fence(conn, token, FEE_DISTRIBUTION_NAME)
+                result = await conn.execute(text(DISTRIBUTE_BATCH_SQL), {"until": until, "share": share, "batch_size": batch_size})
+                batch = _report(result.one())
+            if not batch["rows"]:
+                break
+            report["batches"] += 1
+            report["rows"] += batch["rows"]
+            report["fees_distributed"] += batch["fees_distributed"]
+            report["first_date"] = min(filter(None, (report["first_date"], batch["first_date"])))
+            report["last_date"] = max(filter(None, (report["last_date"], batch["last_date"])))
+            if batch["rows"] < batch_size:
+                break
+    except SQLAlchemyError as e:
+        logger.error(f"Database error: {str(e)}")
+        report["error"] = str(e).splitlines()[0]
+    except StaleLeaderError as e:
+        logger.error(f"Stopped fee distribution: {str(e)}")
+        report["error"] = str(e)
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"Distributed {report['fees_distributed']} in fees over {report['rows']} rows up to {until}")
+    return report
+
+
+async def _run_once(args):
+    try:
+        if args.dry_run:
+            return await preview_distribution(args.until or await finalized_until(), args.share)
+        return await distribute_fees(args.until, args.share, args.batch_size)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distribute the broker fee share of finalized days in t_volume_records")
+    parser.add_argument("--until", type=datetime.date.fromisoformat, help="last date to distribute (default: volume sync watermark)")
+    parser.add_argument("--share", type=float, default=FEE_DISTRIBUTION_SHARE, help="share of broker_fee, e.g. 0.5")
+    parser.add_argument("--batch-size", type=int, default=FEE_DISTRIBUTION_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be distributed")
+    args = parser.parse_args()
+
+    report = asyncio.run(_run_once(args))
+    print(f"{report['rows']} rows, {report['fees_distributed']} in fees ({report['first_date']} to {report['last_date']})"
+          + (f" - {report.get('error') or report['skipped']}" if report.get("error") or report.get("skipped") else ""))
+    sys.exit(1 if report.get("error") else 0)
@@ -3,66 +3,218 @@ import sys
 import os
 import pandas as pd
 import os.path
-import redis
+import asyncio
 import pickle
+from itertools import chain
+import numpy as np
 from dotenv import load_dotenv
 # # Import custom operations module for database connection
 # Add the project root to sys.path
 #sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 from app.utils import operations
+from app.redis_client import get_redis
+from app.database import historical_engine, POOL_OPTIONS
+from app.utils.candleCache import candle_cache, CANDLE_CACHE_ENABLED
+from app.utils.historicalCatalog import historical_catalog
+from app.utils.historicalFormats import HISTORICAL_COLUMNS
+from app.utils.candleStore import candle_store
 from sqlalchemy.sql import text
 
 # Load environment variables from the specified .env file
 load_dotenv(dotenv_path=".env.micro.central")
-# Initialize Redis connection
-try:
-    redis_client = redis.from_url(os.getenv("REDIS_URL"))
-    redis_client.ping()
-except redis.ConnectionError as e:
-    print(f"Redis connection error: {e}")
-    redis_client = None
 
 def get_user_data(api_telegram: int) -> pd.DataFrame:
-    # Check if data is in Redis cache
-    cached_data = redis_client.get(f"user_data:{api_telegram}")
-    if cached_data:
-        # print("Using cached data")
-        return pickle.loads(cached_data)
-
-    # If not in cache, call the operations.getUser function
+    """
+    Synchronous version for code outside the event loop (scripts, worker threads).
+    The shared Redis pool belongs to the server loop, so this reads the database directly.
+    """
     df = operations.getUser(api_telegram)
+    if df is None:
+        raise ValueError("User not found")
+    return df
+
+async def get_user_data_async(api_telegram: int) -> pd.DataFrame:
+    # Check if data is in the shared Redis cache
+    redis_client = await get_redis()
+    if redis_client:
+        cached_data = await redis_client.get(f"user_data:{api_telegram}")
+        if cached_data:
+            # print("Using cached data")
+            return pickle.loads(cached_data)
+
+    # If not in cache, call the operations.getUser function off the event loop
+    df = await asyncio.to_thread(operations.getUser, api_telegram)
     if df is None:
         raise ValueError("User not found")
 
     # Store the DataFrame in Redis cache
-    redis_client.set(f"user_data:{api_telegram}", pickle.dumps(df))
+    if redis_client:
+        await redis_client.set(f"user_data:{api_telegram}", pickle.dumps(df))
 
     return df
 
-# Fetch historical data from the database
-def get_historical_data(pair, timeframe, values):
-    field = '"start_timestamp"'
+# Rows fetched per round-trip when streaming a historical range
+HISTORICAL_STREAM_BATCH_SIZE = int(os.getenv("HISTORICAL_STREAM_BATCH_SIZE", "5000"))
+
+def _historical_query(pair, timeframe, end_inclusive=True):
     table = f'"{pair}_{timeframe}"'
-    start_date, end_date = values.split('|')
-    
-    query = text(f"""
+    end_operator = "<=" if end_inclusive else "<"
+    return text(f"""
     SELECT start_timestamp, low, high, volume, open, close
     FROM public.{table}
-    WHERE start_timestamp >= :start_time AND start_timestamp <= :end_time
+    WHERE start_timestamp >= :start_time AND start_timestamp {end_operator} :end_time
     ORDER BY 1
     """)
-    
-    # Use parameterized query to avoid SQL injection
-    df = pd.read_sql(query, con=operations.db_con_historical, params={"start_time": start_date, "end_time": end_date})
-    
+
+def _utc_bound(value):
+    """
+    A range bound as a tz-aware UTC datetime. Naive bounds mean UTC (as on the asyncpg
+    path); passed naive, psycopg2 would let Postgres read them in the session time zone.
+    """
+    value = pd.Timestamp(value)
+    value = value.tz_localize("UTC") if value.tzinfo is None else value.tz_convert("UTC")
+    return value.to_pydatetime()
+
+def _to_numeric(df):
     # Convert columns to numeric types
+    df['open'] = pd.to_numeric(df['open'])
     df['close'] = pd.to_numeric(df['close'])
     df['high'] = pd.to_numeric(df['high'])
     df['low'] = pd.to_numeric(df['low'])
     df['volume'] = pd.to_numeric(df['volume'])
+    return df
+
+# Fetch historical data from the database
+def get_historical_data(pair, timeframe, values, use_cache=CANDLE_CACHE_ENABLED):
+    start_date, end_date = values.split('|')
+
+    if use_cache:
+        # Assemble the range from day-aligned cached chunks, querying only the missing days
+        def load_chunk_run(run_start, run_end):
+            query = _historical_query(pair, timeframe, end_inclusive=False)
+            params = {"start_time": _utc_bound(run_start), "end_time": _utc_bound(run_end)}
+            return _to_numeric(pd.read_sql(query, con=operations.db_con_historical, params=params))
+
+        return candle_cache.get_range(
+            f"{pair}_{timeframe}",
+            pd.Timestamp(start_date),
+            pd.Timestamp(end_date),
+            load_chunk_run,
+            HISTORICAL_COLUMNS,
+            written_through=historical_catalog.written_through(pair, timeframe),
+        )
+
+    query = _historical_query(pair, timeframe)
     
+    # Use parameterized query to avoid SQL injection
+    df = pd.read_sql(query, con=operations.db_con_historical, params={"start_time": _utc_bound(start_date), "end_time": _utc_bound(end_date)})
+    
+    return _to_numeric(df)
+
+# Concurrent asyncpg historical queries per worker; the rest wait for a slot
+HISTORICAL_MAX_CONCURRENCY = int(os.getenv(
+    "HISTORICAL_MAX_CONCURRENCY", str(POOL_OPTIONS["pool_size"] + POOL_OPTIONS["max_overflow"])
+))
+_historical_slots = asyncio.Semaphore(HISTORICAL_MAX_CONCURRENCY)
+
+async def fetch_historical_arrays(pair, timeframe, start_time, end_time, end_inclusive=True):
+    """
+    Query a range on the asyncpg historical engine and decode it straight into one
+    float64 NumPy block, without building per-row Python dicts or pandas parsing.
+    """
+    table = f"{pair}_{timeframe}".replace('"', '""')
+    end_operator = "<=" if end_inclusive else "<"
+    sql = f"""
+    SELECT (EXTRACT(EPOCH FROM start_timestamp) * 1000)::float8,
+           COALESCE(low::float8, 'NaN'), COALESCE(high::float8, 'NaN'), COALESCE(volume::float8, 'NaN'),
+           COALESCE(open::float8, 'NaN'), COALESCE(close::float8, 'NaN')
+    FROM public."{table}"
+    WHERE start_timestamp >= $1 AND start_timestamp {end_operator} $2
+    ORDER BY start_timestamp
+    """
+    async with _historical_slots:
+        async with historical_engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            records = await raw.driver_connection.fetch(sql, start_time, end_time)
+
+    width = len(HISTORICAL_COLUMNS)
+    block = np.fromiter(chain.from_iterable(records), dtype=np.float64, count=len(records) * width)
+    block = block.reshape(len(records), width)
+    df = pd.DataFrame(block[:, 1:], columns=HISTORICAL_COLUMNS[1:])
+    df.insert(0, "start_timestamp", np.rint(block[:, 0]).astype(np.int64).astype("datetime64[ms]").astype("datetime64[ns]"))
     return df
 
+# Fetch historical data without blocking the event loop
+async def get_historical_data_async(pair, timeframe, values, use_cache=CANDLE_CACHE_ENABLED):
+    start_date, end_date = values.split('|')
+    start_time, end_time = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    if use_cache:
+        async def load_chunk_run(run_start, run_end):
+            return await fetch_historical_arrays(
+                pair, timeframe, run_start.to_pydatetime(), run_end.to_pydatetime(), end_inclusive=False
+            )
+
+        return await candle_cache.get_range_async(
+            f"{pair}_{timeframe}", start_time, end_time, load_chunk_run, HISTORICAL_COLUMNS,
+            written_through=historical_catalog.written_through(pair, timeframe),
+        )
+
+    return await fetch_historical_arrays(pair, timeframe, start_time.to_pydatetime(), end_time.to_pydatetime())
+
+# Where /query-historical-data reads from by default: "postgres" or "local"
+HISTORICAL_BACKENDS = ("postgres", "local")
+HISTORICAL_BACKEND = os.getenv("HISTORICAL_BACKEND", "postgres")
+
+# Batch queries: specs per request and how many of them run at once
+HISTORICAL_BATCH_MAX_QUERIES = int(os.getenv("HISTORICAL_BATCH_MAX_QUERIES", "100"))
+HISTORICAL_BATCH_CONCURRENCY = int(os.getenv("HISTORICAL_BATCH_CONCURRENCY", "8"))
+
+# HTTP caching of GET /historical-data: ranges whose last candle closed more than
+# HISTORICAL_IMMUTABLE_GRACE seconds ago never change and get a strong ETag
+HISTORICAL_IMMUTABLE_GRACE = float(os.getenv("HISTORICAL_IMMUTABLE_GRACE", "600"))
+HISTORICAL_IMMUTABLE_MAX_AGE = int(os.getenv("HISTORICAL_IMMUTABLE_MAX_AGE", str(365 * 24 * 3600)))
+HISTORICAL_OPEN_MAX_AGE = int(os.getenv("HISTORICAL_OPEN_MAX_AGE", "5"))
+
+# Fetch historical data from the local memory-mapped store
+async def get_historical_data_local(pair, timeframe, values):
+    """
+    Serve the range from the local columnar store, topping up candles newer than the
+    last synced one from Postgres. Tables that were never synced fall back to Postgres.
+    """
+    table = f"{pair}_{timeframe}"
+    start_date, end_date = values.split('|')
+    start_time, end_time = pd.Timestamp(start_date), pd.Timestamp(end_date)
+
+    last = candle_store.last_timestamp(table)
+    if last is None:
+        return await get_historical_data_async(pair, timeframe, values)
+
+    df = await asyncio.to_thread(candle_store.read_range, table, start_time, end_time)
+    if end_time > last:
+        tail = await fetch_historical_arrays(
+            pair, timeframe, max(start_time, last + pd.Timedelta(milliseconds=1)).to_pydatetime(), end_time.to_pydatetime()
+        )
+        if not tail.empty:
+            df = pd.concat([df, tail], ignore_index=True) if not df.empty else tail
+    return df
+
+# Stream historical data in fixed-size batches from a server-side cursor
+def iter_historical_data(pair, timeframe, values, batch_size=HISTORICAL_STREAM_BATCH_SIZE):
+    """
+    Yield lists of (start_timestamp, low, high, volume, open, close) rows.
+    Only one batch is held in memory at a time.
+    """
+    start_date, end_date = values.split('|')
+    query = _historical_query(pair, timeframe)
+
+    with operations.db_con_historical.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+            query, {"start_time": _utc_bound(start_date), "end_time": _utc_bound(end_date)}
+        )
+        for rows in result.partitions(batch_size):
+            yield [tuple(row) for row in rows]
+
 
 # Fetch historical data for trading
 # pair = "PERP_APT_USDT"
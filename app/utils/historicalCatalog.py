@@ -0,0 +1,200 @@
+# Catalog of the "{pair}_{timeframe}" candle tables in the historical database:
+# row counts and start_timestamp span per table, built at startup and refreshed
+# in the background so requests can be validated and clipped without SQL.
+import os
+import time
+import asyncio
+import logging
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy.sql import text
+from sqlalchemy.exc import SQLAlchemyError
+from app.database import historical_engine
+from app.utils.asyncOperations import quote_table
+from app.utils.candleCache import utc_now
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+HISTORICAL_CATALOG_REFRESH_SECONDS = float(os.getenv("HISTORICAL_CATALOG_REFRESH_SECONDS", "300"))
+# Incremental refreshes between full rebuilds (which also pick up deletes and backfills)
+HISTORICAL_CATALOG_FULL_EVERY = int(os.getenv("HISTORICAL_CATALOG_FULL_EVERY", "12"))
+# Seconds before a table that was looked up and not found is looked up again
+HISTORICAL_CATALOG_MISS_SECONDS = float(os.getenv("HISTORICAL_CATALOG_MISS_SECONDS", "30"))
+
+# Logger
+logger = logging.getLogger(__name__)
+
+
+class UnknownTableError(LookupError):
+    """Raised when no "{pair}_{timeframe}" table exists for a request."""
+
+
+def _naive(value):
+    if value is None:
+        return None
+    value = pd.Timestamp(value)
+    return value.tz_convert(None) if value.tzinfo is not None else value
+
+
+class HistoricalCatalog:
+    """
+    table -> {"rows", "min_timestamp", "max_timestamp"}.
+
+    A full build lists the tables with their planner row estimate and min/max
+    start_timestamp. Incremental refreshes only count rows newer than the known
+    max, which is an index probe per table.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.refreshed_at = None
+        self._refreshes = 0
+        self._misses = {}  # table -> monotonic time of the last lookup that did not find it
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    async def _list_tables(self, conn, table=None):
+        result = await conn.execute(text("""
+        SELECT c.table_name, pc.reltuples::bigint
+        FROM information_schema.columns c
+        JOIN pg_class pc ON pc.oid = to_regclass(quote_ident(c.table_schema) || '.' || quote_ident(c.table_name))
+        WHERE c.table_schema = 'public' AND c.column_name = 'start_timestamp'
+          AND (CAST(:table AS text) IS NULL OR c.table_name = :table)
+        """), {"table": table})
+        return dict(result.fetchall())
+
+    async def _scan_table(self, conn, table, estimate):
+        result = await conn.execute(text(f"SELECT min(start_timestamp), max(start_timestamp) FROM {quote_table(table)}"))
+        min_timestamp, max_timestamp = result.fetchone()
+        if estimate is None or estimate < 0:
+            # Never analyzed: count once, incremental refreshes keep it current
+            result = await conn.execute(text(f"SELECT count(*) FROM {quote_table(table)}"))
+            estimate = result.scalar()
+        return {"rows": int(estimate), "min_timestamp": _naive(min_timestamp), "max_timestamp": _naive(max_timestamp)}
+
+    async def _extend_table(self, conn, table, info):
+        if info["max_timestamp"] is None:
+            return await self._scan_table(conn, table, info["rows"])
+        result = await conn.execute(
+            text(f"SELECT count(*), max(start_timestamp) FROM {quote_table(table)} WHERE start_timestamp > :since"),
+            {"since": info["max_timestamp"].to_pydatetime()},
+        )
+        added, max_timestamp = result.fetchone()
+        if not added:
+            return info
+        return {**info, "rows": info["rows"] + added, "max_timestamp": _naive(max_timestamp)}
+
+    async def refresh(self, full=False):
+        """
+        Rebuild the catalog (full) or extend every known table with its new rows.
+        Returns False, keeping the previous catalog, when the database fails or is unreachable.
+        """
+        async with self._lock:
+            full = full or not self.loaded or self._refreshes % HISTORICAL_CATALOG_FULL_EVERY == 0
+            started = time.perf_counter()
+            try:
+                async with historical_engine.connect() as conn:
+                    estimates = await self._list_tables(conn)
+                    tables = {}
+                    for table, estimate in estimates.items():
+                        if full or table not in self.tables:
+                            tables[table] = await self._scan_table(conn, table, estimate)
+                        else:
+                            tables[table] = await self._extend_table(conn, table, self.tables[table])
+            except SQLAlchemyError as e:
+                logger.error(f"Database error: {str(e)}")
+                return False
+            except (OSError, asyncio.TimeoutError) as e:
+                # asyncpg raises connection failures and timeouts unwrapped
+                logger.error(f"Historical database unreachable: {e!r}")
+                return False
+            self.tables = tables
+            self.refreshed_at = utc_now()
+            self._refreshes += 1
+            logger.info(f"Historical catalog: {len(tables)} tables in {time.perf_counter() - started:.2f}s ({'full' if full else 'incremental'})")
+            return True
+
+    async def refresh_table(self, table):
+        """
+        Look up one table missing from the catalog, e.g. created since the last refresh,
+        and add it. Returns its entry, or None if it does not exist or the lookup failed.
+        Misses are remembered for HISTORICAL_CATALOG_MISS_SECONDS so unknown names stay cheap.
+        """
+        missed_at = self._misses.get(table)
+        if missed_at is not None and time.monotonic() - missed_at < HISTORICAL_CATALOG_MISS_SECONDS:
+            return None
+        try:
+            async with historical_engine.connect() as conn:
+                estimates = await self._list_tables(conn, table)
+                info = await self._scan_table(conn, table, estimates[table]) if table in estimates else None
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {str(e)}")
+            return None
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.error(f"Historical database unreachable: {e!r}")
+            return None
+        if info is None:
+            self._misses[table] = time.monotonic()
+            return None
+        self._misses.pop(table, None)
+        self.tables = {**self.tables, table: info}
+        logger.info(f"Historical catalog: added {table}")
+        return info
+
+    async def run_periodically(self, interval_seconds=HISTORICAL_CATALOG_REFRESH_SECONDS):
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing historical catalog: {str(e)}")
+
+    def table(self, pair, timeframe):
+        """Catalog entry (rows, min_timestamp, max_timestamp) of a table, or None if unknown or not loaded."""
+        return self.tables.get(f"{pair}_{timeframe}") if self.loaded else None
+
+    def written_through(self, pair, timeframe):
+        """Newest start_timestamp the catalog has seen in a table, or None if unknown."""
+        info = self.table(pair, timeframe)
+        return info["max_timestamp"] if info is not None else None
+
+    def resolve(self, pair, timeframe, start: pd.Timestamp, end: pd.Timestamp):
+        """
+        Validate the table and clip [start, end] to the rows it can contain.
+        Returns the clipped (start, end), or None when the range is certainly empty.
+        Before the first successful build every request passes through unchanged.
+        """
+        if not self.loaded:
+            return start, end
+        info = self.tables.get(f"{pair}_{timeframe}")
+        if info is None:
+            raise UnknownTableError(f"No historical data for {pair} {timeframe}")
+        if info["min_timestamp"] is None:
+            return None
+        # Rows written since the last refresh are newer than max_timestamp but not in the future
+        upper = max(info["max_timestamp"], utc_now())
+        start, end = max(start, info["min_timestamp"]), min(end, upper)
+        if start > end:
+            return None
+        return start, end
+
+    def snapshot(self) -> dict:
+        return {
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at is not None else None,
+            "tables": {
+                table: {
+                    "rows": info["rows"],
+                    "min_timestamp": info["min_timestamp"].isoformat() if info["min_timestamp"] is not None else None,
+                    "max_timestamp": info["max_timestamp"].isoformat() if info["max_timestamp"] is not None else None,
+                }
+                for table, info in sorted(self.tables.items())
+            },
+        }
+
+
+# Shared instance, built in the app lifespan
+historical_catalog = HistoricalCatalog()
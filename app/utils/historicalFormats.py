@@ -0,0 +1,162 @@
+import json
+import datetime
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+from pydantic_core import to_jsonable_python
+
+# Columns returned by every historical query, in order
+HISTORICAL_COLUMNS = ["start_timestamp", "low", "high", "volume", "open", "close"]
+
+# Streaming formats accepted by the historical endpoint
+STREAM_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json-stream": "application/json",
+}
+
+# Column-oriented formats: parallel arrays per column, timestamps as epoch milliseconds
+COLUMNAR_FORMATS = {
+    "columnar": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "float64": "application/octet-stream",
+}
+
+# Accept header media types that select a format when none is requested explicitly
+ACCEPT_FORMATS = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/octet-stream": "float64",
+    "application/x-ndjson": "ndjson",
+}
+
+
+def negotiate_format(requested, accept=None):
+    """Return the explicitly requested format, else the first one matched by the Accept header."""
+    if requested and requested != "records":
+        return requested
+    for media_range in (accept or "").split(","):
+        media_type = media_range.split(";")[0].strip().lower()
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+    return "records"
+
+
+def utc_timestamps(series) -> pd.Series:
+    """
+    start_timestamp as tz-aware UTC. Frames carry naive UTC internally (cache, catalog,
+    local store); the column is timestamptz, so responses keep the UTC designator.
+    """
+    ts = pd.to_datetime(series)
+    return ts.dt.tz_localize("UTC") if ts.dt.tz is None else ts.dt.tz_convert("UTC")
+
+
+def json_timestamp(value: datetime.datetime) -> str:
+    """
+    A timestamp as the records format encodes it (FastAPI/pydantic): ISO 8601 in UTC,
+    e.g. "2025-01-01T00:00:00Z", whatever time zone the driver returned it in.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return to_jsonable_python(value.astimezone(datetime.timezone.utc))
+
+
+def _json_default(value):
+    # Same encoding FastAPI applies to DataFrame records: UTC timestamps, ISO dates, numbers as floats
+    if isinstance(value, datetime.datetime):
+        return json_timestamp(value)
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(row, columns):
+    return json.dumps(dict(zip(columns, row)), default=_json_default, separators=(",", ":"))
+
+
+def iter_ndjson(batches, columns=HISTORICAL_COLUMNS):
+    """Encode batches of rows as newline-delimited JSON, one chunk per batch."""
+    for rows in batches:
+        if rows:
+            yield "".join(_dumps(row, columns) + "\n" for row in rows)
+
+
+def iter_json_array(batches, columns=HISTORICAL_COLUMNS):
+    """Encode batches of rows as one JSON array, emitted chunk by chunk."""
+    yield "["
+    first = True
+    for rows in batches:
+        if not rows:
+            continue
+        chunk = ",".join(_dumps(row, columns) for row in rows)
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
+
+
+def frame_to_arrays(df):
+    """
+    Return one NumPy array per historical column: start_timestamp as int64 epoch
+    milliseconds, every other column as float64.
+    """
+    arrays = {}
+    for column in df.columns:
+        if column == "start_timestamp":
+            ts = pd.to_datetime(df[column])
+            if ts.dt.tz is not None:
+                ts = ts.dt.tz_convert(None)
+            arrays[column] = ts.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        else:
+            arrays[column] = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    return arrays
+
+
+def arrays_to_lists(arrays) -> dict:
+    """JSON-ready lists per column; NaN becomes null."""
+    payload = {}
+    for column, values in arrays.items():
+        if values.dtype.kind == "f" and np.isnan(values).any():
+            payload[column] = [None if v != v else v for v in values.tolist()]
+        else:
+            payload[column] = values.tolist()
+    return payload
+
+
+def to_columnar_json(df) -> bytes:
+    """Encode as {"column": [values...], ...}; NaN becomes null."""
+    return json.dumps(arrays_to_lists(frame_to_arrays(df)), separators=(",", ":")).encode()
+
+
+def to_packed_float64(df):
+    """
+    Encode as contiguous little-endian float64 buffers, one column after another.
+    Returns the body and the headers describing its layout.
+    """
+    arrays = frame_to_arrays(df)
+    body = b"".join(np.ascontiguousarray(v, dtype="<f8").tobytes() for v in arrays.values())
+    headers = {
+        "X-Columns": ",".join(arrays),
+        "X-Row-Count": str(len(df)),
+        "X-Layout": "column-major;dtype=<f8",
+    }
+    return body, headers
+
+
+def to_arrow_ipc(df) -> bytes:
+    """Encode as an Arrow IPC stream."""
+    import pyarrow as pa  # Imported on first use: only this format needs it
+
+    arrays = frame_to_arrays(df)
+    fields = []
+    columns = []
+    for column, values in arrays.items():
+        if column == "start_timestamp":
+            columns.append(pa.array(values.view("datetime64[ms]"), type=pa.timestamp("ms")))
+        else:
+            columns.append(pa.array(values, type=pa.float64()))
+        fields.append(column)
+    table = pa.Table.from_arrays(columns, names=fields)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,261 @@
+# Technical indicators computed over the OHLCV arrays of a historical query.
+# Each indicator is a function (arrays, state, **params) -> (outputs, state): `state`
+# carries what the next rows need (running averages, a window tail, cumulative sums),
+# so results for closed candles are memoized and extended instead of recomputed.
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from app.utils.candleCache import utc_now, naive_timestamps
+from app.utils.resample import timeframe_to_timedelta
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+INDICATOR_CACHE_MAX_BYTES = int(os.getenv("INDICATOR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def _rolling(values, tail, period, how):
+    """Rolling mean or population std of `values`, continuing after the `tail` rows."""
+    x = np.concatenate([tail, values])
+    window = pd.Series(x).rolling(period, min_periods=period)
+    out = (window.mean() if how == "mean" else window.std(ddof=0)).to_numpy()
+    return out[len(tail):], x[-(period - 1):] if period > 1 else x[:0]
+
+
+def _ewm(values, alpha, previous):
+    """Exponential average with adjust=False, continuing from `previous` when given."""
+    if previous is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    x = np.concatenate([[previous], values])
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def _warmup(out, seen, rows):
+    # Hide the first `rows` values of the range; `seen` rows were computed before `out`
+    out = out.copy()
+    out[:max(0, min(len(out), rows - seen))] = np.nan
+    return out
+
+
+def sma(arrays, state, period):
+    out, tail = _rolling(arrays["close"], state["tail"] if state else np.empty(0), period, "mean")
+    return {"": out}, {"tail": tail}
+
+
+def ema(arrays, state, period):
+    seen = state["seen"] if state else 0
+    raw = _ewm(arrays["close"], 2 / (period + 1), state["ema"] if state else None)
+    new_state = {"ema": raw[-1], "seen": seen + len(raw)} if len(raw) else state
+    return {"": _warmup(raw, seen, period - 1)}, new_state
+
+
+def rsi(arrays, state, period):
+    close = arrays["close"]
+    seen = state["seen"] if state else 0
+    previous_close = state["close"] if state else (close[0] if len(close) else np.nan)
+    delta = np.diff(close, prepend=previous_close)
+    gain = _ewm(np.clip(delta, 0, None), 1 / period, state["gain"] if state else None)
+    loss = _ewm(np.clip(-delta, 0, None), 1 / period, state["loss"] if state else None)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+    if not len(close):
+        return {"": out}, state
+    # The first row has no change, so the first value uses `period` changes
+    return {"": _warmup(out, seen, period)}, {"close": close[-1], "gain": gain[-1], "loss": loss[-1], "seen": seen + len(close)}
+
+
+def atr(arrays, state, period):
+    high, low, close = arrays["high"], arrays["low"], arrays["close"]
+    seen = state["seen"] if state else 0
+    previous_close = np.concatenate([[state["close"] if state else np.nan], close])[:-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - previous_close), np.abs(low - previous_close)))
+    raw = _ewm(true_range, 1 / period, state["atr"] if state else None)
+    if not len(close):
+        return {"": raw}, state
+    return {"": _warmup(raw, seen, period - 1)}, {"close": close[-1], "atr": raw[-1], "seen": seen + len(close)}
+
+
+def vwap(arrays, state):
+    """Volume-weighted typical price, anchored at the first row of the range."""
+    typical = (arrays["high"] + arrays["low"] + arrays["close"]) / 3
+    volume = np.nan_to_num(arrays["volume"])
+    cum_pv = np.cumsum(np.nan_to_num(typical * volume)) + (state["pv"] if state else 0.0)
+    cum_volume = np.cumsum(volume) + (state["volume"] if state else 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = np.where(cum_volume > 0, cum_pv / cum_volume, np.nan)
+    if not len(out):
+        return {"": out}, state
+    return {"": out}, {"pv": cum_pv[-1], "volume": cum_volume[-1]}
+
+
+def bollinger(arrays, state, period, stddev):
+    tail = state["tail"] if state else np.empty(0)
+    middle, new_tail = _rolling(arrays["close"], tail, period, "mean")
+    spread, _ = _rolling(arrays["close"], tail, period, "std")
+    return {"middle": middle, "upper": middle + stddev * spread, "lower": middle - stddev * spread}, {"tail": new_tail}
+
+
+# name -> (function, default parameters); parameters are named in this order in the output columns
+INDICATORS = {
+    "sma": (sma, {"period": 20}),
+    "ema": (ema, {"period": 20}),
+    "rsi": (rsi, {"period": 14}),
+    "atr": (atr, {"period": 14}),
+    "vwap": (vwap, {}),
+    "bollinger": (bollinger, {"period": 20, "stddev": 2.0}),
+}
+
+
+def normalize_spec(name: str, params: dict = None):
+    """Validate an indicator request and return (name, params with defaults filled in)."""
+    if name not in INDICATORS:
+        raise ValueError(f"Unsupported indicator: {name}")
+    defaults = INDICATORS[name][1]
+    unknown = set(params or {}) - set(defaults)
+    if unknown:
+        raise ValueError(f"Unsupported parameters for {name}: {', '.join(sorted(unknown))}")
+    params = {**defaults, **(params or {})}
+    if "period" in params:
+        if params["period"] != int(params["period"]) or params["period"] < 1:
+            raise ValueError(f"{name} period must be a positive integer")
+        params["period"] = int(params["period"])
+    return name, params
+
+
+def column_names(name: str, params: dict, outputs) -> dict:
+    """Output key -> column name, e.g. sma_20 or bollinger_20_2_upper."""
+    base = "_".join([name, *(f"{value:g}" if isinstance(value, float) else str(value) for value in params.values())])
+    return {output: f"{base}_{output}" if output else base for output in outputs}
+
+
+class IndicatorCache:
+    """
+    Memoized indicator results for closed candles, keyed by
+    (table, range start, indicator, params). An entry holds the timestamps it
+    covers, the output arrays and the state after its last row, so a request
+    that reaches further only computes the new rows. LRU bounded by `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=INDICATOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.rows_computed = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def count(self, hits=0, misses=0, rows_computed=0):
+        # The shared instance may be used from several threads at once
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.rows_computed += rows_computed
+
+    def put(self, key, timestamps, outputs, state):
+        nbytes = timestamps.nbytes + sum(values.nbytes for values in outputs.values())
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[3]
+            self._entries[key] = (timestamps, outputs, state, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                self.bytes -= self._entries.popitem(last=False)[1][3]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "rows_computed": self.rows_computed,
+            }
+
+
+# Shared instance used by add_indicators
+indicator_cache = IndicatorCache()
+
+
+def _compute(key, function, params, timestamps, arrays, n_closed, cache):
+    """Outputs for every row: cached prefix, newly closed rows (then cached), open rows."""
+    n = len(timestamps)
+    entry = cache.get(key) if cache is not None else None
+    keep_existing = False
+    if entry is not None:
+        cached_timestamps, cached_outputs, state, _ = entry
+        m = len(cached_timestamps)
+        if n <= min(m, n_closed) and np.array_equal(cached_timestamps[:n], timestamps):
+            # Every requested row is already computed
+            cache.count(hits=1)
+            return {output: values[:n] for output, values in cached_outputs.items()}
+        if m > n_closed or not np.array_equal(cached_timestamps, timestamps[:m]):
+            # Do not replace a longer entry with a shorter, differently ending range
+            keep_existing = m > n_closed
+            entry = None
+    if entry is None:
+        m, cached_outputs, state = 0, None, None
+        if cache is not None:
+            cache.count(misses=1)
+    else:
+        cache.count(hits=1)
+
+    parts = [cached_outputs] if cached_outputs is not None else []
+    if n_closed > m:
+        closed, state = function({column: values[m:n_closed] for column, values in arrays.items()}, state, **params)
+        parts.append(closed)
+        if cache is not None and not keep_existing:
+            cache.count(rows_computed=n_closed - m)
+            parts = [{output: np.concatenate([part[output] for part in parts]) for output in closed}]
+            cache.put(key, timestamps[:n_closed].copy(), parts[0], state)
+    # Candles still open are computed from the closed state and never cached
+    tail, _ = function({column: values[max(m, n_closed):] for column, values in arrays.items()}, state, **params)
+    parts.append(tail)
+    return {output: np.concatenate([part[output] for part in parts]) for output in tail}
+
+
+def add_indicators(df, table, timeframe, start, specs, closed_until=None, cache=indicator_cache):
+    """
+    Add one column per indicator output to a frame sorted by start_timestamp.
+
+    `specs` are (name, params) pairs from normalize_spec. Rows whose candle closed
+    before `closed_until` (default: now minus one timeframe) are memoized per
+    (table, start, indicator, params); later rows are recomputed on every call.
+    """
+    if not specs:
+        return df
+    timestamps = naive_timestamps(df["start_timestamp"]).to_numpy(dtype="datetime64[ms]").astype(np.int64)
+    arrays = {column: df[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in ("low", "high", "volume", "open", "close")}
+    if closed_until is None:
+        try:
+            closed_until = utc_now() - timeframe_to_timedelta(timeframe)
+        except ValueError:
+            closed_until = utc_now()
+    n_closed = int(np.searchsorted(timestamps, pd.Timestamp(closed_until).value // 1_000_000, side="right"))
+
+    df = df.copy()
+    for name, params in specs:
+        function = INDICATORS[name][0]
+        key = (table, pd.Timestamp(start).value, name, tuple(params.items()))
+        outputs = _compute(key, function, params, timestamps, arrays, n_closed, cache)
+        for output, column in column_names(name, params, outputs).items():
+            df[column] = outputs[output]
+    return df
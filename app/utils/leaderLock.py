@@ -0,0 +1,232 @@
+# Lease-based leader election for periodic jobs, so that with several uvicorn
+# workers or replicas each job runs in exactly one of them.
+#
+# The lease is a Redis key holding the owner id, set with NX and a TTL. Its holder
+# renews it every ttl/3 and runs the job when due; every other instance keeps
+# trying to acquire it, so leadership moves as soon as the holder dies and its
+# lease expires. Each acquisition also draws a fencing token from a counter that
+# only grows. Jobs are called as job(token); writes that must not come from a
+# superseded leader are made conditional on it in the database (fence <= token),
+# so a stale leader that is still running is rejected as soon as a newer one wrote.
+# The database keeps the highest token written (t_sync_state.fence, one row per
+# lease name), and a counter lost with Redis (flushdb, failover) restarts from it
+# instead of from 1.
+#
+# Without Redis the job runs unguarded in every process, as before, with token None.
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from app.database import engine
+from app.models.TSyncState import TSyncState
+from app.redis_client import get_redis
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+LEADER_LEASE_TTL_MS = int(os.getenv("LEADER_LEASE_TTL_MS", "30000"))
+LEADER_KEY_PREFIX = os.getenv("LEADER_KEY_PREFIX", "central:leader")
+
+# Logger
+logger = logging.getLogger(__name__)
+
+# KEYS[1] lease, KEYS[2] fencing counter; ARGV[1] owner, ARGV[2] ttl in ms
+ACQUIRE_SCRIPT = """
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('incr', KEYS[2])
+end
+return false
+"""
+# KEYS[1] lease; ARGV[1] owner, ARGV[2] ttl in ms
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def stored_fence(name: str) -> int:
+    """Highest fencing token recorded for `name` by a fenced write (t_sync_state.fence), 0 if none."""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(TSyncState.fence).where(TSyncState.name == name))
+        return result.scalar() or 0
+
+
+class StaleLeaderError(RuntimeError):
+    """Raised by a fenced write when a newer leader has already written."""
+
+
+async def claim_fence(db, token, name):
+    """
+    Record `token` as the fence of `name` in the current transaction, locking the row
+    until commit. Raises StaleLeaderError if a newer token already wrote; no-op for None.
+    """
+    if token is None:
+        return
+    stmt = insert(TSyncState).values(name=name, fence=token)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={"fence": stmt.excluded.fence},
+        where=func.coalesce(TSyncState.fence, 0) <= stmt.excluded.fence,
+    ).returning(TSyncState.name)
+    result = await db.execute(stmt)
+    if result.scalar() is None:
+        raise StaleLeaderError(f"{name}: fencing token {token} is stale, a newer leader has written")
+
+
+async def check_fence(token, name):
+    """
+    claim_fence in a transaction of its own, for jobs writing to another database:
+    a superseded leader stops before its next write instead of within it.
+    """
+    if token is None:
+        return
+    async with engine.begin() as conn:
+        await claim_fence(conn, token, name)
+
+
+class LeaderLease:
+    """A renewable Redis lease on `name`; `token` is the fencing token while it is held."""
+
+    def __init__(self, redis, name: str, ttl_ms: int = LEADER_LEASE_TTL_MS):
+        self.redis = redis
+        self.name = name
+        self.ttl_ms = ttl_ms
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.key = f"{LEADER_KEY_PREFIX}:{name}"
+        self.fence_key = f"{self.key}:fence"
+        self.token: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self.token is not None
+
+    async def _seed_fence(self):
+        # Without its counter Redis would hand out tokens that every fenced write rejects
+        if not await self.redis.exists(self.fence_key):
+            floor = await stored_fence(self.name)
+            if await self.redis.set(self.fence_key, floor, nx=True):
+                logger.warning(f"Fencing counter of {self.name} was missing, restarted from {floor}")
+
+    async def acquire(self) -> bool:
+        await self._seed_fence()
+        token = await self.redis.eval(ACQUIRE_SCRIPT, 2, self.key, self.fence_key, self.owner, self.ttl_ms)
+        if token:
+            self.token = int(token)
+            logger.info(f"Acquired leader lease {self.name} as {self.owner} (token {self.token})")
+        return self.held
+
+    async def renew(self) -> bool:
+        if self.held and not await self.redis.eval(RENEW_SCRIPT, 1, self.key, self.owner, self.ttl_ms):
+            logger.warning(f"Lost leader lease {self.name} (token {self.token})")
+            self.token = None
+        return self.held
+
+    async def release(self):
+        if self.held:
+            await self.redis.eval(RELEASE_SCRIPT, 1, self.key, self.owner)
+            self.token = None
+
+    async def last_run(self) -> float:
+        value = await self.redis.get(f"{self.key}:last_run")
+        return float(value) if value else 0.0
+
+    async def mark_run(self):
+        await self.redis.set(f"{self.key}:last_run", time.time())
+
+
+async def _run_while_held(lease: LeaderLease, job):
+    """
+    Run `job(token)` while renewing the lease. The job is cancelled if the lease is
+    lost or cannot be renewed (the renew error is raised).
+    """
+    task = asyncio.create_task(job(lease.token))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=lease.ttl_ms / 3000)
+            if done:
+                return task.result()
+            if not await lease.renew():
+                logger.error(f"Cancelled {lease.name}: another instance took over the lease")
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.wait({task})
+
+
+async def run_once_as_leader(name: str, job, redis=None, ttl_ms: int = LEADER_LEASE_TTL_MS):
+    """
+    Run `job(token)` once if the `name` lease is free, e.g. from a Celery task.
+    Returns (ran, result); without Redis the job runs unguarded with token None.
+    """
+    redis = redis or await get_redis()
+    if redis is None:
+        return True, await job(None)
+    lease = LeaderLease(redis, name, ttl_ms)
+    if not await lease.acquire():
+        logger.info(f"Skipping {name}: another instance holds the lease")
+        return False, None
+    try:
+        return True, await _run_while_held(lease, job)
+    finally:
+        await lease.release()
+
+
+async def run_as_leader(name: str, job, interval_seconds: float, ttl_ms: int = LEADER_LEASE_TTL_MS):
+    """
+    Run `job(token)` (an async callable) every `interval_seconds` in whichever instance
+    holds the `name` lease. The schedule is kept in Redis, so a new leader carries
+    on from the last run instead of starting over.
+    """
+    redis = await get_redis()
+    if redis is None:
+        logger.warning(f"Redis unavailable: running {name} in this process without a leader lease")
+        while True:
+            await _run_job(name, job, None)
+            await asyncio.sleep(interval_seconds)
+
+    lease = LeaderLease(redis, name, ttl_ms)
+    try:
+        while True:
+            try:
+                if lease.held:
+                    await lease.renew()
+                else:
+                    await lease.acquire()
+                if lease.held and time.time() - await lease.last_run() >= interval_seconds:
+                    await _run_while_held(lease, lambda token: _run_job(name, job, token))
+                    if lease.held:
+                        await lease.mark_run()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Leader lease error for {name}: {str(e)}")
+            await asyncio.sleep(ttl_ms / 3000)
+    finally:
+        try:
+            await lease.release()
+        except Exception:
+            pass
+
+
+async def _run_job(name, job, token):
+    try:
+        return await job(token)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error in {name}: {str(e)}")
@@ -1,8 +1,16 @@
 import os
+import io
+import csv
+import time
+from itertools import islice
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import pandas as pd
 from sqlalchemy import create_engine
+from sqlalchemy.exc import SQLAlchemyError
 import psycopg2
+from app.database import POOL_OPTIONS, engine as async_engine
+from app.utils import asyncOperations
 
 # loading the .env file
 # Load environment variables from the specified .env file
@@ -25,10 +33,53 @@ password = os.getenv("PASSWD")
 # if not all([host, database, user, password]):
 #     raise ValueError("One or more environment variables are missing")
 
-db_con = create_engine(f"postgresql://{user}:{password}@{host}:5432/{database}")   
-db_con_historical = create_engine(f"postgresql://{user}:{password}@{host}:5432/{database_historical}")
+# Pooled engines: every helper below checks connections out of these pools
+db_con = create_engine(f"postgresql://{user}:{password}@{host}:5432/{database}", **POOL_OPTIONS)
+db_con_historical = create_engine(f"postgresql://{user}:{password}@{host}:5432/{database_historical}", **POOL_OPTIONS)
 df = ""
 
+# Errors raised by the driver or by the pool (e.g. checkout timeout)
+DB_ERRORS = (psycopg2.Error, SQLAlchemyError)
+
+
+@contextmanager
+def get_cursor(engine=None):
+    """
+    Check out a pooled psycopg2 connection and yield a cursor.
+    Commits on success, rolls back on error and always returns the connection to the pool.
+    """
+    conn = (engine or db_con).raw_connection()
+    cursor = conn.cursor()
+    try:
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()  # returns the connection to the pool
+
+
+def _pool_stats(pool):
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": POOL_OPTIONS["max_overflow"],
+        "timeout": POOL_OPTIONS["pool_timeout"],
+    }
+
+
+def get_pool_stats():
+    """Return checkout statistics for every database pool in the process."""
+    return {
+        "async": _pool_stats(async_engine.pool),
+        "central": _pool_stats(db_con.pool),
+        "historical": _pool_stats(db_con_historical.pool),
+    }
+
 def getUser(token):
     try:
         # Get a connection from the engine
@@ -45,215 +96,137 @@ def getUser(token):
 # Def get signal
 def getSignal(token, pair, timeframe):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Select data from the t_signal table
-        sql = f"SELECT * FROM t_signal WHERE token = {token} AND pair = '{pair}' AND timeframe = '{timeframe}'"
-        cursor.execute(sql)
-        result = cursor.fetchone()
-        conn.commit()
+        with get_cursor() as cursor:
+            # Select data from the t_signal table
+            sql = f"SELECT * FROM t_signal WHERE token = {token} AND pair = '{pair}' AND timeframe = '{timeframe}'"
+            cursor.execute(sql)
+            result = cursor.fetchone()
         if result is None:
             return None
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         print("Error:", e)
         return None
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
             
 # Def trendTime
 def addTsignal(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "insert into t_signal (signal,token,pair,timeframe,gain_threshold,stop_loss_threshold) values (%s,%s,%s,%s,%s,%s)"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "insert into t_signal (signal,token,pair,timeframe,gain_threshold,stop_loss_threshold) values (%s,%s,%s,%s,%s,%s)"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close() 
 
 # Def trendTime
 def resetTokenSignal(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "delete from t_signal where token=%s and pair=%s and timeframe=%s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "delete from t_signal where token=%s and pair=%s and timeframe=%s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close()                       
 
 # Def trendTime
 def resetToken(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "delete from capital where token=%s and pair=%s and timeframe=%s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "delete from capital where token=%s and pair=%s and timeframe=%s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close()
     
 
 # Def trendTime
 def startStopBotOp(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "update t_signal set signal = %s where token = %s and pair = %s and timeframe = %s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "update t_signal set signal = %s where token = %s and pair = %s and timeframe = %s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close() 
 
 
 # Def startStop Signals
 def startStopSignalOp(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "update t_login set want_signal = %s where token = %s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "update t_login set want_signal = %s where token = %s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close() 
 
 
 def startStopBotAutoGainers(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "update capital_trader_gainers set signal = %s where token = %s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "update capital_trader_gainers set signal = %s where token = %s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close()
 
 def getCapitalGainers(token):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Select data from the t_signal table
-        sql =  query = f"""
-            SELECT capital FROM capital_trader_gainers
-            WHERE token = '{token}';
-        """
-        cursor.execute(sql)
-        result = cursor.fetchone()
-        conn.commit()
+        with get_cursor() as cursor:
+            # Select data from the t_signal table
+            sql =  query = f"""
+                SELECT capital FROM capital_trader_gainers
+                WHERE token = '{token}';
+            """
+            cursor.execute(sql)
+            result = cursor.fetchone()
         if result is None:
             return None
         else:
             return result[0]    
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         print("Error:", e)
         return None
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
 
 def store_capital_gainer(token, capital):  
     data = (token, capital)  
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = f"""
-            INSERT INTO capital_trader_gainers(token, capital)
-            VALUES (%s, %s)
-            ON CONFLICT (token) DO UPDATE
-            SET capital = EXCLUDED.capital, 
-        """
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = f"""
+                INSERT INTO capital_trader_gainers(token, capital)
+                VALUES (%s, %s)
+                ON CONFLICT (token) DO UPDATE
+                SET capital = EXCLUDED.capital, 
+            """
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
 
 # Def trendTime
 def updateThreshold(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = "update t_signal set gain_threshold = %s, stop_loss_threshold = %s where token = %s and pair = %s and timeframe = %s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = "update t_signal set gain_threshold = %s, stop_loss_threshold = %s where token = %s and pair = %s and timeframe = %s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-           conn.close()                
          
 # Set dynamic model path based on pair and timeframe
 def get_model_path(pair, timeframe):
@@ -262,137 +235,99 @@ def get_model_path(pair, timeframe):
 # Def addTraining
 def addTraining(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Ensure data is a tuple with a single element
-        if not isinstance(data, tuple):
-            data = (data,)
-        # Insert data into the database
-        sql = "INSERT INTO training_in_progress (pair_timeframe) VALUES (%s)"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # Commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # Ensure data is a tuple with a single element
+            if not isinstance(data, tuple):
+                data = (data,)
+            # Insert data into the database
+            sql = "INSERT INTO training_in_progress (pair_timeframe) VALUES (%s)"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
     return gcount
 
 # Def deleteTraining
 def deleteTraining(data):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Ensure data is a tuple with a single element
-        if not isinstance(data, tuple):
-            data = (data,)
-        # Delete data from the database
-        sql = "DELETE FROM training_in_progress WHERE pair_timeframe = %s"
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # Commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # Ensure data is a tuple with a single element
+            if not isinstance(data, tuple):
+                data = (data,)
+            # Delete data from the database
+            sql = "DELETE FROM training_in_progress WHERE pair_timeframe = %s"
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
     return gcount
 
 
 # Def deleteTraining
 async def remove_null_timestamps(table_name):
-    try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Ensure data is a tuple with a single element
-        # if not isinstance(data, tuple):
-        #     data = (data,)
-        # Delete data from the database
-        sql = f'DELETE FROM public."{table_name}" WHERE "timestamp" IS NULL;'
-        cursor.execute(sql)
-        # Commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
-        gcount = 0
-        print("Error:", e)
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
+    # Runs on the asyncpg engine so awaiting it never blocks the event loop
+    return await asyncOperations.remove_null_timestamps(table_name)
 
 # Def get signal
 def getTraining(timeframe):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Select data from the t_signal table
-        sql = f"SELECT * FROM training_in_progress WHERE pair_timeframe = '{timeframe}'"
-        cursor.execute(sql)
-        result = cursor.fetchone()
-        conn.commit()
+        with get_cursor() as cursor:
+            # Select data from the t_signal table
+            sql = f"SELECT * FROM training_in_progress WHERE pair_timeframe = '{timeframe}'"
+            cursor.execute(sql)
+            result = cursor.fetchone()
         if result is None:
             return None
         else:
             return result    
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         print("Error:", e)
         return None
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
 
 # Drop duplicates from SQL table Historical
 def remove_null_from_sql_table(table_name):
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # Delete rows with null timestamp from the specified table
-        sql = f"""
-        DELETE FROM public."{table_name}"
-        WHERE timestamp is null;
-        """
-        cursor.execute(sql)
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # Delete rows with null timestamp from the specified table
+            sql = f"""
+            DELETE FROM public."{table_name}"
+            WHERE timestamp is null;
+            """
+            cursor.execute(sql)
+    except DB_ERRORS as e:
         print(f"Error: {e}")
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
 
-def get_capital_info(token):
+# List the "{pair}_{timeframe}" candle tables in the historical database
+def list_historical_tables():
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-
-        # Execute the SQL query to filter by token
-        query = """
-        SELECT pair, timeframe, capital, crypto_amount
-        FROM public.capital
-        WHERE token = %s
-        """
-        cursor.execute(query, (token,))
+        with get_cursor(db_con_historical) as cursor:
+            sql = """
+            SELECT table_name FROM information_schema.columns
+            WHERE table_schema = 'public' AND column_name = 'start_timestamp'
+            ORDER BY table_name
+            """
+            cursor.execute(sql)
+            return [row[0] for row in cursor.fetchall()]
+    except DB_ERRORS as e:
+        print(f"Error: {e}")
+        return []
 
-        # Fetch all results
-        results = cursor.fetchall()
 
-        # Close the cursor and connection
-        cursor.close()
-        conn.close()
+def get_capital_info(token):
+    try:
+        with get_cursor() as cursor:
+            # Execute the SQL query to filter by token
+            query = """
+            SELECT pair, timeframe, capital, crypto_amount
+            FROM public.capital
+            WHERE token = %s
+            """
+            cursor.execute(query, (token,))
+
+            # Fetch all results
+            results = cursor.fetchall()
 
         if results:
             # Format the crypto_amount to 4 decimal places for each row
@@ -412,31 +347,23 @@ def get_capital_info(token):
 def store_user(token, api_key, api_secret, name, last_name, is_owner = False):  
     data = (token, api_key, api_secret, name, last_name, is_owner)  
     try:
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-        # insert data into the database
-        sql = f"""
-            INSERT INTO t_login(token, api_key, api_secret, name, last_name, is_owner)
-            VALUES (%s, %s, %s,%s, %s, %s)
-            ON CONFLICT (token) DO UPDATE
-            SET api_key = EXCLUDED.api_key, 
-                api_secret = EXCLUDED.api_secret,
-                name = EXCLUDED.name,
-                last_name = EXCLUDED.last_name
-                ;
-        """
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-        # commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # insert data into the database
+            sql = f"""
+                INSERT INTO t_login(token, api_key, api_secret, name, last_name, is_owner)
+                VALUES (%s, %s, %s,%s, %s, %s)
+                ON CONFLICT (token) DO UPDATE
+                SET api_key = EXCLUDED.api_key, 
+                    api_secret = EXCLUDED.api_secret,
+                    name = EXCLUDED.name,
+                    last_name = EXCLUDED.last_name
+                    ;
+            """
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
 
 # Validate OwnerShip if the user is owner or not
 def validatOwner(token):
@@ -449,64 +376,141 @@ def validatOwner(token):
 # Delete user
 def del_user(token):
     try:
-        with psycopg2.connect(host=host, database=database, user=user, password=password) as conn:
-            with conn.cursor() as cursor:
-                # Delete data from the database
-                sql_statements = [
-                    "DELETE FROM t_signal WHERE token = %s;",
-                    "DELETE FROM capital WHERE token = %s;",
-                    "DELETE FROM capital_trader_gainers WHERE token = %s ;",
-                    "DELETE FROM t_bot_status WHERE token = %s;",
-                    "DELETE FROM trader_gainers WHERE token = %s;",
-                    "DELETE FROM t_login WHERE token = %s and is_owner = False;"
-                ]
-                
-                for sql in sql_statements:
-                    cursor.execute(sql, (token,))
-                
-                # Commit the transaction
-                conn.commit()
+        with get_cursor() as cursor:
+            # Delete data from the database
+            sql_statements = [
+                "DELETE FROM t_signal WHERE token = %s;",
+                "DELETE FROM capital WHERE token = %s;",
+                "DELETE FROM capital_trader_gainers WHERE token = %s ;",
+                "DELETE FROM t_bot_status WHERE token = %s;",
+                "DELETE FROM trader_gainers WHERE token = %s;",
+                "DELETE FROM t_login WHERE token = %s and is_owner = False;"
+            ]
+            
+            for sql in sql_statements:
+                cursor.execute(sql, (token,))
                 
-    except psycopg2.Error as e:
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
 
 # Def scalper
 def add_scalper(data):
     try:
-        # Connect to the PostgreSQL database
-        conn = psycopg2.connect(host=host, database=database, user=user, password=password)
-        cursor = conn.cursor()
-
-        # SQL insert statement
-        sql = """
-        INSERT INTO scalper (
-            token, pair, timeframe, capital, crypto_amount, crypto_remaining, timestamp, rowcount, position, 
-            last_partial_exit_price, partial_exit_done, signal, first_trade, entry_price, 
-            stop_loss_percentage, profit_target_from, profit_target_to, 
-            partial_exit_threshold_from, partial_exit_threshold_to, 
-            exit_remaining_percentage_from, exit_remaining_percentage_to, 
-            partial_exit_amount
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        # Execute the insert statement
-        cursor.execute(sql, data)
-        gcount = cursor.rowcount
-
-        # Commit the transaction
-        conn.commit()
-    except psycopg2.Error as e:
+        with get_cursor() as cursor:
+            # SQL insert statement
+            sql = """
+            INSERT INTO scalper (
+                token, pair, timeframe, capital, crypto_amount, crypto_remaining, timestamp, rowcount, position, 
+                last_partial_exit_price, partial_exit_done, signal, first_trade, entry_price, 
+                stop_loss_percentage, profit_target_from, profit_target_to, 
+                partial_exit_threshold_from, partial_exit_threshold_to, 
+                exit_remaining_percentage_from, exit_remaining_percentage_to, 
+                partial_exit_amount
+            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """
+
+            # Execute the insert statement
+            cursor.execute(sql, data)
+            gcount = cursor.rowcount
+    except DB_ERRORS as e:
         gcount = 0
         print("Error:", e)
-    finally:
-        # Close the cursor and connection
-        cursor.close()
-        if conn is not None:
-            conn.close()
 
     return gcount
 
+# Column order of a scalper row, as accepted by add_scalper and add_scalpers_bulk
+SCALPER_COLUMNS = (
+    "token", "pair", "timeframe", "capital", "crypto_amount", "crypto_remaining", "timestamp", "rowcount",
+    "position", "last_partial_exit_price", "partial_exit_done", "signal", "first_trade", "entry_price",
+    "stop_loss_percentage", "profit_target_from", "profit_target_to",
+    "partial_exit_threshold_from", "partial_exit_threshold_to",
+    "exit_remaining_percentage_from", "exit_remaining_percentage_to",
+    "partial_exit_amount",
+)
+SCALPER_BULK_BATCH_SIZE = int(os.getenv("SCALPER_BULK_BATCH_SIZE", "5000"))
+
+
+def _validate_scalper_row(row):
+    """Return the row as a tuple in SCALPER_COLUMNS order, or raise ValueError."""
+    if isinstance(row, dict):
+        missing = [c for c in SCALPER_COLUMNS if c not in row]
+        if missing:
+            raise ValueError(f"missing columns {missing}")
+        row = tuple(row[c] for c in SCALPER_COLUMNS)
+    else:
+        row = tuple(row)
+        if len(row) != len(SCALPER_COLUMNS):
+            raise ValueError(f"expected {len(SCALPER_COLUMNS)} values, got {len(row)}")
+    int(row[0])  # token
+    if not row[1] or not row[2]:
+        raise ValueError("pair and timeframe are required")
+    return row
+
+
+# Def bulk scalper
+def add_scalpers_bulk(rows, batch_size=SCALPER_BULK_BATCH_SIZE):
+    """
+    Stream scalper rows into the database with COPY, one transaction per batch.
+
+    `rows` may be any iterable (or generator) of 22-value tuples or dicts keyed by
+    SCALPER_COLUMNS. Invalid rows are skipped and reported; a failing batch is
+    rolled back on its own without affecting the others.
+    """
+    sql = "COPY scalper ({}) FROM STDIN WITH (FORMAT csv)".format(", ".join(SCALPER_COLUMNS))
+    report = {"batches": [], "inserted": 0, "rejected": 0, "errors": []}
+    started = time.perf_counter()
+    rows = iter(rows)
+    offset = 0
+    batch_number = 0
+
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        batch_number += 1
+        batch_started = time.perf_counter()
+
+        # Validate the whole batch before sending it
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        valid = 0
+        for i, row in enumerate(batch):
+            try:
+                writer.writerow(_validate_scalper_row(row))
+                valid += 1
+            except (ValueError, TypeError) as e:
+                report["errors"].append({"row": offset + i, "error": str(e)})
+        buffer.seek(0)
+
+        inserted = 0
+        error = None
+        if valid:
+            try:
+                with get_cursor() as cursor:
+                    cursor.copy_expert(sql, buffer)
+                    inserted = cursor.rowcount
+            except DB_ERRORS as e:
+                error = str(e).strip()
+                print("Error:", e)
+
+        report["batches"].append({
+            "batch": batch_number,
+            "rows": len(batch),
+            "inserted": inserted,
+            "rejected": len(batch) - valid,
+            "error": error,
+            "seconds": round(time.perf_counter() - batch_started, 4),
+        })
+        report["inserted"] += inserted
+        report["rejected"] += len(batch) - valid
+        offset += len(batch)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 4)
+    report["rows_per_second"] = round(report["inserted"] / elapsed, 1) if elapsed > 0 else 0.0
+    return report
+
 # data = (
 #     556159355,                # token
 #     "SOLUSDT",                # pair
@@ -0,0 +1,159 @@
+# Shared async HTTP client for the Orderly REST API.
+# One httpx.AsyncClient keeps connections alive between calls. Requests are signed
+# with the broker's ed25519 key on every attempt (the signature covers the
+# timestamp), and 429 / 5xx responses and transport errors are retried with
+# exponential backoff and full jitter.
+#
+# For local runs point ORDERLY_BASE_URL at the stub in app/utils/orderlyStub.py.
+import os
+import time
+import random
+import asyncio
+import logging
+import urllib.parse
+from typing import Optional
+from base64 import urlsafe_b64encode
+import httpx
+from base58 import b58decode
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+ORDERLY_ACCOUNT_ID = os.getenv("ORDERLY_ACCOUNT_ID")
+ORDERLY_SECRET = os.getenv("ORDERLY_SECRET", "").replace("ed25519:", "")
+ORDERLY_PUBLIC_KEY = os.getenv("ORDERLY_PUBLIC_KEY")
+ORDERLY_BASE_URL = os.getenv("ORDERLY_BASE_URL")
+ORDERLY_HTTP_TIMEOUT = float(os.getenv("ORDERLY_HTTP_TIMEOUT", "10"))  # seconds per attempt
+ORDERLY_MAX_RETRIES = int(os.getenv("ORDERLY_MAX_RETRIES", "4"))  # retries after the first attempt
+ORDERLY_BACKOFF_BASE = float(os.getenv("ORDERLY_BACKOFF_BASE", "0.5"))  # seconds, doubled per retry
+ORDERLY_BACKOFF_MAX = float(os.getenv("ORDERLY_BACKOFF_MAX", "30"))
+ORDERLY_MAX_CONNECTIONS = int(os.getenv("ORDERLY_MAX_CONNECTIONS", "10"))
+ORDERLY_KEEPALIVE_SECONDS = float(os.getenv("ORDERLY_KEEPALIVE_SECONDS", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Logger
+logger = logging.getLogger(__name__)
+
+
+class OrderlyRequestError(Exception):
+    """The request still failed after every retry. `attempts` holds the per-attempt timings."""
+
+    def __init__(self, message, attempts, response=None):
+        super().__init__(message)
+        self.attempts = attempts
+        self.response = response
+
+
+def _private_key():
+    return Ed25519PrivateKey.from_private_bytes(b58decode(ORDERLY_SECRET))
+
+
+def sign_headers(method: str, path: str, query: str = "", body: str = "") -> dict:
+    """Orderly auth headers for one request; `query` includes its leading '?'."""
+    timestamp = str(int(time.time() * 1000))
+    message = f"{timestamp}{method.upper()}{path}{query}{body}"
+    signature = urlsafe_b64encode(_private_key().sign(message.encode())).decode()
+    return {
+        "orderly-timestamp": timestamp,
+        "orderly-account-id": ORDERLY_ACCOUNT_ID,
+        "orderly-key": ORDERLY_PUBLIC_KEY,
+        "orderly-signature": signature,
+    }
+
+
+def backoff_delay(retry: int, retry_after: Optional[str] = None) -> float:
+    """Full jitter: uniform in [0, min(max, base * 2^retry)]. A Retry-After header wins when given."""
+    if retry_after:
+        try:
+            return min(float(retry_after), ORDERLY_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(ORDERLY_BACKOFF_MAX, ORDERLY_BACKOFF_BASE * 2 ** retry))
+
+
+class OrderlyClient:
+    """
+    Keep-alive client for signed Orderly requests. The underlying httpx client is
+    created on first use and bound to the running event loop; call close() before
+    that loop ends (the FastAPI lifespan does, and so must one-off asyncio.run jobs).
+    """
+
+    def __init__(self, base_url=None, timeout=ORDERLY_HTTP_TIMEOUT, max_retries=ORDERLY_MAX_RETRIES, transport=None):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url or ORDERLY_BASE_URL or "",
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=ORDERLY_MAX_CONNECTIONS,
+                    max_keepalive_connections=ORDERLY_MAX_CONNECTIONS,
+                    keepalive_expiry=ORDERLY_KEEPALIVE_SECONDS,
+                ),
+                transport=self.transport,
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, params: dict = None):
+        """
+        Send a signed request, retrying 429 / 5xx and transport errors.
+        Returns (response, attempts) where attempts lists {attempt, status, seconds, error}.
+        Raises OrderlyRequestError once retries are exhausted or on other error statuses.
+        """
+        query = f"?{urllib.parse.urlencode(params)}" if params else ""
+        attempts = []
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                # Re-signed each attempt: Orderly rejects stale timestamps
+                response = await self._http().request(method, f"{path}{query}", headers=sign_headers(method, path, query))
+            except httpx.TransportError as e:
+                error = f"{type(e).__name__}: {e}"
+            seconds = round(time.perf_counter() - started, 4)
+            attempts.append({
+                "attempt": attempt + 1,
+                "status": response.status_code if response is not None else None,
+                "seconds": seconds,
+                "error": error,
+            })
+            logger.info(f"Orderly {method} {path} attempt {attempt + 1}: "
+                        f"{response.status_code if response is not None else error} in {seconds}s")
+
+            if response is not None and response.status_code < 400:
+                return response, attempts
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                raise OrderlyRequestError(f"Orderly API error {response.status_code}: {response.text}", attempts, response)
+            if attempt == self.max_retries:
+                break
+            await asyncio.sleep(backoff_delay(attempt, response.headers.get("retry-after") if response is not None else None))
+
+        last = attempts[-1]
+        raise OrderlyRequestError(
+            f"Orderly {method} {path} failed after {len(attempts)} attempts: {last['status'] or last['error']}",
+            attempts, response,
+        )
+
+    async def get(self, path: str, params: dict = None):
+        return await self.request("GET", path, params)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared client for the API process and background jobs
+orderly_client = OrderlyClient()
+
+
+async def close_orderly_client():
+    await orderly_client.close()
@@ -0,0 +1,122 @@
+# Local stand-in for the Orderly endpoints used by the volume sync, for development
+# and load tests without touching the real API. Rows are deterministic per date.
+#
+#   python -m app.utils.orderlyStub --port 9000 [--fail-first 2] [--fail-rate 0.2] [--latency 0.05]
+#   ORDERLY_BASE_URL=http://localhost:9000 uvicorn app.main:app
+#
+# Failure injection: the first `fail_first` requests and then a random `fail_rate`
+# share of them answer `fail_status` (503 by default; 429 adds a Retry-After).
+import os
+import random
+import asyncio
+import argparse
+import datetime
+import hashlib
+from fastapi import FastAPI, Request, Query
+from fastapi.responses import JSONResponse
+from dotenv import load_dotenv
+
+# Load environment variables from the specified .env file
+load_dotenv(dotenv_path=".env.micro.central")
+
+STUB_FAIL_FIRST = int(os.getenv("ORDERLY_STUB_FAIL_FIRST", "0"))
+STUB_FAIL_RATE = float(os.getenv("ORDERLY_STUB_FAIL_RATE", "0"))
+STUB_FAIL_STATUS = int(os.getenv("ORDERLY_STUB_FAIL_STATUS", "503"))
+STUB_LATENCY = float(os.getenv("ORDERLY_STUB_LATENCY", "0"))  # seconds added to every response
+STUB_ROWS_PER_DAY = int(os.getenv("ORDERLY_STUB_ROWS_PER_DAY", "3"))
+
+AUTH_HEADERS = ("orderly-timestamp", "orderly-account-id", "orderly-key", "orderly-signature")
+
+app = FastAPI(title="Orderly stub")
+app.state.config = {
+    "fail_first": STUB_FAIL_FIRST,
+    "fail_rate": STUB_FAIL_RATE,
+    "fail_status": STUB_FAIL_STATUS,
+    "latency": STUB_LATENCY,
+    "rows_per_day": STUB_ROWS_PER_DAY,
+}
+app.state.requests = 0
+
+
+def _value(date: datetime.date, index: int, field: str, scale: float) -> float:
+    digest = hashlib.sha256(f"{date}{index}{field}".encode()).digest()
+    return round(int.from_bytes(digest[:4], "big") / 2 ** 32 * scale, 4)
+
+
+def daily_rows(start: datetime.date, end: datetime.date, rows_per_day: int):
+    rows = []
+    date = start
+    while date <= end:
+        for index in range(rows_per_day):
+            maker = _value(date, index, "maker", 50000)
+            taker = _value(date, index, "taker", 50000)
+            total_fee = _value(date, index, "fee", 40)
+            rows.append({
+                "date": date.isoformat(),
+                "perp_volume": round(maker + taker, 4),
+                "perp_taker_volume": taker,
+                "perp_maker_volume": maker,
+                "total_fee": total_fee,
+                "broker_fee": round(total_fee / 4, 4),
+                "realized_pnl": round(_value(date, index, "pnl", 2000) - 1000, 4),
+                "address": f"0x{hashlib.sha1(f'{index}'.encode()).hexdigest()}",
+                "broker_id": "stub_broker",
+            })
+        date += datetime.timedelta(days=1)
+    return rows
+
+
+def _injected_failure():
+    config = app.state.config
+    app.state.requests += 1
+    if app.state.requests <= config["fail_first"] or random.random() < config["fail_rate"]:
+        headers = {"Retry-After": "1"} if config["fail_status"] == 429 else None
+        return JSONResponse({"success": False, "message": "injected failure"}, config["fail_status"], headers=headers)
+    return None
+
+
+@app.get("/v1/volume/broker/daily")
+async def broker_daily(
+    request: Request,
+    start_date: datetime.date = Query(...),
+    end_date: datetime.date = Query(...),
+    page: int = Query(1, ge=1),
+    size: int = Query(25, ge=1, le=500),
+):
+    if app.state.config["latency"]:
+        await asyncio.sleep(app.state.config["latency"])
+    failure = _injected_failure()
+    if failure is not None:
+        return failure
+    if any(header not in request.headers for header in AUTH_HEADERS):
+        return JSONResponse({"success": False, "message": "missing orderly auth headers"}, 401)
+    rows = daily_rows(start_date, end_date, app.state.config["rows_per_day"])
+    return {
+        "success": True,
+        "data": {
+            "rows": rows[(page - 1) * size:page * size],
+            "meta": {"total": len(rows), "records_per_page": size, "current_page": page},
+        },
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a local stub of the Orderly volume API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--fail-first", type=int, default=STUB_FAIL_FIRST, help="fail this many requests first")
+    parser.add_argument("--fail-rate", type=float, default=STUB_FAIL_RATE, help="then fail this share of requests")
+    parser.add_argument("--fail-status", type=int, default=STUB_FAIL_STATUS)
+    parser.add_argument("--latency", type=float, default=STUB_LATENCY, help="seconds added to every response")
+    parser.add_argument("--rows-per-day", type=int, default=STUB_ROWS_PER_DAY)
+    args = parser.parse_args()
+    app.state.config.update(
+        fail_first=args.fail_first,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+        latency=args.latency,
+        rows_per_day=args.rows_per_day,
+    )
+    uvicorn.run(app, host=args.host, port=args.port)
@@ -0,0 +1,101 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Timeframe suffixes used in the "{pair}_{timeframe}" table names
+TIMEFRAME_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+DOWNSAMPLE_METHODS = ("ohlcv", "lttb")
+
+
+def timeframe_to_timedelta(timeframe: str) -> pd.Timedelta:
+    """Convert a timeframe such as "5m", "1h" or "1d" to a Timedelta."""
+    match = re.fullmatch(r"(\d+)([mhdw])", timeframe.strip())
+    if not match:
+        raise ValueError(f"Unsupported timeframe: {timeframe}")
+    return pd.Timedelta(**{TIMEFRAME_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def _timestamps_ns(df) -> np.ndarray:
+    ts = pd.to_datetime(df["start_timestamp"])
+    if ts.dt.tz is not None:
+        ts = ts.dt.tz_convert(None)
+    return ts.to_numpy(dtype="datetime64[ns]")
+
+
+def _reduce_buckets(df, starts: np.ndarray, bucket_timestamps: np.ndarray) -> pd.DataFrame:
+    """
+    Aggregate consecutive row ranges beginning at `starts` into OHLCV candles:
+    first open, max high, min low, last close, summed volume. Any other column
+    (e.g. an indicator) keeps its value at the last row of the range.
+    """
+    ends = np.append(starts[1:], len(df)) - 1
+    candles = pd.DataFrame({
+        "start_timestamp": bucket_timestamps,
+        "low": np.minimum.reduceat(df["low"].to_numpy(dtype=np.float64), starts),
+        "high": np.maximum.reduceat(df["high"].to_numpy(dtype=np.float64), starts),
+        "volume": np.add.reduceat(df["volume"].to_numpy(dtype=np.float64), starts),
+        "open": df["open"].to_numpy(dtype=np.float64)[starts],
+        "close": df["close"].to_numpy(dtype=np.float64)[ends],
+    })
+    for column in df.columns.difference(candles.columns, sort=False):
+        candles[column] = df[column].to_numpy()[ends]
+    return candles
+
+
+def resample_ohlcv(df, target_timeframe: str) -> pd.DataFrame:
+    """Resample candles sorted by start_timestamp to a coarser, epoch-aligned timeframe."""
+    if df.empty:
+        return df
+    step = timeframe_to_timedelta(target_timeframe).value
+    buckets = _timestamps_ns(df).astype(np.int64) // step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    return _reduce_buckets(df, starts, (buckets[starts] * step).astype("datetime64[ns]"))
+
+
+def downsample_ohlcv(df, max_points: int) -> pd.DataFrame:
+    """Merge runs of consecutive candles so at most `max_points` candles remain."""
+    if len(df) <= max_points:
+        return df
+    buckets = np.arange(len(df)) * max_points // len(df)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    return _reduce_buckets(df, starts, _timestamps_ns(df)[starts])
+
+
+def lttb(df, max_points: int, column: str = "close") -> pd.DataFrame:
+    """
+    Largest-Triangle-Three-Buckets: keep the `max_points` rows that best preserve the
+    visual shape of `column`. Returns original rows, not aggregated candles.
+    """
+    n = len(df)
+    if n <= max_points or max_points < 3:
+        return df
+    x = _timestamps_ns(df).astype(np.int64).astype(np.float64)
+    y = df[column].to_numpy(dtype=np.float64)
+
+    # Interior buckets split rows 1..n-2 evenly; first and last rows are always kept
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return df.iloc[selected].reset_index(drop=True)
+
+
+def downsample(df, max_points=None, target_timeframe=None, method="ohlcv") -> pd.DataFrame:
+    """Apply the optional target timeframe first, then cap the number of points."""
+    if target_timeframe:
+        df = resample_ohlcv(df, target_timeframe)
+    if max_points and len(df) > max_points:
+        df = lttb(df, max_points) if method == "lttb" else downsample_ohlcv(df, max_points)
+    return df
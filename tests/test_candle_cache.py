@@ -0,0 +1,62 @@
+import pandas as pd
+
+from app.utils.candleCache import CandleRangeCache
+
+COLUMNS = ["start_timestamp", "low", "high", "volume", "open", "close"]
+
+
+def _candles(timestamps):
+    return pd.DataFrame({"start_timestamp": timestamps, **{column: 1.0 for column in COLUMNS[1:]}})
+
+
+def test_chunks_from_both_loaders_share_one_dtype():
+    cache = CandleRangeCache()
+    day = pd.Timestamp("2025-01-01")
+    # psycopg2 / pd.read_sql: timestamptz comes back tz-aware
+    aware = _candles(pd.date_range("2025-01-01", periods=24, freq="h", tz="UTC"))
+    # asyncpg decoder: naive datetime64[ns]
+    naive = _candles(pd.date_range("2025-01-02", periods=24, freq="h"))
+
+    chunks = {**cache.store("BTC_1h", aware, day, day + pd.Timedelta(days=1)),
+              **cache.store("BTC_1h", naive, day + pd.Timedelta(days=1), day + pd.Timedelta(days=2))}
+    assert {str(chunk["start_timestamp"].dtype) for chunk in chunks.values()} == {"datetime64[ns]"}
+
+    df = cache.assemble(chunks, day, pd.Timestamp("2025-01-02 23:00"), COLUMNS)
+    assert str(df["start_timestamp"].dtype) == "datetime64[ns]"
+    assert len(df) == 48 and df["start_timestamp"].is_monotonic_increasing
+
+
+def test_cached_range_is_served_without_the_loader():
+    cache = CandleRangeCache(close_grace=0)
+    calls = []
+
+    def loader(run_start, run_end):
+        calls.append((run_start, run_end))
+        return _candles(pd.date_range(run_start, run_end, freq="h", inclusive="left", tz="UTC"))
+
+    start, end = pd.Timestamp("2025-01-01"), pd.Timestamp("2025-01-03 12:00")
+    first = cache.get_range("BTC_1h", start, end, loader, COLUMNS)
+    again = cache.get_range("BTC_1h", start, end, loader, COLUMNS)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, again)
+    assert len(first) == 61
+
+
+def _expiries(cache):
+    return {key[1]: entry[2] for key, entry in cache._chunks.items()}
+
+
+def test_days_are_final_only_once_the_table_has_rows_past_them():
+    cache = CandleRangeCache(close_grace=0)
+    day = pd.Timestamp("2025-01-01")
+    candles = _candles(pd.date_range(day, periods=72, freq="h"))
+    run_end = day + pd.Timedelta(days=3)
+
+    # Unknown table, or ingestion still behind: nothing is kept for good
+    cache.store("BTC_1h", candles, day, run_end)
+    assert all(expires is not None for expires in _expiries(cache).values())
+
+    cache.store("BTC_1h", candles, day, run_end, written_through=pd.Timestamp("2025-01-02 00:00", tz="UTC"))
+    expiries = _expiries(cache)
+    assert expiries[day] is None
+    assert expiries[day + pd.Timedelta(days=1)] is not None and expiries[day + pd.Timedelta(days=2)] is not None
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.utils.candleIndexes import ensure_index
+from tests.conftest import TEST_HISTORICAL_DATABASE_URL
+
+
+@pytest.fixture
+def conn(historical_db):
+    """Autocommit psycopg2 connection to the scratch historical database (CREATE INDEX CONCURRENTLY)."""
+    engine = create_engine(TEST_HISTORICAL_DATABASE_URL.replace("+asyncpg", ""), poolclass=NullPool)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text('DROP TABLE IF EXISTS "IDX_1h"'))
+        conn.execute(text('CREATE TABLE "IDX_1h" (start_timestamp timestamptz, pair text, close numeric)'))
+        yield conn
+        conn.execute(text('DROP TABLE IF EXISTS "IDX_1h"'))
+    engine.dispose()
+
+
+def test_unique_constraint_on_start_timestamp_is_found(conn):
+    assert ensure_index(conn, "TEST_1h", check_only=True)["action"] == "exists"
+
+
+@pytest.mark.parametrize("definition", [
+    "UNIQUE INDEX idx_pair_ts ON \"IDX_1h\" (pair, start_timestamp)",
+    "UNIQUE INDEX idx_ts_pair ON \"IDX_1h\" (start_timestamp, pair)",
+    "UNIQUE INDEX idx_partial ON \"IDX_1h\" (start_timestamp) WHERE pair IS NULL",
+])
+def test_indexes_that_do_not_make_start_timestamp_unique_are_not_enough(conn, definition):
+    conn.execute(text(f"CREATE {definition}"))
+    assert ensure_index(conn, "IDX_1h", check_only=True)["action"] == "missing"
+    assert ensure_index(conn, "IDX_1h")["action"] == "created"
+    assert ensure_index(conn, "IDX_1h", check_only=True)["action"] == "exists"
+
+
+def test_composite_index_serves_a_plain_index_request(conn):
+    conn.execute(text('CREATE INDEX idx_ts_pair ON "IDX_1h" (start_timestamp, pair)'))
+    report = ensure_index(conn, "IDX_1h", unique=False, check_only=True)
+    assert (report["action"], report["index"]) == ("exists", "idx_ts_pair")
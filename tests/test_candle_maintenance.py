@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import DBAPIError
+
+from app.utils import candleMaintenance
+
+
+class _PgError(Exception):
+    def __init__(self, sqlstate):
+        super().__init__(f"sqlstate {sqlstate}")
+        self.sqlstate = sqlstate
+
+
+def _db_error(sqlstate):
+    return DBAPIError("DELETE", {}, _PgError(sqlstate))
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """A one-page table whose deletes are scripted by the test."""
+    outcomes = []
+
+    async def table_pages(table):
+        return 1
+
+    async def has_column(table, column):
+        return column == "timestamp"
+
+    async def delete_batch(table, column, first_page, last_page):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def no_sleep(seconds):
+        pass
+
+    monkeypatch.setattr(candleMaintenance, "_table_pages", table_pages)
+    monkeypatch.setattr(candleMaintenance, "_has_column", has_column)
+    monkeypatch.setattr(candleMaintenance, "_delete_batch", delete_batch)
+    monkeypatch.setattr(candleMaintenance.asyncio, "sleep", no_sleep)
+    return outcomes
+
+
+def test_lock_timeouts_are_retried(table):
+    table.extend([_db_error("55P03"), _db_error("55P03"), 7])
+    report = asyncio.run(candleMaintenance.clean_table("BTC_1h"))
+    assert (report["rows_deleted"], report["lock_retries"], report["complete"]) == (7, 2, True)
+
+
+def test_gives_up_after_the_retry_limit(table, monkeypatch):
+    monkeypatch.setattr(candleMaintenance, "MAINTENANCE_LOCK_RETRIES", 1)
+    table.extend([_db_error("55P03"), _db_error("55P03")])
+    report = asyncio.run(candleMaintenance.clean_table("BTC_1h"))
+    assert not report["complete"]
+    assert report["lock_retries"] == 1
+
+
+def test_other_errors_are_not_retried(table):
+    table.extend([_db_error("42P01")])
+    report = asyncio.run(candleMaintenance.clean_table("BTC_1h"))
+    assert (report["complete"], report["lock_retries"]) == (False, 0)
+
+
+def test_tables_without_the_column_are_skipped(table):
+    report = asyncio.run(candleMaintenance.clean_table("BTC_1h", column="missing"))
+    assert report["complete"] and report["skipped"]
+    assert report["batches"] == 0
+
+
+def test_lock_backoff_grows():
+    assert candleMaintenance.lock_backoff(0) <= candleMaintenance.MAINTENANCE_LOCK_BACKOFF
+    assert candleMaintenance.lock_backoff(3) >= 4 * candleMaintenance.MAINTENANCE_LOCK_BACKOFF
+
+
+def test_stale_leader_stops_before_the_next_batch(table, monkeypatch):
+    checked = []
+
+    async def check_fence(token, name):
+        checked.append(token)
+        if len(checked) > 1:
+            raise candleMaintenance.StaleLeaderError(f"{name}: fencing token {token} is stale")
+
+    async def table_pages(table):
+        return 3
+
+    monkeypatch.setattr(candleMaintenance, "check_fence", check_fence)
+    monkeypatch.setattr(candleMaintenance, "_table_pages", table_pages)
+    monkeypatch.setattr(candleMaintenance, "MAINTENANCE_BATCH_PAGES", 1)
+    table.extend([4, 5, 6])
+    report = asyncio.run(candleMaintenance.clean_table("BTC_1h", token=3))
+    assert checked == [3, 3]
+    assert (report["rows_deleted"], report["batches"], report["complete"]) == (4, 1, False)
+    assert "stale" in report["error"]
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.candleStore import CandleStore
+
+HOUR_MS = 3_600_000
+START_MS = pd.Timestamp("2025-01-01").value // 1_000_000
+
+
+def _block(*hours):
+    return np.array([[START_MS + hour * HOUR_MS, 1, 2, 3, 1.5, hour] for hour in hours], dtype=np.float64)
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "TEST_1h").mkdir()
+    return CandleStore(str(tmp_path))
+
+
+def test_duplicate_timestamps_keep_the_first_row(store):
+    assert store.append("TEST_1h", _block(0, 1, 1, 2)) == 3
+    closes = store.read_arrays("TEST_1h", pd.Timestamp(0), pd.Timestamp("2026-01-01"))["close"]
+    assert list(closes) == [0, 1, 2]
+
+
+def test_rows_already_stored_are_skipped(store):
+    store.append("TEST_1h", _block(0, 1))
+    assert store.append("TEST_1h", _block(0, 1, 2, 2, 3)) == 2
+    assert store.row_count("TEST_1h") == 4
+    assert store.last_timestamp("TEST_1h") == pd.Timestamp("2025-01-01 03:00")
+
+
+def test_unsorted_rows_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.append("TEST_1h", _block(2, 1))
+    assert store.row_count("TEST_1h") == 0
@@ -0,0 +1,47 @@
+import gzip
+
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware
+
+BIG = b"x" * 4096
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, min_size=1024)
+
+    @app.get("/big")
+    def big():
+        return Response(BIG, media_type="text/plain", headers={"Vary": "Origin"})
+
+    @app.get("/small")
+    def small():
+        return Response(b"x", media_type="text/plain")
+
+    @app.get("/image")
+    def image():
+        return Response(BIG, media_type="image/png")
+
+    return TestClient(app)
+
+
+def test_compressed_response_keeps_its_vary():
+    response = _client().get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+    assert response.content == BIG  # decoded by the client
+
+
+def test_uncompressed_responses_vary_on_accept_encoding():
+    client = _client()
+    responses = [
+        client.get("/small", headers={"Accept-Encoding": "gzip"}),
+        client.get("/image", headers={"Accept-Encoding": "gzip"}),
+        client.get("/big", headers={"Accept-Encoding": "identity"}),
+    ]
+    for response in responses:
+        assert "content-encoding" not in response.headers
+        assert response.headers["vary"].endswith("Accept-Encoding")
+    assert responses[2].headers["vary"] == "Origin, Accept-Encoding"
@@ -0,0 +1,121 @@
+import asyncio
+import datetime
+
+import pytest
+
+from app.utils import dailyVolume
+from app.utils.dailyVolume import date_windows, sync_window, synced_through
+
+TODAY = datetime.date(2025, 7, 30)
+
+
+def _day(offset):
+    return TODAY + datetime.timedelta(days=offset)
+
+
+def test_first_sync_starts_with_the_initial_window():
+    start, end, watermark = sync_window(None, TODAY, settle_days=2)
+    assert (start, end, watermark) == (_day(-dailyVolume.VOLUME_INITIAL_DAYS), TODAY, _day(-2))
+
+
+def test_sync_resumes_after_the_watermark():
+    assert sync_window(_day(-5), TODAY, settle_days=2) == (_day(-4), TODAY, _day(-2))
+    # Never moves the watermark back, even with a longer settle window
+    assert sync_window(_day(-1), TODAY, settle_days=2) == (TODAY, TODAY, _day(-1))
+
+
+def test_date_windows_cover_the_range_without_overlap():
+    windows = list(date_windows(_day(-69), TODAY, days=30))
+    assert windows == [(_day(-69), _day(-40)), (_day(-39), _day(-10)), (_day(-9), TODAY)]
+    assert list(date_windows(_day(-89), TODAY)) == [(_day(-89), _day(-60)), (_day(-59), _day(-30)), (_day(-29), TODAY)]
+    assert list(date_windows(TODAY, TODAY, days=30)) == [(TODAY, TODAY)]
+    assert list(date_windows(TODAY, _day(-1))) == []
+
+
+def test_synced_through_needs_rows_or_a_confirmed_total():
+    records = [{"date": _day(-5)}, {"date": _day(-3)}]
+    assert synced_through(_day(-9), TODAY, records, fetched=2, total=2) == TODAY
+    assert synced_through(_day(-9), TODAY, [], fetched=0, total=0) == TODAY
+    assert synced_through(_day(-9), TODAY, records, fetched=2, total=None) == _day(-3)
+    assert synced_through(_day(-9), TODAY, records, fetched=2, total=5) == _day(-3)
+    assert synced_through(_day(-9), TODAY, [], fetched=0, total=None) == _day(-10)
+
+
+@pytest.fixture
+def orderly(monkeypatch):
+    """Scripted Orderly pages per window start, with chunk writes and watermark stores recorded."""
+    pages, stored = {}, []
+
+    async def iter_volume_pages(start, end, page_size=None):
+        for page in pages.get(start, [([], None)]):
+            yield page
+
+    async def write_volume_chunk(records, token=None):
+        return len(records)
+
+    async def store_watermark(watermark, status, token=None):
+        stored.append(watermark)
+
+    monkeypatch.setattr(dailyVolume, "iter_volume_pages", iter_volume_pages)
+    monkeypatch.setattr(dailyVolume, "write_volume_chunk", write_volume_chunk)
+    monkeypatch.setattr(dailyVolume, "store_watermark", store_watermark)
+    return pages, stored
+
+
+def _rows(*days):
+    return [{"date": day.isoformat(), "broker_fee": 1} for day in days]
+
+
+def test_watermark_stops_at_the_last_day_with_rows(orderly):
+    # [_day(-89), TODAY] is read as three 30-day windows starting at -89, -59 and -29
+    pages, stored = orderly
+    pages[_day(-89)] = [(_rows(_day(-89), _day(-60)), None)]
+    pages[_day(-59)] = [(_rows(_day(-59), _day(-40)), None)]  # nothing after _day(-40) yet
+    pages[_day(-29)] = [([], 0)]
+
+    result = asyncio.run(dailyVolume.sync_volume_range(_day(-89), TODAY, watermark=_day(-2)))
+    assert stored == [_day(-60), _day(-40)]
+    assert result["watermark"] == _day(-40)
+
+
+def test_confirmed_empty_days_advance_the_watermark(orderly):
+    pages, stored = orderly
+    pages[_day(-89)] = [(_rows(_day(-89)), 1)]
+    pages[_day(-59)] = [([], 0)]
+    pages[_day(-29)] = [(_rows(_day(-29)), 1)]
+
+    result = asyncio.run(dailyVolume.sync_volume_range(_day(-89), TODAY, watermark=_day(-2)))
+    assert stored == [_day(-60), _day(-30), _day(-2)]
+    assert result["watermark"] == _day(-2)
+
+
+def test_no_rows_leave_the_watermark_alone(orderly):
+    pages, stored = orderly
+    result = asyncio.run(dailyVolume.sync_volume_range(_day(-29), TODAY, watermark=_day(-2)))
+    assert stored == []
+    assert result["watermark"] is None
+
+
+def test_backfill_never_stores_a_watermark(orderly):
+    pages, stored = orderly
+    pages[_day(-29)] = [(_rows(_day(-29)), 1)]
+    asyncio.run(dailyVolume.sync_volume_range(_day(-29), TODAY))
+    assert stored == []
+
+
+def test_backfill_task_runs_under_the_sync_lease(monkeypatch):
+    from app.tasks import jobs
+    calls = []
+
+    async def run_once_as_leader(name, job):
+        return True, await job(7)
+
+    async def backfill(start, end, token=None):
+        calls.append((start, end, token))
+        return {"written": 0}
+
+    monkeypatch.setattr(jobs, "run_async", lambda job: asyncio.run(job()))
+    monkeypatch.setattr(jobs, "run_once_as_leader", run_once_as_leader)
+    monkeypatch.setattr(jobs, "backfill_broker_daily_volume", backfill)
+    assert jobs.backfill_orderly_volume(_day(-3).isoformat(), TODAY.isoformat()) == {"written": 0}
+    assert calls == [(_day(-3), TODAY, 7)]
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.utils import operations
+from app.utils.operations import get_cursor, get_pool_stats
+from tests.conftest import TEST_DATABASE_URL
+
+
+def test_pool_stats_cover_every_engine():
+    stats = get_pool_stats()
+    assert set(stats) == {"async", "central", "historical"}
+    assert {"size", "checked_in", "checked_out", "overflow", "max_overflow", "timeout"} <= set(stats["central"])
+
+
+@pytest.fixture
+def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL.replace("+asyncpg", ""), pool_size=2, max_overflow=0)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS pool_probe"))
+        conn.execute(text("CREATE TABLE pool_probe (id integer)"))
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS pool_probe"))
+    engine.dispose()
+
+
+def _rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM pool_probe")).scalar()
+
+
+def test_cursor_commits_and_returns_its_connection(engine):
+    with get_cursor(engine) as cursor:
+        cursor.execute("INSERT INTO pool_probe VALUES (1)")
+        assert operations._pool_stats(engine.pool)["checked_out"] == 1
+    assert operations._pool_stats(engine.pool)["checked_out"] == 0
+    assert _rows(engine) == 1
+
+
+def test_cursor_rolls_back_on_error(engine):
+    with pytest.raises(ZeroDivisionError):
+        with get_cursor(engine) as cursor:
+            cursor.execute("INSERT INTO pool_probe VALUES (1)")
+            1 / 0
+    assert operations._pool_stats(engine.pool)["checked_out"] == 0
+    assert _rows(engine) == 0
@@ -0,0 +1,98 @@
+import asyncio
+import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import select
+
+from app.models.TVolumeRecord import TVolumeRecord
+from app.tasks import jobs
+from app.utils.dailyVolume import group_volume_rows, set_watermark, write_volume_chunk
+from app.utils.feeDistribution import distribute_fees
+
+DAY = datetime.date(2025, 3, 1)
+
+
+def _rows(date, broker_fee):
+    return [{"date": date.isoformat(), "perp_volume": 100, "total_fee": 4 * broker_fee, "broker_fee": broker_fee,
+             "address": "0xabc", "broker_id": "broker"}]
+
+
+def _write(date, broker_fee):
+    return asyncio.run(write_volume_chunk(group_volume_rows(_rows(date, broker_fee))))
+
+
+def _stored(engine, date):
+    async def load():
+        async with engine.connect() as conn:
+            result = await conn.execute(select(TVolumeRecord).where(TVolumeRecord.date == date))
+            return result.one()
+    return asyncio.run(load())
+
+
+def _set_watermark(engine, watermark):
+    async def store():
+        async with engine.begin() as conn:
+            await set_watermark(conn, watermark, "ok")
+    asyncio.run(store())
+
+
+def test_share_is_rounded_to_the_column_precision(central_db):
+    _write(DAY, 0.00000003)
+    report = asyncio.run(distribute_fees(DAY, share=0.5))
+    assert report["rows"] == 1
+    assert _stored(central_db, DAY).distributed_fees_half == Decimal("0.00000002")
+
+
+def test_distribution_is_idempotent_across_batches(central_db):
+    for offset in range(5):
+        _write(DAY + datetime.timedelta(days=offset), 10)
+    until = DAY + datetime.timedelta(days=3)
+
+    first = asyncio.run(distribute_fees(until, share=0.5, batch_size=2))
+    assert (first["rows"], first["batches"], first["fees_distributed"]) == (4, 2, Decimal("20"))
+    assert (first["first_date"], first["last_date"]) == (DAY, until)
+
+    again = asyncio.run(distribute_fees(until, share=0.5, batch_size=2))
+    assert (again["rows"], again["fees_distributed"]) == (0, 0)
+    assert not _stored(central_db, DAY + datetime.timedelta(days=4)).distributed
+
+
+def test_changed_broker_fee_is_redistributed(central_db):
+    _write(DAY, 10)
+    asyncio.run(distribute_fees(DAY, share=0.5))
+    assert _write(DAY, 10) == 0  # unchanged rows are not rewritten, the payout stays
+
+    assert _write(DAY, 12) == 1
+    stored = _stored(central_db, DAY)
+    assert not stored.distributed
+
+    report = asyncio.run(distribute_fees(DAY, share=0.5))
+    assert report["rows"] == 1
+    assert _stored(central_db, DAY).distributed_fees_half == Decimal("6")
+
+
+def test_defaults_to_the_volume_watermark(central_db):
+    _write(DAY, 10)
+    assert asyncio.run(distribute_fees())["skipped"]
+
+    _set_watermark(central_db, DAY - datetime.timedelta(days=1))
+    assert asyncio.run(distribute_fees())["rows"] == 0
+    _set_watermark(central_db, DAY)
+    assert asyncio.run(distribute_fees())["rows"] == 1
+
+
+def test_task_fails_when_the_lease_is_lost(monkeypatch):
+    monkeypatch.setattr(jobs, "run_async", lambda job: (True, None))
+    with pytest.raises(RuntimeError, match="leader lease"):
+        jobs.distribute_broker_fees()
+
+
+def test_stale_token_distributes_nothing(central_db):
+    _write(DAY, 10)
+    assert asyncio.run(distribute_fees(DAY, share=0.5, token=5))["rows"] == 1
+    _write(DAY, 12)
+
+    report = asyncio.run(distribute_fees(DAY, share=0.5, token=4))
+    assert "stale" in report["error"] and report["rows"] == 0
+    assert not _stored(central_db, DAY).distributed
@@ -0,0 +1,90 @@
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers import OrderlyController
+from app.controllers.OrderlyController import align_series, router
+from app.utils import historicalCatalog
+from app.utils.candleCache import utc_now
+
+HOUR_MS = 3_600_000
+T0 = 1735689600000  # 2025-01-01 00:00 UTC
+
+
+def _frame(start, periods, close):
+    return pd.DataFrame({
+        "start_timestamp": pd.date_range(start, periods=periods, freq="h"),
+        "low": 1.0, "high": 2.0, "volume": 3.0, "open": 1.5, "close": close,
+    })
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_outer_alignment_fills_missing_candles_with_null():
+    frames = {"A_1h": _frame("2025-01-01 00:00", 3, 1.0), "B_1h": _frame("2025-01-01 01:00", 3, 2.0)}
+    aligned = align_series(frames, "outer")
+    assert aligned["start_timestamp"] == [T0 + i * HOUR_MS for i in range(4)]
+    assert aligned["series"]["A_1h"]["close"] == [1.0, 1.0, 1.0, None]
+    assert aligned["series"]["B_1h"]["close"] == [None, 2.0, 2.0, 2.0]
+
+
+def test_inner_alignment_keeps_shared_candles():
+    frames = {"A_1h": _frame("2025-01-01 00:00", 3, 1.0), "B_1h": _frame("2025-01-01 01:00", 3, 2.0),
+              "C_1h": _frame("2025-01-01 00:00", 0, 3.0)}
+    aligned = align_series({key: frames[key] for key in ("A_1h", "B_1h")}, "inner")
+    assert aligned["start_timestamp"] == [T0 + HOUR_MS, T0 + 2 * HOUR_MS]
+    assert aligned["series"]["A_1h"]["close"] == [1.0, 1.0]
+    assert align_series(frames, "inner")["start_timestamp"] == []
+    assert align_series({}, "outer") == {"start_timestamp": [], "series": {}}
+
+
+def _query(pair, values="2025-01-01T00:00:00|2025-01-01T02:00:00"):
+    return {"pair": pair, "timeframe": "1h", "values": values}
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"queries": []}, 400),
+    ({"queries": [_query("A")], "format": "arrow"}, 400),
+    ({"queries": [_query("A")], "align": "left"}, 400),
+    ({"queries": [_query("A"), _query("A")], "align": "outer"}, 400),
+    ({"queries": [_query("A"), _query("B"), _query("C")]}, 413),
+])
+def test_invalid_batches_are_rejected(monkeypatch, body, status):
+    monkeypatch.setattr(OrderlyController, "HISTORICAL_BATCH_MAX_QUERIES", 2)
+    assert _client().post("/query-historical-data/batch", json=body).status_code == status
+
+
+@pytest.fixture
+def catalog(historical_db, monkeypatch):
+    catalog = historicalCatalog.HistoricalCatalog()
+    catalog.tables = {"TEST_1h": {"rows": 48, "min_timestamp": pd.Timestamp("2025-01-01"),
+                                  "max_timestamp": pd.Timestamp("2025-01-02 23:00")}}
+    catalog.refreshed_at = utc_now()
+    monkeypatch.setattr(OrderlyController, "historical_catalog", catalog)
+    return catalog
+
+
+def test_batch_results_match_single_queries(catalog):
+    client = _client()
+    queries = [_query("TEST"), _query("NONE"), _query("TEST", "2025-01-02T00:00:00|2025-01-02T01:00:00")]
+    results = client.post("/query-historical-data/batch", json={"queries": queries}).json()["results"]
+
+    assert [result["pair"] for result in results] == ["TEST", "NONE", "TEST"]
+    assert results[1]["error"]["status_code"] == 404
+    for query, result in zip(queries[::2], results[::2]):
+        assert result["data"] == client.post("/query-historical-data", json=query).json()
+    assert [result.get("rows") for result in results] == [3, None, 2]
+
+
+def test_aligned_batch_reports_errors_beside_the_series(catalog):
+    body = {"queries": [_query("TEST"), _query("NONE")], "align": "outer"}
+    response = _client().post("/query-historical-data/batch", json=body).json()
+    assert response["start_timestamp"] == [T0, T0 + HOUR_MS, T0 + 2 * HOUR_MS]
+    assert list(response["series"]) == ["TEST_1h"]
+    assert response["series"]["TEST_1h"]["open"] == [100.0, 101.0, 102.0]
+    assert [(error["pair"], error["status_code"]) for error in response["errors"]] == [("NONE", 404)]
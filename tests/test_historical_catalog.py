@@ -0,0 +1,95 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.controllers.OrderlyController import HistoricalDataRequest, clip_to_catalog, router
+from app.utils import historicalCatalog
+from app.utils.candleCache import utc_now
+
+INFO = {"rows": 48, "min_timestamp": pd.Timestamp("2025-01-01"), "max_timestamp": pd.Timestamp("2025-01-02 23:00")}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """A fresh catalog that knows TEST_1h, patched in where the controller reads it."""
+    from app.controllers import OrderlyController
+
+    catalog = historicalCatalog.HistoricalCatalog()
+    catalog.tables = {"TEST_1h": INFO}
+    catalog.refreshed_at = utc_now()
+    monkeypatch.setattr(OrderlyController, "historical_catalog", catalog)
+    return catalog
+
+
+def _clip(values, pair="TEST"):
+    request = HistoricalDataRequest(pair=pair, timeframe="1h", values=values)
+    return asyncio.run(clip_to_catalog(request)), request.values
+
+
+@pytest.mark.parametrize("values", [
+    "2025-01-01T10:00:00Z|2025-01-01T12:00:00Z",
+    "2025-01-01T12:00:00+02:00|2025-01-01T14:00:00+02:00",
+    "2025-01-01T10:00:00|2025-01-01T12:00:00",
+])
+def test_bounds_with_an_offset_are_clipped_as_utc(catalog, values):
+    assert _clip(values) == (True, "2025-01-01T10:00:00|2025-01-01T12:00:00")
+
+
+def test_offset_bounds_are_clipped_to_the_table_span(catalog):
+    # The end is not clipped to max_timestamp: rows may have been written since the refresh
+    assert _clip("2024-12-31T00:00:00+02:00|2025-03-01T00:00:00Z") == (True, "2025-01-01T00:00:00|2025-03-01T00:00:00")
+    assert _clip("2024-12-31T00:00:00+02:00|2024-12-31T23:00:00+02:00")[0] is False
+
+
+def test_malformed_range_is_a_400(catalog):
+    with pytest.raises(HTTPException) as error:
+        _clip("2025-01-01")
+    assert error.value.status_code == 400
+
+
+def test_table_created_after_the_refresh_is_looked_up(catalog, monkeypatch):
+    lookups = []
+
+    async def refresh_table(table):
+        lookups.append(table)
+        if table == "NEW_1h":
+            catalog.tables = {**catalog.tables, table: INFO}
+            return INFO
+        return None
+
+    monkeypatch.setattr(catalog, "refresh_table", refresh_table)
+    assert _clip("2025-01-01T10:00:00Z|2025-01-01T12:00:00Z", pair="NEW")[0] is True
+    with pytest.raises(HTTPException) as error:
+        _clip("2025-01-01T10:00:00Z|2025-01-01T12:00:00Z", pair="NONE")
+    assert error.value.status_code == 404
+    assert lookups == ["NEW_1h", "NONE_1h"]
+
+
+def test_refresh_table_scans_only_that_table(historical_db):
+    catalog = historicalCatalog.HistoricalCatalog()
+
+    async def lookups():
+        found = await catalog.refresh_table("TEST_1h")
+        missing = await catalog.refresh_table("NONE_1h")
+        return found, missing
+
+    found, missing = asyncio.run(lookups())
+    assert found["rows"] == 48 and found["max_timestamp"] == pd.Timestamp("2025-01-02 23:00")
+    assert missing is None and "NONE_1h" in catalog._misses
+    assert list(catalog.tables) == ["TEST_1h"]
+
+
+def test_query_with_utc_bounds_is_served(historical_db, catalog):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    body = {"pair": "TEST", "timeframe": "1h", "values": "2025-01-01T12:00:00+02:00|2025-01-01T12:00:00Z"}
+    response = client.post("/query-historical-data", json=body)
+    assert response.status_code == 200
+    assert [row["start_timestamp"] for row in response.json()][::2] == ["2025-01-01T10:00:00Z", "2025-01-01T12:00:00Z"]
+
+    response = client.get("/historical-data/TEST/1h", params={"start": "2025-01-01T10:00:00Z", "end": "2025-01-01T11:00:00Z"})
+    assert response.status_code == 200 and len(response.json()) == 2
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.controllers.OrderlyController import router
+from app.utils.historicalFormats import (
+    HISTORICAL_COLUMNS, frame_to_arrays, negotiate_format, to_arrow_ipc, to_columnar_json, to_packed_float64,
+)
+
+EPOCH_MS = [1735689600000, 1735693200000]  # 2025-01-01 00:00 and 01:00 UTC
+
+
+def _frame(timestamps):
+    return pd.DataFrame({"start_timestamp": timestamps, "low": [1.0, np.nan], "high": 2.0, "volume": 3.0, "open": 1.5, "close": 1.6})
+
+
+@pytest.mark.parametrize("requested, accept, expected", [
+    ("columnar", "application/vnd.apache.arrow.stream", "columnar"),
+    (None, "application/vnd.apache.arrow.stream", "arrow"),
+    ("records", "text/html, application/octet-stream;q=0.9", "float64"),
+    (None, "application/x-ndjson", "ndjson"),
+    (None, "application/json, */*", "records"),
+    (None, None, "records"),
+])
+def test_negotiate_format(requested, accept, expected):
+    assert negotiate_format(requested, accept) == expected
+
+
+def test_timestamps_are_epoch_milliseconds_whatever_the_timezone():
+    naive = pd.date_range("2025-01-01", periods=2, freq="h")
+    madrid = pd.date_range("2025-01-01 01:00", periods=2, freq="h", tz="Europe/Madrid")
+    for timestamps in (naive, madrid):
+        arrays = frame_to_arrays(_frame(timestamps))
+        assert arrays["start_timestamp"].dtype == np.int64
+        assert arrays["start_timestamp"].tolist() == EPOCH_MS
+
+
+def test_columnar_json_maps_nan_to_null():
+    payload = json.loads(to_columnar_json(_frame(pd.date_range("2025-01-01", periods=2, freq="h"))))
+    assert list(payload) == HISTORICAL_COLUMNS
+    assert payload["start_timestamp"] == EPOCH_MS
+    assert payload["low"] == [1.0, None]
+
+
+def test_packed_float64_is_column_major():
+    body, headers = to_packed_float64(_frame(pd.date_range("2025-01-01", periods=2, freq="h")))
+    assert headers["X-Columns"].split(",") == HISTORICAL_COLUMNS and headers["X-Row-Count"] == "2"
+    values = np.frombuffer(body, dtype="<f8").reshape(len(HISTORICAL_COLUMNS), 2)
+    assert values[0].tolist() == EPOCH_MS
+    assert values[1][0] == 1.0 and np.isnan(values[1][1])
+    assert values[5].tolist() == [1.6, 1.6]
+
+
+def test_arrow_stream_round_trips():
+    pa = pytest.importorskip("pyarrow")
+    table = pa.ipc.open_stream(to_arrow_ipc(_frame(pd.date_range("2025-01-01", periods=2, freq="h")))).read_all()
+    assert table.column_names == HISTORICAL_COLUMNS
+    assert str(table.schema.field("start_timestamp").type) == "timestamp[ms]"
+    assert table.column("start_timestamp").cast("int64").to_pylist() == EPOCH_MS
+    assert table.column("low").to_pylist()[0] == 1.0
+
+
+def test_formats_agree_with_the_records_format(historical_db):
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+    body = {"pair": "TEST", "timeframe": "1h", "values": "2025-01-01T00:00:00|2025-01-01T05:00:00"}
+
+    records = client.post("/query-historical-data", json=body).json()
+    columnar = client.post("/query-historical-data", params={"format": "columnar"}, json=body).json()
+    packed = client.post("/query-historical-data", json=body, headers={"Accept": "application/octet-stream"})
+
+    assert packed.headers["content-type"] == "application/octet-stream"
+    values = np.frombuffer(packed.content, dtype="<f8").reshape(len(HISTORICAL_COLUMNS), -1)
+    expected_ms = [int(pd.Timestamp(row["start_timestamp"]).value // 1_000_000) for row in records]
+    assert columnar["start_timestamp"] == expected_ms == values[0].astype(np.int64).tolist()
+    assert columnar["close"] == [row["close"] for row in records] == values[5].tolist()
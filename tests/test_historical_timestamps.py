@@ -0,0 +1,71 @@
+import asyncio
+import datetime
+import json
+
+import pandas as pd
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from pydantic_core import to_jsonable_python
+
+from app.controllers.OrderlyController import router, to_records
+from app.utils.candleCache import candle_cache
+from app.utils.getHistorical import fetch_historical_arrays, get_historical_data
+from app.utils.historicalFormats import iter_ndjson
+from tests.conftest import TEST_CANDLES
+
+# What the records format returned before any of the historical changes
+EXPECTED = ["2025-01-01T00:00:00Z", "2025-01-01T01:00:00Z"]
+
+
+def _frame(timestamps):
+    return pd.DataFrame({"start_timestamp": timestamps, "low": 1.0, "high": 2.0, "volume": 3.0, "open": 1.5, "close": 1.6})
+
+
+def _record_timestamps(df):
+    return [row["start_timestamp"] for row in to_jsonable_python(to_records(df))]
+
+
+def test_records_are_utc_whatever_the_frame_timezone():
+    naive = pd.date_range("2025-01-01", periods=2, freq="h")  # asyncpg decoder and cache
+    aware = pd.date_range("2025-01-01 01:00", periods=2, freq="h", tz="Europe/Madrid")  # pandas read_sql
+    assert _record_timestamps(_frame(naive)) == EXPECTED
+    assert _record_timestamps(_frame(aware)) == EXPECTED
+
+
+def test_ndjson_matches_the_records_format():
+    madrid = datetime.timezone(datetime.timedelta(hours=1))  # psycopg2 rows follow the session time zone
+    rows = [(datetime.datetime(2025, 1, 1, 1, tzinfo=madrid), 1, 2, 3, 1.5, 1.6),
+            (datetime.datetime(2025, 1, 1, 1), 1, 2, 3, 1.5, 1.6)]  # naive values are UTC
+    lines = "".join(iter_ndjson([rows])).splitlines()
+    assert [json.loads(line)["start_timestamp"] for line in lines] == EXPECTED
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def test_records_ndjson_and_cached_paths_agree(historical_db):
+    expected = [ts.isoformat().replace("+00:00", "Z") for ts in TEST_CANDLES[:24]]
+    body = {"pair": "TEST", "timeframe": "1h", "values": "2025-01-01T00:00:00|2025-01-01T23:00:00"}
+    client = _client()
+
+    hits = candle_cache.stats()["hits"]
+    fetched = client.post("/query-historical-data", json=body).json()
+    assert candle_cache.stats()["hits"] == hits
+    cached = client.post("/query-historical-data", json=body).json()
+    assert candle_cache.stats()["hits"] > hits
+    ndjson = client.post("/query-historical-data", json={**body, "format": "ndjson"}).text.splitlines()
+    ranged = client.get("/historical-data/TEST/1h", params={"start": "2025-01-01T00:00:00", "end": "2025-01-01T23:00:00"}).json()
+
+    assert [row["start_timestamp"] for row in fetched] == expected
+    assert [row["start_timestamp"] for row in cached] == expected
+    assert [json.loads(line)["start_timestamp"] for line in ndjson] == expected
+    assert [row["start_timestamp"] for row in ranged] == expected
+
+    uncached = asyncio.run(fetch_historical_arrays(
+        "TEST", "1h", datetime.datetime(2025, 1, 1), datetime.datetime(2025, 1, 1, 23)))
+    assert _record_timestamps(uncached) == expected
+    # psycopg2 loader, whose session runs in another time zone
+    assert _record_timestamps(get_historical_data("TEST", "1h", body["values"], use_cache=False)) == expected
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.indicators import INDICATORS, IndicatorCache, add_indicators, normalize_spec
+
+START = pd.Timestamp("2025-01-01")
+SPECS = [normalize_spec(name) for name in INDICATORS]
+CLOSED = pd.Timestamp("2030-01-01")  # every candle is closed
+
+
+def _candles(rows):
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 1, rows))
+    return pd.DataFrame({
+        "start_timestamp": pd.date_range(START, periods=rows, freq="h"),
+        "low": close - rng.uniform(0, 2, rows),
+        "high": close + rng.uniform(0, 2, rows),
+        "volume": rng.uniform(1, 10, rows),
+        "open": close + rng.normal(0, 0.5, rows),
+        "close": close,
+    })
+
+
+def _with_indicators(df, cache):
+    return add_indicators(df, "TEST_1h", "1h", START, SPECS, closed_until=CLOSED, cache=cache)
+
+
+@pytest.fixture
+def candles():
+    return _candles(200)
+
+
+def test_longer_range_extends_the_cached_prefix(candles):
+    cache = IndicatorCache()
+    _with_indicators(candles.iloc[:120], cache)
+    extended = _with_indicators(candles, cache)
+
+    pd.testing.assert_frame_equal(extended, _with_indicators(candles, None))
+    stats = cache.stats()
+    assert stats["rows_computed"] == 200 * len(SPECS)
+    assert (stats["hits"], stats["misses"]) == (len(SPECS), len(SPECS))
+
+
+def test_shorter_range_after_a_longer_one_is_sliced_from_the_cache(candles):
+    cache = IndicatorCache()
+    _with_indicators(candles, cache)
+    shorter = _with_indicators(candles.iloc[:80], cache)
+
+    pd.testing.assert_frame_equal(shorter, _with_indicators(candles.iloc[:80], None))
+    stats = cache.stats()
+    assert stats["rows_computed"] == 200 * len(SPECS)
+    assert stats["hits"] == len(SPECS)
+
+
+def test_open_candles_are_not_cached(candles):
+    cache = IndicatorCache()
+    closed_until = candles["start_timestamp"].iloc[149]
+    first = add_indicators(candles, "TEST_1h", "1h", START, SPECS, closed_until=closed_until, cache=cache)
+    pd.testing.assert_frame_equal(first, _with_indicators(candles, None))
+    assert cache.stats()["rows_computed"] == 150 * len(SPECS)
@@ -0,0 +1,128 @@
+import asyncio
+import datetime
+
+import pytest
+
+from app.utils import leaderLock
+from app.utils.dailyVolume import SYNC_NAME, get_watermark, group_volume_rows, store_watermark, write_volume_chunk
+from app.utils.leaderLock import LeaderLease, StaleLeaderError, _run_while_held, claim_fence, run_once_as_leader
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+@pytest.fixture
+def no_stored_fence(monkeypatch):
+    """Lease tests without a database: no fence has been written yet."""
+    async def stored_fence(name):
+        return 0
+    monkeypatch.setattr(leaderLock, "stored_fence", stored_fence)
+
+
+def _run(scenario):
+    async def runner():
+        return await scenario(fakeredis.FakeAsyncRedis())
+    return asyncio.run(runner())
+
+
+def test_lease_is_exclusive_and_tokens_grow(no_stored_fence):
+    async def scenario(redis):
+        first, second = LeaderLease(redis, "job"), LeaderLease(redis, "job")
+        assert await first.acquire()
+        first_token = first.token
+        assert not await second.acquire()
+        assert await first.renew()
+        await first.release()
+        assert not first.held
+        assert await second.acquire()
+        return first_token, second.token
+
+    first_token, second_token = _run(scenario)
+    assert second_token > first_token
+
+
+def test_expired_lease_is_neither_renewed_nor_released_by_its_old_owner(no_stored_fence):
+    async def scenario(redis):
+        old, new = LeaderLease(redis, "job", ttl_ms=50), LeaderLease(redis, "job")
+        await old.acquire()
+        await asyncio.sleep(0.1)
+        assert await new.acquire()
+        assert not await old.renew()
+        assert not old.held
+        await old.release()
+        return (await redis.get(new.key)).decode(), new.owner
+
+    stored, owner = _run(scenario)
+    assert stored == owner
+
+
+def test_job_receives_the_fencing_token(no_stored_fence):
+    async def scenario(redis):
+        async def job(token):
+            return token
+        return await run_once_as_leader("job", job, redis=redis)
+
+    assert _run(scenario) == (True, 1)
+
+
+def test_job_is_cancelled_when_renewing_fails(no_stored_fence):
+    cancelled = []
+
+    async def scenario(redis):
+        lease = LeaderLease(redis, "job", ttl_ms=30)
+        await lease.acquire()
+
+        async def job(token):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(token)
+                raise
+
+        async def broken_renew():
+            raise ConnectionError("redis went away")
+
+        lease.renew = broken_renew
+        with pytest.raises(ConnectionError):
+            await _run_while_held(lease, job)
+        return lease.token
+
+    token = _run(scenario)
+    assert cancelled == [token]
+
+
+def test_stale_token_cannot_write(central_db):
+    records = group_volume_rows([{"date": "2025-03-01", "broker_fee": 1}])
+
+    asyncio.run(store_watermark(datetime.date(2025, 3, 1), "ok", token=5))
+    assert asyncio.run(write_volume_chunk(records, token=5)) == 1
+    with pytest.raises(StaleLeaderError):
+        asyncio.run(write_volume_chunk(records, token=4))
+    with pytest.raises(StaleLeaderError):
+        asyncio.run(store_watermark(datetime.date(2025, 3, 9), "ok", token=4))
+
+    async def watermark():
+        async with central_db.connect() as conn:
+            return await get_watermark(conn)
+    assert asyncio.run(watermark()) == datetime.date(2025, 3, 1)
+
+    async def claim(token):
+        async with central_db.begin() as conn:
+            await claim_fence(conn, token, SYNC_NAME)
+    asyncio.run(claim(6))
+    asyncio.run(claim(None))  # unguarded runs are not fenced
+
+
+def test_tokens_continue_from_the_database_after_a_redis_flush(central_db):
+    async def job(token):
+        records = group_volume_rows([{"date": "2025-03-01", "broker_fee": token}])
+        return token, await write_volume_chunk(records, token)
+
+    async def scenario(redis):
+        first = await run_once_as_leader(SYNC_NAME, job, redis=redis)
+        await redis.flushall()
+        second = await run_once_as_leader(SYNC_NAME, job, redis=redis)
+        return first, second
+
+    first, second = _run(scenario)
+    assert first == (True, (1, 1))
+    assert second == (True, (2, 1))
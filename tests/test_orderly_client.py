@@ -0,0 +1,89 @@
+import asyncio
+
+import httpx
+import pytest
+from base58 import b58encode
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+
+from app.utils import orderlyClient, orderlyStub
+from app.utils.orderlyClient import OrderlyClient, OrderlyRequestError, backoff_delay
+
+PATH = "/v1/volume/broker/daily"
+PARAMS = {"start_date": "2025-03-01", "end_date": "2025-03-02", "page": 1, "size": 4}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """The Orderly stub behind an in-process transport, a throwaway signing key and no real sleeps."""
+    secret = b58encode(Ed25519PrivateKey.generate().private_bytes_raw()).decode()
+    monkeypatch.setattr(orderlyClient, "ORDERLY_SECRET", secret)
+    monkeypatch.setattr(orderlyClient, "ORDERLY_PUBLIC_KEY", "ed25519:test")
+    monkeypatch.setattr(orderlyStub.app.state, "config", {**orderlyStub.app.state.config, "fail_first": 0, "fail_rate": 0, "latency": 0})
+    monkeypatch.setattr(orderlyStub.app.state, "requests", 0)
+    delays = []
+
+    async def sleep(seconds):
+        delays.append(seconds)
+
+    monkeypatch.setattr(orderlyClient.asyncio, "sleep", sleep)
+    return orderlyStub.app.state.config, delays
+
+
+def _get(max_retries=4, path=PATH):
+    async def run():
+        client = OrderlyClient("http://stub", max_retries=max_retries, transport=httpx.ASGITransport(app=orderlyStub.app))
+        try:
+            return await client.get(path, PARAMS)
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+def test_signed_request_reads_the_stub(stub):
+    response, attempts = _get()
+    body = response.json()["data"]
+    assert len(body["rows"]) == 4 and body["meta"]["total"] == 2 * orderlyStub.STUB_ROWS_PER_DAY
+    assert [attempt["status"] for attempt in attempts] == [200]
+
+
+def test_server_errors_are_retried_with_backoff(stub):
+    config, delays = stub
+    config["fail_first"] = 2
+    response, attempts = _get()
+    assert response.status_code == 200
+    assert [attempt["status"] for attempt in attempts] == [503, 503, 200]
+    assert len(delays) == 2 and all(delay >= 0 for delay in delays)
+
+
+def test_rate_limits_follow_retry_after(stub):
+    config, delays = stub
+    config.update(fail_first=1, fail_status=429)
+    _get()
+    assert delays == [1.0]
+
+
+def test_gives_up_after_the_last_retry(stub):
+    config, delays = stub
+    config["fail_first"] = 10
+    with pytest.raises(OrderlyRequestError) as error:
+        _get(max_retries=2)
+    assert [attempt["status"] for attempt in error.value.attempts] == [503, 503, 503]
+    assert len(delays) == 2
+
+
+def test_client_errors_are_not_retried(stub):
+    _, delays = stub
+    with pytest.raises(OrderlyRequestError) as error:
+        _get(path="/v1/unknown")
+    assert error.value.response.status_code == 404 and len(error.value.attempts) == 1
+    assert delays == []
+
+
+def test_backoff_delay(monkeypatch):
+    monkeypatch.setattr(orderlyClient, "ORDERLY_BACKOFF_BASE", 0.5)
+    monkeypatch.setattr(orderlyClient, "ORDERLY_BACKOFF_MAX", 4)
+    assert all(0 <= backoff_delay(1) <= 1.0 for _ in range(100))
+    assert all(0 <= backoff_delay(10) <= 4 for _ in range(100))
+    assert backoff_delay(0, "2") == 2.0
+    assert backoff_delay(0, "120") == 4  # Retry-After is capped too
+    assert 0 <= backoff_delay(0, "Wed, 21 Oct 2015 07:28:00 GMT") <= 0.5
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.utils.resample import downsample, downsample_ohlcv, lttb, resample_ohlcv, timeframe_to_timedelta
+
+AGGREGATIONS = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+
+def _candles(rows, freq="h", tz=None):
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 1, rows))
+    return pd.DataFrame({
+        "start_timestamp": pd.date_range("2025-01-01", periods=rows, freq=freq, tz=tz),
+        "low": close - 1, "high": close + 1, "volume": rng.uniform(1, 10, rows),
+        "open": close - 0.5, "close": close,
+    })
+
+
+def test_timeframes():
+    assert timeframe_to_timedelta("15m") == pd.Timedelta(minutes=15)
+    assert timeframe_to_timedelta("1w") == pd.Timedelta(weeks=1)
+    with pytest.raises(ValueError):
+        timeframe_to_timedelta("1y")
+
+
+@pytest.mark.parametrize("tz", [None, "UTC"])
+def test_resample_matches_pandas(tz):
+    df = _candles(50, tz=tz).drop(index=[7, 8, 9])  # a gap inside a bucket
+    expected = (df.set_index("start_timestamp").resample("4h").agg(AGGREGATIONS).dropna().reset_index())
+    result = resample_ohlcv(df.reset_index(drop=True), "4h")
+    assert len(result) == len(expected)
+    for column in AGGREGATIONS:
+        np.testing.assert_allclose(result[column], expected[column])
+    assert result["start_timestamp"].tolist() == expected["start_timestamp"].dt.tz_localize(None).tolist()
+
+
+def test_downsample_merges_runs_of_candles():
+    df = _candles(1000)
+    result = downsample_ohlcv(df, 64)
+    assert len(result) == 64
+    assert result["volume"].sum() == pytest.approx(df["volume"].sum())
+    assert result["high"].max() == df["high"].max() and result["low"].min() == df["low"].min()
+    assert (result["open"].iloc[0], result["close"].iloc[-1]) == (df["open"].iloc[0], df["close"].iloc[-1])
+    assert downsample_ohlcv(df, 2000) is df
+
+
+def test_lttb_keeps_the_ends_and_the_extremes():
+    df = _candles(1000)
+    df.loc[500, "close"] = 1000.0  # a spike must survive
+    result = lttb(df, 50)
+    assert len(result) == 50
+    assert result["start_timestamp"].is_monotonic_increasing
+    assert result.iloc[0].equals(df.iloc[0]) and result.iloc[-1].equals(df.iloc[-1])
+    assert 1000.0 in result["close"].tolist()
+    # Rows are picked, never aggregated
+    assert result.merge(df, how="left", indicator=True)["_merge"].eq("both").all()
+
+
+def test_downsample_resamples_before_capping():
+    df = _candles(24 * 30)
+    result = downsample(df, max_points=10, target_timeframe="1d", method="lttb")
+    assert len(result) == 10
+    assert set(result["start_timestamp"].dt.hour) == {0}
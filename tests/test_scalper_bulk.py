@@ -0,0 +1,74 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from app.utils import operations
+from app.utils.operations import SCALPER_COLUMNS, add_scalpers_bulk
+from tests.conftest import TEST_DATABASE_URL
+
+# scalper predates the Alembic history; the CHECK lets a test make one batch fail in the database
+SCALPER_DDL = """
+CREATE TABLE scalper (
+    token bigint NOT NULL, pair text NOT NULL, timeframe text NOT NULL,
+    capital double precision CHECK (capital >= 0), crypto_amount double precision, crypto_remaining double precision,
+    timestamp timestamp, rowcount integer, position integer, last_partial_exit_price double precision,
+    partial_exit_done boolean, signal integer, first_trade boolean, entry_price double precision,
+    stop_loss_percentage double precision, profit_target_from double precision, profit_target_to double precision,
+    partial_exit_threshold_from double precision, partial_exit_threshold_to double precision,
+    exit_remaining_percentage_from double precision, exit_remaining_percentage_to double precision,
+    partial_exit_amount double precision
+)"""
+
+
+def _row(token, capital=100.0):
+    return (token, "SOLUSDT", "5m", capital, 0.0, 0.0, "2024-10-28 10:00:00", 0, 0, 0.0, False, 1, True, 0,
+            0.15, 0.3, 3.0, 20.0, 25.0, 20.0, 25.0, 0.30)
+
+
+@pytest.fixture
+def scalper_db(monkeypatch):
+    """An empty scalper table on TEST_DATABASE_URL, patched in as the central psycopg2 engine."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_engine(TEST_DATABASE_URL.replace("+asyncpg", ""), poolclass=NullPool)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS scalper"))
+        conn.execute(text(SCALPER_DDL))
+    monkeypatch.setattr(operations, "db_con", engine)
+
+    def tokens():
+        with engine.connect() as conn:
+            return [row[0] for row in conn.execute(text("SELECT token FROM scalper ORDER BY token"))]
+
+    yield tokens
+    engine.dispose()
+
+
+def test_invalid_rows_are_reported_without_touching_the_database():
+    rows = [_row(1)[:5], {"token": 1}, ("x",) + _row(1)[1:], (1, "", *_row(1)[2:])]
+    report = add_scalpers_bulk(rows, batch_size=10)
+    assert (report["inserted"], report["rejected"]) == (0, 4)
+    assert [error["row"] for error in report["errors"]] == [0, 1, 2, 3]
+
+
+def test_rows_are_copied_in_batches(scalper_db):
+    rows = (_row(token) for token in range(1, 8))  # any iterable, consumed lazily
+    report = add_scalpers_bulk(rows, batch_size=3)
+    assert [batch["inserted"] for batch in report["batches"]] == [3, 3, 1]
+    assert report["inserted"] == 7
+    assert scalper_db() == list(range(1, 8))
+
+
+def test_dict_rows_are_accepted(scalper_db):
+    report = add_scalpers_bulk([dict(zip(SCALPER_COLUMNS, _row(5)))])
+    assert report["inserted"] == 1 and scalper_db() == [5]
+
+
+def test_a_failing_batch_rolls_back_alone(scalper_db):
+    rows = [_row(1), _row(2), _row(3), _row(4, capital=-1), _row(5), _row(6)[:3]]
+    report = add_scalpers_bulk(rows, batch_size=3)
+    first, second = report["batches"]
+    assert (first["inserted"], first["error"]) == (3, None)
+    assert second["inserted"] == 0 and "check" in second["error"].lower()
+    assert (report["inserted"], report["rejected"]) == (3, 1)
+    assert scalper_db() == [1, 2, 3]
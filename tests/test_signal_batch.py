@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app import routes
+from app.utils import asyncOperations
+from tests.conftest import TEST_DATABASE_URL
+
+# t_signal predates the Alembic history; this is the shape the batch statements rely on
+T_SIGNAL_DDL = """
+CREATE TABLE t_signal (
+    signal integer, token bigint NOT NULL, pair text NOT NULL, timeframe text NOT NULL,
+    gain_threshold double precision, stop_loss_threshold double precision,
+    UNIQUE (token, pair, timeframe)
+)"""
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(routes.signal_router)
+    return TestClient(app)
+
+
+def _item(pair, token=1, **fields):
+    return {"token": token, "pair": pair, "timeframe": "1h", **fields}
+
+
+def _create(pair, token=1):
+    return _item(pair, token, signal=1, gain_threshold=2.0, stop_loss_threshold=1.0)
+
+
+@pytest.fixture
+def signals(monkeypatch):
+    """An empty t_signal on TEST_DATABASE_URL, patched into asyncOperations."""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    engine = create_async_engine(TEST_DATABASE_URL, poolclass=NullPool)
+
+    async def reset():
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP TABLE IF EXISTS t_signal"))
+            await conn.execute(text(T_SIGNAL_DDL))
+
+    async def rows():
+        async with engine.connect() as conn:
+            result = await conn.execute(text("SELECT pair, signal, gain_threshold FROM t_signal ORDER BY pair"))
+            return [tuple(row) for row in result]
+
+    asyncio.run(reset())
+    monkeypatch.setattr(asyncOperations, "engine", engine)
+    yield lambda: asyncio.run(rows())
+    asyncio.run(engine.dispose())
+
+
+def _statuses(response):
+    assert response.status_code == 200
+    return [outcome["status"] for outcome in response.json()]
+
+
+def test_outcomes_follow_the_request_order(signals):
+    client = _client()
+    created = client.post("/signals/batch", json=[_create("BTC"), _create("ETH"), _create("BTC")])
+    assert _statuses(created) == ["inserted", "inserted", "duplicate"]
+
+    state = client.post("/signals/batch/state", json=[_item("ETH", signal=0), _item("SOL", signal=0)])
+    assert _statuses(state) == ["updated", "not_found"]
+    thresholds = client.post("/signals/batch/thresholds", json=[_item("BTC", gain_threshold=5.0, stop_loss_threshold=1.0)])
+    assert _statuses(thresholds) == ["updated"]
+    assert signals() == [("BTC", 1, 5.0), ("ETH", 0, 2.0)]
+
+    reset = client.post("/signals/batch/reset", json=[_item("BTC"), _item("BTC", token=2)])
+    assert _statuses(reset) == ["deleted", "not_found"]
+    assert signals() == [("ETH", 0, 2.0)]
+
+
+def test_create_batch_is_all_or_nothing(signals):
+    client = _client()
+    client.post("/signals/batch", json=[_create("BTC")])
+    response = client.post("/signals/batch", json=[_create("ETH"), _create("BTC"), _create("SOL")])
+    assert _statuses(response) == ["error", "error", "error"]
+    assert signals() == [("BTC", 1, 2.0)]
+
+
+def test_batch_size_is_bounded(monkeypatch):
+    monkeypatch.setattr(routes, "SIGNAL_BATCH_MAX_ROWS", 2)
+    client = _client()
+    assert client.post("/signals/batch/reset", json=[]).status_code == 400
+    assert client.post("/signals/batch/reset", json=[_item("A"), _item("B"), _item("C")]).status_code == 413
+
+
+def test_background_batch_returns_a_task(monkeypatch):
+    sent = []
+
+    class Task:
+        id = "task-1"
+
+    class SignalBatch:
+        @staticmethod
+        def delay(operation, items):
+            sent.append((operation, items))
+            return Task()
+
+    monkeypatch.setattr(routes, "signal_batch", SignalBatch)
+    response = _client().post("/signals/batch/state?background=true", json=[_item("BTC", signal=1)])
+    assert response.status_code == 202
+    assert response.json() == {"task_id": "task-1", "status_url": "/api/v1/central/tasks/task-1"}
+    assert sent == [("state", [_item("BTC", signal=1)])]
+
+
+def test_values_must_match_the_keys():
+    with pytest.raises(ValueError):
+        asyncio.run(asyncOperations.startStopBotOpBatch([(1, "BTC", "1h"), (1, "ETH", "1h")], [1]))